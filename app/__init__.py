@@ -7,11 +7,11 @@ from flask_login import LoginManager, current_user
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_babel import Babel
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine  # <-- ДОБАВЛЕН ИМПОРТ
 from decimal import Decimal
 from .core.config import DevelopmentConfig
-from .core.extensions import db
+from .core.extensions import db, engine_registry, tenant_health, identity_cache, sql_metrics, request_profiler, \
+    fact_cube_syncer, fanout, snapshot_cache
+from .core.db_utils import LazySession
 
 # 1. Инициализация расширений
 login_manager = LoginManager()
@@ -54,6 +54,14 @@ def create_app(config_class=DevelopmentConfig):
 
     CORS(app)
     db.init_app(app)
+    engine_registry.init_app(app)
+    tenant_health.init_app(app)
+    identity_cache.init_app(app)
+    sql_metrics.init_app(app)
+    request_profiler.init_app(app)
+    fact_cube_syncer.init_app(app)
+    fanout.init_app(app)
+    snapshot_cache.init_app(app)
     Migrate(app, db)
     login_manager.init_app(app)
     babel.init_app(app, locale_selector=select_locale)
@@ -91,6 +99,9 @@ def create_app(config_class=DevelopmentConfig):
         app.register_blueprint(manager_analytics_bp, url_prefix='/manager-analytics')
         app.register_blueprint(super_admin_bp)
 
+        from .core.index_advisor import index_advisor_command
+        app.cli.add_command(index_advisor_command)
+
         @login_manager.user_loader
         def load_user(user_id):
             return auth_models.User.query.get(int(user_id))
@@ -106,30 +117,24 @@ def create_app(config_class=DevelopmentConfig):
         if not current_user.is_authenticated:
             return
 
-        company = current_user.company
+        # Слепок настроек компании берется из кэша, а не лениво из current_user.company
+        company = identity_cache.tenant_config(current_user.company_id)
         if not company:
             return abort(403, "Пользователь не привязан к компании.")
+        g.tenant_config = company
 
-        try:
-            local_engine = create_engine(company.db_uri)
-            g.company_db_session = sessionmaker(bind=local_engine)()
-        except Exception as e:
-            print(f"CRITICAL: Could not connect to tenant LOCAL DB for {company.name}. Error: {e}")
-            return abort(500, "Не удалось подключиться к локальной базе данных компании.")
+        # Сессии создаются лениво: соединение берется из пула только при первом запросе к базе
+        g.company_db_session = LazySession(
+            lambda: engine_registry.get_local_engine(company),
+            "Не удалось подключиться к локальной базе данных компании."
+        )
 
         if company.mysql_db_uri:
-            try:
-                # --- ГЛАВНОЕ ИЗМЕНЕНИЕ: Добавляем опции echo и isolation_level ---
-                mysql_engine = create_engine(
-                    company.mysql_db_uri,
-                    connect_args={"init_command": "SET NAMES utf8mb4"},
-                    isolation_level="READ COMMITTED"  # Заставляем читать актуальные данные
-                )
-                g.mysql_db_session = sessionmaker(bind=mysql_engine)()
-                print("--- [DEBUG] ✔️ Подключение к MYSQL успешно c новыми параметрами! ---")
-            except Exception as e:
-                print(f"CRITICAL: Could not connect to tenant MYSQL DB for {company.name}. Error: {e}")
-                return abort(500, "Не удалось подключиться к внешней базе данных MySQL.")
+            g.mysql_db_session = LazySession(
+                lambda: engine_registry.get_mysql_engine(company),
+                "Не удалось подключиться к внешней базе данных MySQL.",
+                breaker=tenant_health.get(company.id)
+            )
         else:
             g.mysql_db_session = None
 
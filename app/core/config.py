@@ -6,6 +6,65 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-very-secret-key'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Пулы соединений к базам компаний (см. app/core/db_utils.py)
+    TENANT_DB_POOL_SIZE = int(os.environ.get('TENANT_DB_POOL_SIZE', 5))
+    TENANT_DB_MAX_OVERFLOW = int(os.environ.get('TENANT_DB_MAX_OVERFLOW', 10))
+    TENANT_DB_POOL_RECYCLE = int(os.environ.get('TENANT_DB_POOL_RECYCLE', 1800))
+    TENANT_DB_POOL_PRE_PING = os.environ.get('TENANT_DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # Параллельные независимые запросы внутри одного HTTP-запроса (см. core.fanout); 1 — выключено.
+    # Каждая задача берет свое соединение, поэтому число потоков не должно превышать размер пула
+    FANOUT_MAX_WORKERS = int(os.environ.get('FANOUT_MAX_WORKERS', 4))
+    FANOUT_TIMEOUT = int(os.environ.get('FANOUT_TIMEOUT', 60))
+
+    # Предохранитель для недоступных MySQL компаний (см. app/core/tenant_health.py)
+    TENANT_MYSQL_CONNECT_TIMEOUT = int(os.environ.get('TENANT_MYSQL_CONNECT_TIMEOUT', 5))
+    TENANT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('TENANT_BREAKER_FAILURE_THRESHOLD', 3))
+    TENANT_BREAKER_RESET_TIMEOUT = int(os.environ.get('TENANT_BREAKER_RESET_TIMEOUT', 30))
+
+    # Лимиты времени SQL-запросов тяжелых отчетов (секунды), см. core.query_budget
+    REPORT_QUERY_BUDGET_DEFAULT = int(os.environ.get('REPORT_QUERY_BUDGET_DEFAULT', 30))
+    REPORT_QUERY_BUDGETS = {}
+
+    # Время жизни кэша прав ролей и настроек компаний (секунды), см. core.identity_cache
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+
+    # Время жизни кэша производственного календаря компании (секунды), см. services/calendar_service.py
+    CALENDAR_CACHE_TTL = int(os.environ.get('CALENDAR_CACHE_TTL', 3600))
+
+    # Снимки секций дашборда проекта (см. core.snapshot_cache): свежий снимок отдается как есть,
+    # устаревший (до MAX_STALE) — сразу, с пересчетом в фоне. TTL 0 — кэш выключен
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+    DASHBOARD_CACHE_MAX_STALE = int(os.environ.get('DASHBOARD_CACHE_MAX_STALE', 3600))
+    DASHBOARD_CACHE_MAX_ENTRIES = int(os.environ.get('DASHBOARD_CACHE_MAX_ENTRIES', 500))
+
+    # Замеры SQL по запросам и страница /admin/perf (см. core.sql_metrics)
+    SQL_METRICS_ENABLED = os.environ.get('SQL_METRICS_ENABLED', 'true').lower() == 'true'
+    SQL_METRICS_TOP_N = int(os.environ.get('SQL_METRICS_TOP_N', 5))
+    SQL_METRICS_BUFFER_SIZE = int(os.environ.get('SQL_METRICS_BUFFER_SIZE', 500))
+
+    # Профилирование запросов (см. core.profiler): доля случайно профилируемых запросов, 0 — выключено
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', 200))
+
+    # Помесячный куб фактов в локальной базе компании (см. services/fact_cube_service.py).
+    # Отчеты читают куб, только если он обновлялся не позднее FACT_CUBE_MAX_AGE_MINUTES назад.
+    # FACT_CUBE_SYNC_INTERVAL — период фоновой синхронизации в секундах, 0 — только `flask fact-cube-sync`
+    # (при нескольких воркерах проход выполняет один процесс — файловая блокировка в instance/)
+    FACT_CUBE_ENABLED = os.environ.get('FACT_CUBE_ENABLED', 'true').lower() == 'true'
+    FACT_CUBE_MAX_AGE_MINUTES = int(os.environ.get('FACT_CUBE_MAX_AGE_MINUTES', 30))
+    FACT_CUBE_SYNC_INTERVAL = int(os.environ.get('FACT_CUBE_SYNC_INTERVAL', 0))
+    FACT_CUBE_FULL_REBUILD_HOURS = int(os.environ.get('FACT_CUBE_FULL_REBUILD_HOURS', 24))
+    FACT_CUBE_HOT_MONTHS = int(os.environ.get('FACT_CUBE_HOT_MONTHS', 3))
+
+    # Помесячный ряд средней цены м² (services/price_series_service.py). Строится вместе с кубом фактов
+    # (FACT_CUBE_SYNC_INTERVAL или `flask fact-cube-sync`), полная пересборка — не реже раза
+    # в PRICE_SERIES_FULL_REBUILD_HOURS часов. В запросах ряд старше PRICE_SERIES_MAX_AGE_MINUTES
+    # дообновляется только за текущий и прошлый месяц
+    PRICE_SERIES_ENABLED = os.environ.get('PRICE_SERIES_ENABLED', 'true').lower() == 'true'
+    PRICE_SERIES_MAX_AGE_MINUTES = int(os.environ.get('PRICE_SERIES_MAX_AGE_MINUTES', 60))
+    PRICE_SERIES_FULL_REBUILD_HOURS = int(os.environ.get('PRICE_SERIES_FULL_REBUILD_HOURS', 24))
+
 class DevelopmentConfig(Config):
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('CONTROL_DATABASE_URL') or 'sqlite:///control_app.db'
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('CONTROL_DATABASE_URL') or 'sqlite:///control_app.db'
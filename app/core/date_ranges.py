@@ -0,0 +1,87 @@
+# app/core/date_ranges.py
+
+from datetime import date, timedelta
+
+from sqlalchemy import and_, or_, true
+
+PERIOD_MONTHS = {
+    'q1': range(1, 4), 'q2': range(4, 7), 'q3': range(7, 10),
+    'q4': range(10, 13), 'h1': range(1, 7), 'h2': range(7, 13),
+}
+
+
+def add_months(day: date, months: int) -> date:
+    """Первое число месяца, отстоящего от day на months месяцев."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(year: int, month: int):
+    """Полуинтервал [1-е число месяца, 1-е число следующего месяца)."""
+    start = date(year, month, 1)
+    return start, add_months(start, 1)
+
+
+def year_range(year: int):
+    """Полуинтервал [1 января, 1 января следующего года)."""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def days_range(start_date: date = None, end_date: date = None):
+    """
+    Диапазон дат из формы (обе границы включительно) в виде полуинтервала.
+    Любая из границ может отсутствовать.
+    """
+    return start_date, end_date + timedelta(days=1) if end_date else None
+
+
+def period_range(year: int, period: str, start_date: date = None, end_date: date = None):
+    """
+    Переводит код периода в полуинтервал дат [start, end).
+    Поддерживаются кварталы и полугодия (q1..q4, h1, h2), 'ytd' (с начала года по сегодня)
+    и 'custom' (start_date..end_date включительно). Для неизвестного периода возвращает None.
+    """
+    today = date.today()
+    if period in PERIOD_MONTHS:
+        months = PERIOD_MONTHS[period]
+        start = date(year, months[0], 1)
+        return start, add_months(start, len(months))
+    if period == 'ytd':
+        end = today + timedelta(days=1) if year == today.year else date(year + 1, 1, 1)
+        return date(year, 1, 1), end
+    if period == 'custom' and start_date and end_date and start_date <= end_date:
+        return days_range(start_date, end_date)
+    return None
+
+
+def in_range(column, start: date = None, end: date = None):
+    """
+    Условие column >= start AND column < end. В отличие от extract('year'/'month', column)
+    такое сравнение использует индекс по колонке. Отсутствующая граница не ограничивает.
+    """
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return and_(true(), *conditions)
+
+
+def in_month(column, year: int, month: int):
+    return in_range(column, *month_range(year, month))
+
+
+def in_year(column, year: int):
+    return in_range(column, *year_range(year))
+
+
+def coalesce_in_range(primary, fallback, start: date = None, end: date = None):
+    """
+    Эквивалент coalesce(primary, fallback) в [start, end), записанный так, чтобы MySQL
+    мог использовать индексы по обеим колонкам (index merge), а не сканировать таблицу:
+        primary в диапазоне OR (primary IS NULL AND fallback в диапазоне)
+    """
+    return or_(
+        in_range(primary, start, end),
+        and_(primary.is_(None), in_range(fallback, start, end))
+    )
@@ -0,0 +1,223 @@
+# app/core/db_utils.py
+
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, abort
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+
+class TenantEngineRegistry:
+    """
+    Процессный реестр движков SQLAlchemy для баз компаний.
+    Движок (и его пул соединений) создается один раз на пару (компания, URI)
+    и переиспользуется всеми последующими запросами.
+    """
+
+    def __init__(self, app=None):
+        self._engines = {}
+        self._lock = threading.Lock()
+        self.pool_size = 5
+        self.max_overflow = 10
+        self.pool_recycle = 1800
+        self.pool_pre_ping = True
+        self.mysql_connect_timeout = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.pool_size = app.config.get('TENANT_DB_POOL_SIZE', self.pool_size)
+        self.max_overflow = app.config.get('TENANT_DB_MAX_OVERFLOW', self.max_overflow)
+        self.pool_recycle = app.config.get('TENANT_DB_POOL_RECYCLE', self.pool_recycle)
+        self.pool_pre_ping = app.config.get('TENANT_DB_POOL_PRE_PING', self.pool_pre_ping)
+        self.mysql_connect_timeout = app.config.get('TENANT_MYSQL_CONNECT_TIMEOUT', self.mysql_connect_timeout)
+        app.extensions['tenant_engine_registry'] = self
+
+    def _build_engine(self, uri: str, **engine_kwargs):
+        pool_kwargs = {'pool_pre_ping': self.pool_pre_ping, 'pool_recycle': self.pool_recycle}
+        # Для SQLite SQLAlchemy сама выбирает пул, размеры пула ему передавать нельзя
+        if make_url(uri).get_backend_name() != 'sqlite':
+            pool_kwargs.update(pool_size=self.pool_size, max_overflow=self.max_overflow)
+        return create_engine(uri, **pool_kwargs, **engine_kwargs)
+
+    def _get_engine(self, company_id: int, kind: str, uri: str, **engine_kwargs):
+        key = (company_id, kind)
+        entry = self._engines.get(key)
+        if entry and entry[0] == uri:
+            return entry[1]
+
+        with self._lock:
+            entry = self._engines.get(key)
+            if entry and entry[0] == uri:
+                return entry[1]
+            if entry:
+                # URI компании поменялся — старый пул больше не нужен
+                entry[1].dispose()
+            engine = self._build_engine(uri, **engine_kwargs)
+            if kind == 'mysql':
+                event.listen(engine, 'checkin', _reset_query_budget)
+            self._engines[key] = (uri, engine)
+            print(f"[ENGINE REGISTRY] ✔️ Создан движок '{kind}' для компании ID {company_id}")
+            return engine
+
+    def get_local_engine(self, company):
+        """Возвращает движок локальной (SQLite) базы компании."""
+        return self._get_engine(company.id, 'local', company.db_uri)
+
+    def get_mysql_engine(self, company):
+        """Возвращает движок внешней MySQL базы компании или None, если она не настроена."""
+        if not company.mysql_db_uri:
+            return None
+        if make_url(company.mysql_db_uri).get_backend_name() != 'mysql':
+            # Например, синтетическая SQLite-база для нагрузочных тестов (см. benchmarks/)
+            return self._get_engine(company.id, 'mysql', company.mysql_db_uri)
+        return self._get_engine(
+            company.id, 'mysql', company.mysql_db_uri,
+            connect_args={"init_command": "SET NAMES utf8mb4", "connect_timeout": self.mysql_connect_timeout},
+            isolation_level="READ COMMITTED"  # Заставляем читать актуальные данные
+        )
+
+    def invalidate(self, company_id: int):
+        """Закрывает и удаляет все движки компании (например, после смены строк подключения)."""
+        with self._lock:
+            for key in [k for k in self._engines if k[0] == company_id]:
+                _, engine = self._engines.pop(key)
+                engine.dispose()
+        print(f"[ENGINE REGISTRY] 🔄 Движки компании ID {company_id} сброшены")
+
+    def dispose_all(self):
+        with self._lock:
+            for _, engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+def _reset_query_budget(dbapi_connection, connection_record):
+    """Снимает лимит времени отчета (см. core.query_budget), пока соединение не ушло другим запросам."""
+    if connection_record.info.pop('query_budget_ms', None) is None or dbapi_connection is None:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SET SESSION max_execution_time = 0")
+    finally:
+        cursor.close()
+
+
+class LazySession:
+    """
+    Ленивый прокси сессии SQLAlchemy, который кладется в g.
+    Движок и сессия создаются только при первом обращении сервиса к сессии,
+    поэтому страницы, не читающие базу, не берут соединение из пула.
+    """
+
+    def __init__(self, engine_getter, error_message: str, breaker=None, on_start=None):
+        self._engine_getter = engine_getter
+        self._error_message = error_message
+        self._breaker = breaker
+        self._on_start = on_start
+        self._session = None
+
+    @property
+    def is_started(self):
+        return self._session is not None
+
+    def when_started(self, callback):
+        """
+        Вызывает callback(session), когда сессия впервые возьмет соединение;
+        если сессия уже работает — сразу. Сам вызов соединения не берет.
+        """
+        if self._session is not None:
+            callback(self._session)
+            return
+        previous = self._on_start
+
+        def on_start(session):
+            if previous:
+                previous(session)
+            callback(session)
+
+        self._on_start = on_start
+
+    def _get_session(self):
+        if self._session is None:
+            if self._breaker and not self._breaker.allow_request():
+                # База компании недавно не отвечала — не ждем таймаут подключения
+                abort(503, f"{self._error_message} Сервер временно недоступен, повторите попытку позже.")
+            try:
+                session = sessionmaker(bind=self._engine_getter())()
+                if self._breaker:
+                    # Сразу берем соединение, чтобы предохранитель узнал о результате подключения
+                    session.connection()
+            except Exception as e:
+                print(f"CRITICAL: {self._error_message} Error: {e}")
+                if self._breaker:
+                    self._breaker.record_failure(e)
+                abort(500, self._error_message)
+            if self._breaker:
+                self._breaker.record_success()
+            self._session = session
+            if self._on_start:
+                self._on_start(session)
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get_session(), name)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+_TENANT_G_KEYS = ('tenant_config', 'company_db_session', 'mysql_db_session')
+
+
+@contextmanager
+def tenant_sessions(tenant_config, mysql_on_start=None):
+    """
+    Кладет в g слепок настроек и ленивые сессии компании так же, как before_request,
+    но вне HTTP-запроса (фоновые задачи, CLI, потоки core.fanout). Нужен активный контекст приложения.
+    Предыдущие значения g восстанавливаются на выходе, сессии закрываются.
+    mysql_on_start(session) вызывается, когда сессия MySQL впервые берет соединение.
+    """
+    from .extensions import engine_registry, tenant_health
+
+    saved = {key: g.get(key) for key in _TENANT_G_KEYS if key in g}
+    g.tenant_config = tenant_config
+    g.company_db_session = LazySession(
+        lambda: engine_registry.get_local_engine(tenant_config),
+        "Не удалось подключиться к локальной базе данных компании."
+    )
+    g.mysql_db_session = LazySession(
+        lambda: engine_registry.get_mysql_engine(tenant_config),
+        "Не удалось подключиться к внешней базе данных MySQL.",
+        breaker=tenant_health.get(tenant_config.id),
+        on_start=mysql_on_start
+    ) if tenant_config.mysql_db_uri else None
+    try:
+        yield
+    finally:
+        g.company_db_session.close()
+        if g.mysql_db_session is not None:
+            g.mysql_db_session.close()
+        for key in _TENANT_G_KEYS:
+            g.pop(key, None)
+        for key, value in saved.items():
+            setattr(g, key, value)
+
+
+def require_mysql_db(fn):
+    """
+    Декоратор для маршрутов и сервисов, которым обязательно нужна внешняя база MySQL.
+    """
+
+    @wraps(fn)
+    def decorated(*args, **kwargs):
+        if getattr(g, 'mysql_db_session', None) is None:
+            abort(503, "Для этой страницы требуется подключение к базе данных MySQL.")
+        return fn(*args, **kwargs)
+
+    return decorated
@@ -1,8 +1,24 @@
 # app/core/extensions.py
 from flask_sqlalchemy import SQLAlchemy
+from .db_utils import TenantEngineRegistry
+from .tenant_health import TenantHealthRegistry
+from .identity_cache import IdentityCache
+from .sql_metrics import SqlInstrumentation
+from .profiler import RequestProfiler
+from .fact_cube_sync import FactCubeSyncer
+from .fanout import FanOutExecutor
+from .snapshot_cache import SnapshotCache
 
 db = SQLAlchemy()
+engine_registry = TenantEngineRegistry()
+tenant_health = TenantHealthRegistry()
+identity_cache = IdentityCache()
+sql_metrics = SqlInstrumentation()
+request_profiler = RequestProfiler()
+fact_cube_syncer = FactCubeSyncer()
+fanout = FanOutExecutor()
+snapshot_cache = SnapshotCache()
 
 # Возможно, здесь или в app/__init__.py нужно импортировать новые модели,
 # чтобы они были зарегистрированы в SQLAlchemy при db.create_all()
-# from app.models import exclusion_models # Пример
\ No newline at end of file
+# from app.models import exclusion_models # Пример
@@ -0,0 +1,135 @@
+# app/core/fact_cube_sync.py
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки нет, рассчитываем на один процесс
+    fcntl = None
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .db_utils import tenant_sessions
+from .tenant_config import TenantConfig
+
+
+def sync_company(company, full: bool = False):
+    """
+    Синхронизирует куб фактов и ряд цен м² одной компании. Нужен активный контекст приложения.
+    Возвращает результат синхронизации куба.
+    """
+    from ..services import fact_cube_service, price_series_service
+
+    with tenant_sessions(TenantConfig(company)):
+        details = fact_cube_service.sync_fact_cube(full=full)
+        try:
+            price_series_service.refresh_price_series(full=full)
+        except Exception as e:
+            # Ряд цен не критичен для куба: при следующем обращении он обновится сам
+            print(f"[PRICE SERIES] ❌ Компания ID {company.id}: {e}")
+        return details
+
+
+@contextmanager
+def _sync_lock(app, blocking: bool):
+    """
+    Межпроцессная блокировка синхронизации (файл в instance/): при нескольких воркерах gunicorn
+    куб обновляет только один из них, а запуск `flask fact-cube-sync` из cron ждет фоновый проход.
+    Отдает True, если блокировка получена.
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(app.instance_path, exist_ok=True)
+    with open(os.path.join(app.instance_path, 'fact_cube_sync.lock'), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _companies_with_mysql():
+    from ..models.auth_models import Company
+    return Company.query.filter(Company.mysql_db_uri.isnot(None), Company.mysql_db_uri != '').all()
+
+
+class FactCubeSyncer:
+    """
+    Фоновая синхронизация куба фактов (см. services/fact_cube_service.py) для всех компаний с MySQL.
+    Раз в FACT_CUBE_SYNC_INTERVAL секунд выполняется инкрементальный проход,
+    раз в FACT_CUBE_FULL_REBUILD_HOURS часов — полная пересборка. При интервале 0 поток не запускается,
+    синхронизацию можно вызывать командой `flask fact-cube-sync` (например, из cron).
+    Поток стартует в каждом процессе, но проход выполняет только процесс, получивший файловую
+    блокировку (_sync_lock); остальные пропускают его. Для нескольких воркеров надежнее
+    интервал 0 и `flask fact-cube-sync` из cron.
+    """
+
+    def __init__(self, app=None):
+        self.interval = 0
+        self.full_rebuild_seconds = 24 * 3600
+        self._thread = None
+        self._last_full = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('FACT_CUBE_SYNC_INTERVAL', self.interval)
+        self.full_rebuild_seconds = app.config.get('FACT_CUBE_FULL_REBUILD_HOURS', 24) * 3600
+        app.extensions['fact_cube_syncer'] = self
+        app.cli.add_command(fact_cube_sync_command)
+        # В режиме отладки с перезагрузчиком поток запускаем только в рабочем процессе
+        if self.interval > 0 and (not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+            self._thread = threading.Thread(target=self._run, args=(app,), name='fact-cube-sync', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while True:
+            time.sleep(self.interval)
+            with app.app_context(), _sync_lock(app, blocking=False) as acquired:
+                if not acquired:
+                    # Этот проход уже выполняет другой процесс
+                    continue
+                try:
+                    companies = _companies_with_mysql()
+                except Exception as e:
+                    print(f"[FACT CUBE] ❌ Не удалось получить список компаний: {e}")
+                    continue
+                for company in companies:
+                    full = time.monotonic() - self._last_full.get(company.id, float('-inf')) >= self.full_rebuild_seconds
+                    try:
+                        sync_company(company, full=full)
+                        if full:
+                            self._last_full[company.id] = time.monotonic()
+                    except Exception as e:
+                        print(f"[FACT CUBE] ❌ Компания ID {company.id}: {e}")
+
+
+@click.command('fact-cube-sync')
+@click.option('--company', 'subdomain', default=None, help="Поддомен компании (по умолчанию все компании с MySQL)")
+@click.option('--full', is_flag=True, help="Полная пересборка вместо инкрементального обновления")
+@with_appcontext
+def fact_cube_sync_command(subdomain, full):
+    """Обновляет помесячный куб фактов в локальных базах компаний."""
+    companies = _companies_with_mysql()
+    if subdomain:
+        companies = [company for company in companies if company.subdomain == subdomain]
+        if not companies:
+            raise click.ClickException(f"Компания '{subdomain}' с настроенной MySQL не найдена.")
+    with _sync_lock(current_app, blocking=True):
+        for company in companies:
+            click.echo(f"=== {company.name} ({company.subdomain})")
+            try:
+                details = sync_company(company, full=full)
+                click.echo(f"  {details['mode']}: ячеек {details['buckets']}, {details['duration_ms']} мс")
+            except Exception as e:
+                click.echo(f"  ❌ {e}")
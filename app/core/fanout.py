@@ -0,0 +1,127 @@
+# app/core/fanout.py
+"""
+Параллельное выполнение независимых сервисных вызовов внутри одного запроса.
+
+    results = run_parallel({'plans': lambda: ..., 'deals': lambda: ...})
+
+Задачи выполняются в общем ограниченном пуле потоков (FANOUT_MAX_WORKERS). Каждая задача
+получает собственные сессии баз компании из TenantEngineRegistry (сессия SQLAlchemy не
+потокобезопасна), а также контекст приложения, запроса и пользователя вызывающего потока.
+Результаты собираются с общим таймаутом FANOUT_TIMEOUT; ошибка задачи пробрасывается вызывающему.
+Вне контекста приложения, при FANOUT_MAX_WORKERS <= 1 и во вложенных вызовах задачи
+выполняются последовательно в текущем потоке.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+from flask import g, current_app, has_app_context, has_request_context, copy_current_request_context
+
+from .db_utils import tenant_sessions
+
+# Значения g, которые задача наследует от вызывающего потока (язык, пользователь, замеры SQL, лимит запросов)
+_INHERITED_G_KEYS = ('lang', '_login_user', 'sql_stats', 'query_budget_ms')
+
+_worker_state = threading.local()
+
+
+class FanOutTimeout(TimeoutError):
+    """Не все задачи уложились в отведенное время."""
+
+
+class FanOutExecutor:
+    """Расширение Flask с общим пулом потоков для run_parallel."""
+
+    def __init__(self, app=None):
+        self.max_workers = 4
+        self.timeout = 60
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('FANOUT_MAX_WORKERS', self.max_workers)
+        self.timeout = app.config.get('FANOUT_TIMEOUT', self.timeout)
+        app.extensions['fanout'] = self
+
+    @property
+    def enabled(self):
+        return self.max_workers > 1
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fanout')
+        return self._executor
+
+    def run(self, tasks: dict, timeout: float = None):
+        """Выполняет {имя: функция без аргументов} и возвращает {имя: результат}."""
+        if not self.enabled or len(tasks) < 2 or getattr(_worker_state, 'active', False) \
+                or getattr(g, 'tenant_config', None) is None:
+            return {name: func() for name, func in tasks.items()}
+
+        app = current_app._get_current_object()
+        tenant_config = g.tenant_config
+        inherited = {key: g.get(key) for key in _INHERITED_G_KEYS if key in g}
+
+        futures = {}
+        for name, func in tasks.items():
+            runner = _make_runner(app, tenant_config, inherited, func)
+            futures[self._get_executor().submit(runner)] = name
+
+        done, pending = wait(futures, timeout=timeout or self.timeout, return_when=FIRST_EXCEPTION)
+        if pending:
+            # Результат запроса уже не нужен: задачи из очереди не должны занимать потоки и соединения
+            for future in pending:
+                future.cancel()
+        for future in done:
+            # Первой пробрасываем ошибку задачи: вызывающий обработает ее так же, как при последовательном вызове
+            if future.exception() is not None:
+                raise future.exception()
+        if pending:
+            names = ', '.join(sorted(futures[future] for future in pending))
+            raise FanOutTimeout(f"Задачи не завершились за отведенное время: {names}")
+        return {futures[future]: future.result() for future in done}
+
+
+def _make_runner(app, tenant_config, inherited: dict, func):
+    def run_task():
+        _worker_state.active = True
+        try:
+            for key, value in inherited.items():
+                setattr(g, key, value)
+            budget_ms = inherited.get('query_budget_ms')
+            with tenant_sessions(tenant_config, mysql_on_start=_budget_applier(budget_ms) if budget_ms else None):
+                return func()
+        finally:
+            _worker_state.active = False
+
+    if has_request_context():
+        # Копия контекста запроса: request, session и current_user доступны в задаче, g — свой
+        return copy_current_request_context(run_task)
+
+    def run_in_app_context():
+        with app.app_context():
+            return run_task()
+
+    return run_in_app_context
+
+
+def _budget_applier(limit_ms: int):
+    def apply(session):
+        from .query_budget import _apply_mysql_budget
+        _apply_mysql_budget(session, limit_ms)
+
+    return apply
+
+
+def run_parallel(tasks: dict, timeout: float = None):
+    """Выполняет независимые вызовы параллельно (см. описание модуля)."""
+    if not has_app_context():
+        return {name: func() for name, func in tasks.items()}
+    executor = current_app.extensions.get('fanout')
+    if executor is None:
+        return {name: func() for name, func in tasks.items()}
+    return executor.run(tasks, timeout)
@@ -0,0 +1,74 @@
+# app/core/identity_cache.py
+
+import threading
+import time
+
+from .tenant_config import TenantConfig
+
+
+class IdentityCache:
+    """
+    Процессный кэш прав ролей и слепков настроек компаний с ограниченным временем жизни.
+    Проверка прав превращается в поиск по frozenset без обращения к базе.
+    """
+
+    def __init__(self, app=None):
+        self._role_permissions = {}
+        self._companies = {}
+        self._lock = threading.Lock()
+        self.ttl = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+        app.extensions['identity_cache'] = self
+
+    def _get(self, storage: dict, key, loader):
+        entry = storage.get(key)
+        now = time.monotonic()
+        if entry and entry[0] > now:
+            return entry[1]
+        value = loader(key)
+        with self._lock:
+            storage[key] = (now + self.ttl, value)
+        return value
+
+    @staticmethod
+    def _load_role_permissions(role_id: int) -> frozenset:
+        from ..models.auth_models import Permission, Role
+        from .extensions import db
+        rows = db.session.query(Permission.name).join(Permission.roles).filter(Role.id == role_id).all()
+        return frozenset(name for name, in rows)
+
+    @staticmethod
+    def _load_company(company_id: int):
+        from ..models.auth_models import Company
+        company = Company.query.get(company_id)
+        return TenantConfig(company) if company else None
+
+    def permissions_for_role(self, role_id: int) -> frozenset:
+        return self._get(self._role_permissions, role_id, self._load_role_permissions)
+
+    def tenant_config(self, company_id: int) -> TenantConfig:
+        return self._get(self._companies, company_id, self._load_company)
+
+    def replace_tenant_config(self, company):
+        """Строит новый слепок настроек компании и атомарно подменяет им старый."""
+        config = TenantConfig(company)
+        with self._lock:
+            self._companies[company.id] = (time.monotonic() + self.ttl, config)
+        return config
+
+    def invalidate_role(self, role_id: int):
+        with self._lock:
+            self._role_permissions.pop(role_id, None)
+
+    def invalidate_company(self, company_id: int):
+        with self._lock:
+            self._companies.pop(company_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._role_permissions.clear()
+            self._companies.clear()
@@ -0,0 +1,201 @@
+# app/core/index_advisor.py
+"""
+Советник по индексам для MySQL-базы компании.
+
+Выполняет типовые отчеты в контексте запроса, перехватывает их SELECT-запросы,
+прогоняет каждый через EXPLAIN и для таблиц, которые читаются полным сканированием,
+предлагает недостающие составные индексы из списка CANDIDATE_INDEXES.
+
+    flask --app run index-advisor --company default
+"""
+
+import contextlib
+import io
+from datetime import date, timedelta
+
+import click
+from flask import current_app, g
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import sessionmaker
+
+from .sql_metrics import normalize_statement
+
+# Составные индексы под фильтры отчетов: сначала колонка равенства, затем диапазон дат
+CANDIDATE_INDEXES = {
+    'finances': [
+        ('status_name', 'date_added'),
+        ('status_name', 'date_to'),
+        ('respons_manager_id', 'status_name', 'date_added'),
+        ('estate_sell_id',),
+    ],
+    'estate_deals': [
+        ('deal_status_name', 'agreement_date'),
+        ('deal_status_name', 'preliminary_date'),
+        ('deal_manager_id', 'date_modified'),
+        ('estate_sell_id',),
+    ],
+    'estate_sells': [('house_id', 'estate_sell_category')],
+    'estate_buys': [('date_added',)],
+    'estate_buys_statuses_log': [('log_date', 'status_to_name'), ('estate_buy_id', 'log_date')],
+}
+
+
+def _report_cases(anchor: date):
+    """Типовые вызовы отчетов: (имя, функция без аргументов)."""
+    from ..services import report_service, funnel_service, manager_analytics_service
+    from ..services.data_service import get_all_complex_names
+
+    year, month = anchor.year, anchor.month
+    funnel_start = (anchor - timedelta(days=90)).isoformat()
+
+    def project_dashboard():
+        complex_names = get_all_complex_names()
+        if complex_names:
+            report_service.get_project_dashboard_data(complex_names[0], None)
+
+    return [
+        ('plan_fact_month', lambda: (report_service.get_monthly_summary_by_property_type(year, month),
+                                     report_service.generate_plan_fact_report(year, month, 'Квартира'))),
+        ('plan_fact_period', lambda: report_service.generate_consolidated_report_by_period(year, 'ytd', 'Квартира')),
+        ('project_dashboard', project_dashboard),
+        ('sales_funnel', lambda: funnel_service.get_funnel_data(funnel_start, anchor.isoformat())),
+        ('manager_analytics', lambda: manager_analytics_service.get_manager_analytics_report(year, month)),
+    ]
+
+
+def capture_report_statements(company, anchor: date):
+    """
+    Выполняет отчеты на базе компании и возвращает {отчет: [(SQL, параметры)]}
+    с уникальными (по шаблону) SELECT-запросами к MySQL.
+    """
+    from .extensions import engine_registry
+    from .tenant_config import TenantConfig
+
+    mysql_engine = engine_registry.get_mysql_engine(company)
+    local_engine = engine_registry.get_local_engine(company)
+    captured = []
+
+    def remember(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    event.listen(mysql_engine, 'before_cursor_execute', remember)
+    statements = {}
+    try:
+        for name, func in _report_cases(anchor):
+            captured.clear()
+            with current_app.test_request_context():
+                g.tenant_config = TenantConfig(company)
+                g.company_db_session = sessionmaker(bind=local_engine)()
+                g.mysql_db_session = sessionmaker(bind=mysql_engine)()
+                try:
+                    # Сервисы подробно логируют в stdout — на время прогона глушим вывод
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        func()
+                except Exception as e:
+                    print(f"[INDEX ADVISOR] ⚠️ Отчет '{name}' завершился с ошибкой: {e}")
+                finally:
+                    g.company_db_session.close()
+                    g.mysql_db_session.close()
+            unique = {}
+            for statement, parameters in captured:
+                unique.setdefault(normalize_statement(statement), (statement, parameters))
+            statements[name] = list(unique.values())
+    finally:
+        event.remove(mysql_engine, 'before_cursor_execute', remember)
+    return statements
+
+
+def explain(engine, statement: str, parameters):
+    """
+    План выполнения запроса: [{'table', 'access', 'key', 'rows', 'full_scan'}].
+    Для SQLite (синтетические базы из benchmarks/) используется EXPLAIN QUERY PLAN.
+    """
+    plan = []
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).mappings():
+                words = row['detail'].split()
+                if words[0] not in ('SCAN', 'SEARCH'):
+                    continue
+                plan.append({'table': words[1], 'access': words[0], 'key': None, 'rows': None,
+                             'full_scan': words[0] == 'SCAN' and 'INDEX' not in row['detail']})
+        else:
+            for row in conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings():
+                if not row['table'] or row['table'].startswith('<'):
+                    continue
+                plan.append({'table': row['table'], 'access': row['type'], 'key': row['key'], 'rows': row['rows'],
+                             'full_scan': row['type'] in ('ALL', 'index') or row['key'] is None})
+    return plan
+
+
+def _existing_indexes(engine, table: str):
+    inspector = inspect(engine)
+    indexes = [tuple(index['column_names']) for index in inspector.get_indexes(table)]
+    primary_key = inspector.get_pk_constraint(table).get('constrained_columns')
+    if primary_key:
+        indexes.append(tuple(primary_key))
+    return indexes
+
+
+def suggest_indexes(engine, full_scan_tables):
+    """Кандидаты из CANDIDATE_INDEXES для таблиц с полным сканированием, которых еще нет в базе."""
+    suggestions = []
+    for table in sorted(full_scan_tables):
+        candidates = CANDIDATE_INDEXES.get(table)
+        if not candidates:
+            continue
+        existing = _existing_indexes(engine, table)
+        for columns in candidates:
+            # Индекс уже есть, если какой-то существующий начинается с тех же колонок
+            if any(index[:len(columns)] == columns for index in existing):
+                continue
+            name = f"ix_{table}_{'_'.join(columns)}"[:64]
+            suggestions.append(f"CREATE INDEX {name} ON {table} ({', '.join(columns)});")
+    return suggestions
+
+
+@click.command('index-advisor')
+@click.option('--company', 'subdomain', required=True, help="Поддомен компании")
+@click.option('--anchor-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help="Дата, относительно которой строятся отчеты (по умолчанию сегодня)")
+@with_appcontext
+def index_advisor_command(subdomain, anchor_date):
+    """EXPLAIN типовых запросов отчетов и рекомендации по составным индексам."""
+    from .extensions import engine_registry
+    from ..models.auth_models import Company
+
+    company = Company.query.filter_by(subdomain=subdomain).first()
+    if company is None:
+        raise click.ClickException(f"Компания '{subdomain}' не найдена.")
+    if not company.mysql_db_uri:
+        raise click.ClickException(f"У компании '{subdomain}' не настроена база MySQL.")
+
+    anchor = anchor_date.date() if anchor_date else date.today()
+    engine = engine_registry.get_mysql_engine(company)
+    full_scan_tables = set()
+
+    for report, statements in capture_report_statements(company, anchor).items():
+        click.echo(f"\n=== {report}: {len(statements)} запросов")
+        for statement, parameters in statements:
+            try:
+                plan = explain(engine, statement, parameters)
+            except Exception as e:
+                click.echo(f"  ⚠️ EXPLAIN не выполнен: {e}")
+                continue
+            scans = [step for step in plan if step['full_scan']]
+            if not scans:
+                continue
+            full_scan_tables.update(step['table'] for step in scans)
+            click.echo(f"  ❗ {normalize_statement(statement, max_length=160)}")
+            for step in scans:
+                rows = f", строк ~{step['rows']}" if step['rows'] is not None else ''
+                click.echo(f"     полное сканирование {step['table']} ({step['access']}{rows})")
+
+    suggestions = suggest_indexes(engine, full_scan_tables)
+    click.echo("\n=== Рекомендуемые индексы")
+    if not suggestions:
+        click.echo("  Недостающих индексов не найдено.")
+    for suggestion in suggestions:
+        click.echo(f"  {suggestion}")
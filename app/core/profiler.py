@@ -0,0 +1,111 @@
+# app/core/profiler.py
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import time
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+_UNSAFE_CHARS_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class RequestProfiler:
+    """
+    Профилирование отдельных запросов через cProfile.
+    Включается параметром ?__profile=1 (только для суперадминистратора: профили общие для всех
+    компаний и доступны лишь в разделе суперадмина /admin/profiles) или случайной выборкой
+    с долей PROFILER_SAMPLE_RATE. Результат сохраняется в instance/profiles/ в двух видах:
+    .prof (pstats, для snakeviz и т.п.) и .txt.
+    cProfile видит только поток запроса: работа, отданная в пул core.fanout, в профиль не попадает
+    (в нем будет лишь ожидание результатов).
+    """
+
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.max_files = 200
+        self.profiles_dir = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config.get('PROFILER_SAMPLE_RATE', self.sample_rate)
+        self.max_files = app.config.get('PROFILER_MAX_FILES', self.max_files)
+        self.profiles_dir = os.path.join(app.instance_path, 'profiles')
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+        app.extensions['request_profiler'] = self
+
+    def _should_profile(self):
+        if request.endpoint is None or request.endpoint == 'static':
+            return False
+        if request.args.get('__profile') == '1':
+            return current_user.is_authenticated and current_user.role is not None \
+                and current_user.role.name == 'SUPERADMIN'
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._should_profile():
+            return
+        profiler = cProfile.Profile()
+        g.request_profiler = profiler
+        g.request_profiler_started = time.perf_counter()
+        profiler.enable()
+
+    def _stop(self, exception=None):
+        profiler = g.pop('request_profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        duration_ms = (time.perf_counter() - g.pop('request_profiler_started')) * 1000
+        try:
+            self._save(profiler, duration_ms)
+        except OSError as e:
+            print(f"[PROFILER] ❌ Не удалось сохранить профиль: {e}")
+
+    def _save(self, profiler, duration_ms: float):
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        endpoint = _UNSAFE_CHARS_RE.sub('_', request.endpoint or 'unknown')
+        base_name = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{endpoint}_{duration_ms:.0f}ms"
+
+        profiler.dump_stats(os.path.join(self.profiles_dir, f"{base_name}.prof"))
+
+        report = io.StringIO()
+        report.write(f"{request.method} {request.full_path}\nВремя: {duration_ms:.1f} мс\n\n")
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(80)
+        with open(os.path.join(self.profiles_dir, f"{base_name}.txt"), 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        print(f"[PROFILER] 🔬 Профиль '{base_name}' сохранен")
+        self._prune()
+
+    def _prune(self):
+        files = sorted(self.list_profiles(), key=lambda item: item['name'])
+        for item in files[:max(0, len(files) - self.max_files)]:
+            for extension in ('.prof', '.txt'):
+                path = os.path.join(self.profiles_dir, item['name'] + extension)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def list_profiles(self):
+        """Возвращает сохраненные профили, новые сверху."""
+        if not self.profiles_dir or not os.path.isdir(self.profiles_dir):
+            return []
+        profiles = []
+        for filename in os.listdir(self.profiles_dir):
+            if not filename.endswith('.prof'):
+                continue
+            name = filename[:-len('.prof')]
+            path = os.path.join(self.profiles_dir, filename)
+            profiles.append({
+                'name': name,
+                'size_kb': os.path.getsize(path) / 1024,
+                'created_at': datetime.fromtimestamp(os.path.getmtime(path)),
+                'has_report': os.path.exists(os.path.join(self.profiles_dir, f"{name}.txt")),
+            })
+        return sorted(profiles, key=lambda item: item['name'], reverse=True)
@@ -0,0 +1,122 @@
+# app/core/query_budget.py
+
+import threading
+from collections import deque, Counter
+from datetime import datetime
+from functools import wraps
+
+from flask import g, request, current_app, flash, redirect, url_for, jsonify
+from flask_login import current_user
+from sqlalchemy.exc import OperationalError
+
+# Коды ошибок MySQL, которые означают, что запрос был прерван по таймауту
+MYSQL_TIMEOUT_ERROR_CODES = {
+    3024,  # ER_QUERY_TIMEOUT: maximum statement execution time exceeded
+    1317,  # ER_QUERY_INTERRUPTED
+}
+# 2013 (CR_SERVER_LOST) сюда не входит: это потеря соединения, а не лимит времени запроса,
+# и такая ошибка должна дойти до предохранителя компании
+
+REPORT_TOO_HEAVY_MESSAGE = "Отчет слишком тяжелый для выбранного периода. Сузьте диапазон дат или фильтры."
+
+
+class QueryBudgetLog:
+    """Хранит последние срабатывания лимитов времени отчетов (в памяти процесса)."""
+
+    def __init__(self, maxlen=200):
+        self._events = deque(maxlen=maxlen)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, report_name: str, limit_seconds: float, endpoint: str, company_id, args: dict):
+        with self._lock:
+            self._events.appendleft({
+                'report': report_name,
+                'limit_seconds': limit_seconds,
+                'endpoint': endpoint,
+                'company_id': company_id,
+                'args': args,
+                'at': datetime.now(),
+            })
+            self._counts[report_name] += 1
+        print(f"[QUERY BUDGET] ⏱️ Отчет '{report_name}' превысил лимит {limit_seconds} с. Параметры: {args}")
+
+    def recent(self):
+        return list(self._events)
+
+    def counts(self):
+        return self._counts.most_common()
+
+
+budget_log = QueryBudgetLog()
+
+
+def is_query_timeout(error) -> bool:
+    """Проверяет, что ошибка SQLAlchemy вызвана прерыванием запроса по лимиту времени."""
+    if not isinstance(error, OperationalError):
+        return False
+    args = getattr(error.orig, 'args', None)
+    return bool(args) and args[0] in MYSQL_TIMEOUT_ERROR_CODES
+
+
+def _apply_mysql_budget(session, limit_ms: int):
+    """Выставляет max_execution_time на соединении сессии MySQL."""
+    connection = session.connection()
+    if connection.dialect.name != 'mysql':
+        return
+    connection.exec_driver_sql(f"SET SESSION max_execution_time = {int(limit_ms)}")
+    # Пул сбросит лимит при возврате соединения (см. TenantEngineRegistry)
+    connection.info['query_budget_ms'] = int(limit_ms)
+
+
+def _too_heavy_response():
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        return jsonify({'success': False, 'error': REPORT_TOO_HEAVY_MESSAGE}), 422
+    flash(REPORT_TOO_HEAVY_MESSAGE, "warning")
+    referrer = request.referrer
+    if referrer and referrer != request.url:
+        return redirect(referrer)
+    return redirect(url_for('main.index'))
+
+
+def query_budget(report_name: str, seconds: float = None):
+    """
+    Декоратор, ограничивающий время выполнения SQL-запросов отчета в MySQL.
+    Лимит можно переопределить в конфиге: REPORT_QUERY_BUDGETS = {'имя_отчета': секунды}.
+    Пример: @query_budget('project_dashboard', seconds=20)
+    """
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorated_view(*args, **kwargs):
+            limit_seconds = current_app.config.get('REPORT_QUERY_BUDGETS', {}).get(report_name) \
+                or seconds or current_app.config.get('REPORT_QUERY_BUDGET_DEFAULT', 30)
+
+            mysql_session = getattr(g, 'mysql_db_session', None)
+            if mysql_session is not None:
+                limit_ms = int(limit_seconds * 1000)
+                # Лимит выставляется при первом обращении к MySQL: ответы из кэша соединение не берут
+                if hasattr(mysql_session, 'when_started'):
+                    mysql_session.when_started(lambda session: _apply_mysql_budget(session, limit_ms))
+                else:
+                    _apply_mysql_budget(mysql_session, limit_ms)
+                # Тот же лимит получат сессии параллельных задач (см. core.fanout)
+                g.query_budget_ms = limit_ms
+
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as e:
+                if not is_query_timeout(e):
+                    raise
+                if mysql_session is not None and getattr(mysql_session, 'is_started', True):
+                    mysql_session.rollback()
+                budget_log.record(
+                    report_name, limit_seconds, request.endpoint,
+                    current_user.company_id if current_user.is_authenticated else None,
+                    {**request.view_args, **request.args.to_dict()}
+                )
+                return _too_heavy_response()
+
+        return decorated_view
+
+    return wrapper
@@ -0,0 +1,33 @@
+# app/core/sale_predicates.py
+"""
+Условия «продан / не продан» для объектов (estate_sells).
+
+Объект продан, если по нему есть сделка в одном из статусов продажи компании
+(TenantConfig.sale_statuses). Условие строится как коррелированный EXISTS к estate_deals,
+поэтому остатки считаются на стороне MySQL (anti-join), без выгрузки id проданных
+объектов в Python и обратной отправки огромного NOT IN (...).
+"""
+
+from sqlalchemy import exists
+
+from .tenant_config import current_tenant_config
+from ..models.estate_models import EstateDeal, EstateSell
+
+
+def is_sold(sell_id=EstateSell.id, statuses=None):
+    """
+    EXISTS (SELECT 1 FROM estate_deals WHERE estate_sell_id = sell_id AND deal_status_name IN statuses).
+    По умолчанию — статусы продажи текущей компании. Можно использовать и в filter(),
+    и как колонку выборки: is_sold().label('is_sold').
+    """
+    if statuses is None:
+        statuses = current_tenant_config().sale_statuses
+    return exists().where(
+        EstateDeal.estate_sell_id == sell_id,
+        EstateDeal.deal_status_name.in_(statuses)
+    )
+
+
+def is_unsold(sell_id=EstateSell.id, statuses=None):
+    """NOT EXISTS — объект остается в продаже (по нему нет сделки в статусах продажи)."""
+    return ~is_sold(sell_id, statuses)
@@ -0,0 +1,131 @@
+# app/core/snapshot_cache.py
+
+import threading
+import time
+from datetime import datetime
+
+from flask import g, current_app
+
+from .db_utils import tenant_sessions
+
+
+class SnapshotCache:
+    """
+    Процессный кэш готовых данных тяжелых страниц (секций дашборда проекта) в разрезе компании.
+
+    Работает по схеме stale-while-revalidate:
+      * моложе DASHBOARD_CACHE_TTL — отдается как есть;
+      * старше, но моложе DASHBOARD_CACHE_MAX_STALE — отдается сразу, а пересчет запускается
+        в фоновом потоке;
+      * старше MAX_STALE или отсутствует — считается в текущем запросе.
+    Для каждого ключа одновременно идет не больше одного пересчета (single-flight): параллельные
+    запросы ждут результата первого, а не запускают ту же тяжелую выборку повторно.
+    """
+
+    def __init__(self, app=None):
+        self._entries = {}  # ключ -> (monotonic-время расчета, время расчета для пользователя, данные)
+        self._building = {}  # ключ -> Event идущего расчета
+        self._lock = threading.Lock()
+        self.ttl = 300
+        self.max_stale = 3600
+        self.max_entries = 500
+        self.wait_timeout = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DASHBOARD_CACHE_TTL', self.ttl)
+        self.max_stale = app.config.get('DASHBOARD_CACHE_MAX_STALE', self.max_stale)
+        self.max_entries = app.config.get('DASHBOARD_CACHE_MAX_ENTRIES', self.max_entries)
+        app.extensions['snapshot_cache'] = self
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key: tuple, builder):
+        """
+        Возвращает (данные, время расчета с часовым поясом) для ключа в рамках компании текущего запроса.
+        builder — функция без аргументов, которая считает данные на сессиях из g.
+        """
+        tenant_config = g.tenant_config
+        if not self.enabled or tenant_config is None:
+            return builder(), datetime.now().astimezone()
+
+        key = (tenant_config.id,) + tuple(key)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry:
+            age = now - entry[0]
+            if age < self.ttl:
+                return entry[2], entry[1]
+            if age < self.max_stale:
+                self._refresh_in_background(key, builder, tenant_config)
+                return entry[2], entry[1]
+        return self._build_now(key, builder)
+
+    def _build_now(self, key, builder):
+        with self._lock:
+            event = self._building.get(key)
+            owner = event is None
+            if owner:
+                event = self._building[key] = threading.Event()
+
+        if not owner:
+            # Тот же расчет уже идет в другом потоке — ждем его результата
+            event.wait(self.wait_timeout)
+            entry = self._entries.get(key)
+            if entry:
+                return entry[2], entry[1]
+            return builder(), datetime.now().astimezone()
+
+        try:
+            value = builder()
+            built_at = self._store(key, value)
+            return value, built_at
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            event.set()
+
+    def _refresh_in_background(self, key, builder, tenant_config):
+        with self._lock:
+            if key in self._building:
+                return
+            event = self._building[key] = threading.Event()
+
+        app = current_app._get_current_object()
+
+        def refresh():
+            try:
+                with app.app_context(), tenant_sessions(tenant_config):
+                    self._store(key, builder())
+            except Exception as e:
+                print(f"[SNAPSHOT CACHE] ❌ Не удалось обновить {key[1:]} компании ID {key[0]}: {e}")
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+                event.set()
+
+        threading.Thread(target=refresh, name='snapshot-refresh', daemon=True).start()
+
+    def _store(self, key, value):
+        built_at = datetime.now().astimezone()
+        with self._lock:
+            self._entries[key] = (time.monotonic(), built_at, value)
+            if len(self._entries) > self.max_entries:
+                # Вытесняем самые старые снимки
+                oldest = sorted(self._entries, key=lambda k: self._entries[k][0])
+                for old_key in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[old_key]
+        return built_at
+
+    def invalidate(self, company_id: int, *prefix):
+        """Удаляет снимки компании (все или начинающиеся с prefix)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == company_id and k[1:1 + len(prefix)] == prefix]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,191 @@
+# app/core/sql_metrics.py
+
+import re
+import threading
+import time
+from collections import deque
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\]|'\?')\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str, max_length: int = 500) -> str:
+    """Приводит SQL к шаблону: литералы и списки IN заменяются на '?', пробелы схлопываются."""
+    normalized = _STRING_LITERAL_RE.sub("'?'", statement)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip()
+    return normalized[:max_length]
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class RequestSqlStats:
+    """Счетчики SQL одного HTTP-запроса."""
+
+    def __init__(self, top_n: int):
+        self.top_n = top_n
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest = []  # [(секунды, нормализованный SQL)], не длиннее top_n
+        # Запросы одного HTTP-запроса могут идти из нескольких потоков (см. core.fanout)
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, elapsed: float):
+        with self._lock:
+            self.query_count += 1
+            self.db_time += elapsed
+            if len(self.slowest) < self.top_n or elapsed > self.slowest[-1][0]:
+                self.slowest.append((elapsed, normalize_statement(statement)))
+                self.slowest.sort(key=lambda item: item[0], reverse=True)
+                del self.slowest[self.top_n:]
+
+
+class PerfStore:
+    """
+    Кольцевой буфер замеров по эндпоинтам (в памяти процесса).
+    Для каждого эндпоинта хранится последние N запросов и сводка самых медленных SQL.
+    """
+
+    def __init__(self, buffer_size=500, max_statements=50):
+        self.buffer_size = buffer_size
+        self.max_statements = max_statements
+        self._samples = {}
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, duration: float, stats: RequestSqlStats):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.buffer_size)
+            samples.append((duration, stats.db_time, stats.query_count))
+
+            statements = self._statements.setdefault(endpoint, {})
+            for elapsed, sql in stats.slowest:
+                entry = statements.setdefault(sql, {'count': 0, 'total': 0.0, 'max': 0.0})
+                entry['count'] += 1
+                entry['total'] += elapsed
+                entry['max'] = max(entry['max'], elapsed)
+            if len(statements) > self.max_statements:
+                # Оставляем только самые тяжелые по суммарному времени шаблоны
+                keep = sorted(statements.items(), key=lambda item: item[1]['total'], reverse=True)
+                self._statements[endpoint] = dict(keep[:self.max_statements])
+
+    def summary(self):
+        """Возвращает сводку p50/p95/max по эндпоинтам, отсортированную по p95."""
+        with self._lock:
+            snapshot = {endpoint: list(samples) for endpoint, samples in self._samples.items()}
+            statements = {endpoint: dict(items) for endpoint, items in self._statements.items()}
+
+        rows = []
+        for endpoint, samples in snapshot.items():
+            durations = sorted(s[0] * 1000 for s in samples)
+            db_times = sorted(s[1] * 1000 for s in samples)
+            queries = [s[2] for s in samples]
+            top_statements = sorted(statements.get(endpoint, {}).items(),
+                                    key=lambda item: item[1]['total'], reverse=True)[:10]
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(samples),
+                'p50_ms': _percentile(durations, 50),
+                'p95_ms': _percentile(durations, 95),
+                'max_ms': durations[-1],
+                'db_p50_ms': _percentile(db_times, 50),
+                'db_p95_ms': _percentile(db_times, 95),
+                'avg_queries': sum(queries) / len(queries),
+                'max_queries': max(queries),
+                'statements': [
+                    {'sql': sql, 'count': e['count'], 'total_ms': e['total'] * 1000, 'max_ms': e['max'] * 1000}
+                    for sql, e in top_statements
+                ],
+            })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._statements.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('sql_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('sql_metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if not has_request_context():
+        return
+    stats = g.get('sql_stats')
+    if stats is not None:
+        stats.add(statement, elapsed)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute при ошибке не вызывается — снимаем отметку времени сами
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('sql_metrics_started'):
+        conn.info['sql_metrics_started'].pop()
+
+
+class SqlInstrumentation:
+    """
+    Подсчет SQL-запросов для каждого HTTP-запроса.
+    Слушатели вешаются на класс Engine, поэтому покрывают и управляющую базу,
+    и движки компаний из TenantEngineRegistry. Итог отдается в заголовке Server-Timing
+    и копится в PerfStore для страницы /admin/perf.
+    """
+
+    def __init__(self, app=None):
+        self.store = PerfStore()
+        self.top_n = 5
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_METRICS_ENABLED', True):
+            return
+        self.top_n = app.config.get('SQL_METRICS_TOP_N', self.top_n)
+        self.store.buffer_size = app.config.get('SQL_METRICS_BUFFER_SIZE', self.store.buffer_size)
+
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            self._listening = True
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['sql_metrics'] = self
+
+    def _start_request(self):
+        g.sql_stats = RequestSqlStats(self.top_n)
+        g.sql_request_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        stats = g.get('sql_stats')
+        if stats is None or request.endpoint is None or request.endpoint == 'static':
+            return response
+        duration = time.perf_counter() - g.sql_request_started
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.db_time * 1000:.1f};desc="SQL x{stats.query_count}", '
+            f'app;dur={(duration - stats.db_time) * 1000:.1f}, total;dur={duration * 1000:.1f}'
+        )
+        self.store.record(request.endpoint, duration, stats)
+        return response
@@ -0,0 +1,65 @@
+# app/core/tenant_config.py
+
+from flask import g
+from flask_login import current_user
+
+DEFAULT_SALE_STATUSES = ('Сделка в работе', 'Сделка проведена')
+DEFAULT_INVENTORY_STATUSES = ('Маркетинговый резерв', 'Подбор', 'Бронь')
+
+
+def parse_status_list(raw: str, default: tuple) -> tuple:
+    """Разбирает строку статусов через запятую, как она хранится в Company."""
+    if raw:
+        return tuple(status.strip() for status in raw.split(','))
+    return default
+
+
+class TenantConfig:
+    """
+    Неизменяемый слепок настроек компании: разобранные статусы, почта и строки подключения.
+    Строится один раз и заменяется целиком при сохранении настроек, поэтому
+    его можно безопасно держать в памяти процесса и передавать в сервисы.
+    """
+    __slots__ = (
+        'id', 'name', 'subdomain', 'db_uri', 'mysql_db_uri',
+        'sale_statuses', 'sale_status_set', 'inventory_statuses', 'inventory_status_set',
+        'mail_server', 'mail_port', 'mail_use_tls', 'mail_username', 'mail_password',
+    )
+
+    def __init__(self, company):
+        values = {
+            'id': company.id,
+            'name': company.name,
+            'subdomain': company.subdomain,
+            'db_uri': company.db_uri,
+            'mysql_db_uri': company.mysql_db_uri,
+            'sale_statuses': parse_status_list(company.deal_statuses, DEFAULT_SALE_STATUSES),
+            'inventory_statuses': parse_status_list(company.inventory_statuses, DEFAULT_INVENTORY_STATUSES),
+            'mail_server': company.mail_server,
+            'mail_port': company.mail_port,
+            'mail_use_tls': company.mail_use_tls,
+            'mail_username': company.mail_username,
+            'mail_password': company.mail_password,
+        }
+        values['sale_status_set'] = frozenset(values['sale_statuses'])
+        values['inventory_status_set'] = frozenset(values['inventory_statuses'])
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TenantConfig неизменяем, постройте новый слепок.")
+
+    def __repr__(self):
+        return f'<TenantConfig {self.name}>'
+
+
+def current_tenant_config():
+    """
+    Возвращает слепок настроек компании текущего пользователя.
+    В запросе он уже лежит в g (см. before_request), иначе берется из кэша.
+    """
+    config = getattr(g, 'tenant_config', None)
+    if config is None and current_user.is_authenticated:
+        from .extensions import identity_cache
+        config = identity_cache.tenant_config(current_user.company_id)
+    return config
@@ -0,0 +1,121 @@
+# app/core/tenant_health.py
+
+import threading
+import time
+from datetime import datetime
+
+
+class TenantCircuitBreaker:
+    """
+    Автомат "предохранитель" для внешней базы одной компании.
+    closed    — база работает, запросы идут как обычно;
+    open      — после N ошибок подряд запросы сразу отклоняются;
+    half_open — после паузы пропускается один пробный запрос.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, company_id: int, failure_threshold: int, reset_timeout: float):
+        self.company_id = company_id
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.last_failure_at = None
+        self.last_success_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                # Пропускаем ровно один пробный запрос
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+            self.last_success_at = datetime.now()
+
+    def record_failure(self, error):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            self.last_failure_at = datetime.now()
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"[TENANT HEALTH] ⛔ MySQL компании ID {self.company_id} недоступен, предохранитель открыт")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def seconds_until_probe(self):
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def as_dict(self):
+        return {
+            'company_id': self.company_id,
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'total_failures': self.total_failures,
+            'last_error': self.last_error,
+            'last_failure_at': self.last_failure_at,
+            'last_success_at': self.last_success_at,
+            'seconds_until_probe': round(self.seconds_until_probe(), 1),
+        }
+
+
+class TenantHealthRegistry:
+    """Хранит состояние предохранителей MySQL для всех компаний процесса."""
+
+    def __init__(self, app=None):
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self.failure_threshold = 3
+        self.reset_timeout = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.failure_threshold = app.config.get('TENANT_BREAKER_FAILURE_THRESHOLD', self.failure_threshold)
+        self.reset_timeout = app.config.get('TENANT_BREAKER_RESET_TIMEOUT', self.reset_timeout)
+        app.extensions['tenant_health'] = self
+
+    def get(self, company_id: int) -> TenantCircuitBreaker:
+        breaker = self._breakers.get(company_id)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    company_id, TenantCircuitBreaker(company_id, self.failure_threshold, self.reset_timeout)
+                )
+        return breaker
+
+    def reset(self, company_id: int):
+        self.get(company_id).reset()
+
+    def snapshot(self):
+        return {company_id: breaker.as_dict() for company_id, breaker in list(self._breakers.items())}
@@ -1,6 +1,7 @@
 # app/models/auth_models.py
 
-from app.core.extensions import db
+from app.core.extensions import db, identity_cache
+from app.core.tenant_config import parse_status_list, DEFAULT_SALE_STATUSES, DEFAULT_INVENTORY_STATUSES
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -19,18 +20,15 @@ class Company(db.Model):
     deal_statuses = db.Column(db.String(500), nullable=True, default='Сделка в работе,Сделка проведена')
     inventory_statuses = db.Column(db.String(500), nullable=True, default='Маркетинговый резерв,Подбор,Бронь')
 
+    # Сервисам лучше брать уже разобранные статусы из core.tenant_config.current_tenant_config()
     @property
     def inventory_status_list(self):
-        if self.inventory_statuses:
-            return [status.strip() for status in self.inventory_statuses.split(',')]
-        return ['Маркетинговый резерв', 'Подбор', 'Бронь']
+        return list(parse_status_list(self.inventory_statuses, DEFAULT_INVENTORY_STATUSES))
 
     @property
     def sale_statuses(self):
-        if self.deal_statuses:
-            return [status.strip() for status in self.deal_statuses.split(',')]
         # Значение по умолчанию, если ничего не настроено
-        return ['Сделка в работе', 'Сделка проведена']
+        return list(parse_status_list(self.deal_statuses, DEFAULT_SALE_STATUSES))
     # --- Настройки почты ---
     mail_server = db.Column(db.String(120), default='mail.gh.uz')
     mail_port = db.Column(db.Integer, default=587)
@@ -91,9 +89,10 @@ class User(db.Model, UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     def can(self, permission_name):
-        if self.role:
-            return any(p.name == permission_name for p in self.role.permissions)
-        return False
+        if self.role_id is None:
+            return False
+        # Права роли берутся из кэша процесса, без ленивой загрузки role.permissions
+        return permission_name in identity_cache.permissions_for_role(self.role_id)
     def __repr__(self):
         return f'<User {self.username}>'
 
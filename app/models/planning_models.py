@@ -126,3 +126,16 @@ class ManagerSalesPlan(db.Model):
     __table_args__ = (
         db.UniqueConstraint('manager_id', 'year', 'month', name='_manager_plan_period_uc'),
     )
+
+
+class Holiday(db.Model):
+    """Праздничные (нерабочие) дни компании для расчета рабочих дней и прогнозов план-факта."""
+    __tablename__ = 'holidays'
+    id = db.Column(db.Integer, primary_key=True)
+    holiday_date = db.Column(db.Date, nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    # Ежегодный праздник с фиксированной датой: год в holiday_date не учитывается
+    is_recurring = db.Column(db.Boolean, nullable=False, default=False)
+    __table_args__ = (
+        db.UniqueConstraint('holiday_date', 'is_recurring', name='_holiday_date_uc'),
+    )
@@ -12,4 +12,51 @@ class SyncLog(db.Model):
     details = db.Column(db.Text, nullable=True) # Дополнительная информация или текст ошибки
 
     def __repr__(self):
-        return f'<SyncLog {self.last_sync_timestamp} [{self.status}]>'
\ No newline at end of file
+        return f'<SyncLog {self.last_sync_timestamp} [{self.status}]>'
+
+class MonthlyFactCube(db.Model):
+    """
+    Локальный агрегат фактов из MySQL по (ЖК, категория, год, месяц).
+    Пересчитывается инкрементально (см. services/fact_cube_service.py), отметки синхронизации — в SyncLog.
+    """
+    __tablename__ = 'monthly_fact_cube'
+    __table_args__ = (
+        db.UniqueConstraint('complex_name', 'property_category', 'year', 'month', name='_fact_cube_bucket_uc'),
+        db.Index('ix_monthly_fact_cube_year_month', 'year', 'month'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    complex_name = db.Column(db.String(255), nullable=False)
+    property_category = db.Column(db.String(100), nullable=False)  # системное имя из MySQL: 'flat', 'comm', ...
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    fact_units = db.Column(db.Integer, nullable=False, default=0)
+    fact_volume = db.Column(db.Float, nullable=False, default=0.0)
+    paid_income = db.Column(db.Float, nullable=False, default=0.0)  # без возвратов и уступок, как в план-факте
+    paid_total = db.Column(db.Float, nullable=False, default=0.0)  # все проведенные платежи, как на дашборде
+    expected_income = db.Column(db.Float, nullable=False, default=0.0)
+    refunds = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class MonthlyPriceSeries(db.Model):
+    """
+    Средняя цена продажи м² по (ЖК, категория, год, месяц) для графиков динамики цен.
+    Хранятся сумма цен м² и число сделок, чтобы среднее совпадало с AVG по сделкам.
+    Пересчитываются только месяцы с новыми или измененными сделками (см. services/price_series_service.py).
+    """
+    __tablename__ = 'monthly_price_series'
+    __table_args__ = (
+        db.UniqueConstraint('complex_name', 'property_category', 'year', 'month', name='_price_series_bucket_uc'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    complex_name = db.Column(db.String(255), nullable=False)
+    property_category = db.Column(db.String(100), nullable=False)  # системное имя из MySQL: 'flat', 'comm', ...
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    deals_count = db.Column(db.Integer, nullable=False, default=0)
+    price_per_sqm_sum = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    @property
+    def avg_price_per_sqm(self):
+        return self.price_per_sqm_sum / self.deals_count if self.deals_count else 0.0
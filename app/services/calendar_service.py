@@ -0,0 +1,180 @@
+# app/services/calendar_service.py
+"""
+Производственный календарь компании: выходные (сб, вс) и праздники из таблицы holidays
+в локальной базе. Для каждого набора лет строится numpy.busdaycalendar и кэшируется в процессе,
+поэтому рабочие дни для любого набора месяцев считаются одной векторной операцией.
+"""
+
+import threading
+import time
+import weakref
+from datetime import date
+
+import numpy as np
+from flask import g, current_app
+from sqlalchemy import inspect
+
+from ..core.date_ranges import add_months
+from ..core.tenant_config import current_tenant_config
+from ..models.planning_models import Holiday
+
+# Государственные праздники Узбекистана с фиксированной датой. Хайиты (Рамазан и Курбан)
+# переходящие — их даты компания добавляет на странице настроек каждый год.
+DEFAULT_HOLIDAYS = [
+    (1, 1, 'Новый год'),
+    (3, 8, 'Международный женский день'),
+    (3, 21, 'Навруз'),
+    (5, 9, 'День памяти и почестей'),
+    (9, 1, 'День независимости'),
+    (10, 1, 'День учителя и наставника'),
+    (12, 8, 'День Конституции'),
+]
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+_ready_engines = weakref.WeakSet()
+
+
+def seed_default_holidays(connection):
+    """Добавляет праздники по умолчанию в только что созданную таблицу holidays."""
+    connection.execute(Holiday.__table__.insert(), [
+        {'holiday_date': date(2000, month, day), 'name': name, 'is_recurring': True}
+        for month, day, name in DEFAULT_HOLIDAYS
+    ])
+
+
+def _ensure_table():
+    """
+    Создает таблицу праздников в базе компании. Праздники по умолчанию добавляются только
+    при создании таблицы: если компания удалила их все, они не должны вернуться.
+    Работает в отдельной транзакции, не затрагивая сессию вызывающего кода.
+    """
+    engine = g.company_db_session.get_bind()
+    if engine in _ready_engines:
+        return
+    with engine.begin() as connection:
+        if not inspect(connection).has_table(Holiday.__tablename__):
+            Holiday.__table__.create(bind=connection)
+            seed_default_holidays(connection)
+    _ready_engines.add(engine)
+
+
+# ---------------------------------------------------------------------------
+#  Праздники
+# ---------------------------------------------------------------------------
+
+def get_all_holidays():
+    _ensure_table()
+    return g.company_db_session.query(Holiday).order_by(Holiday.is_recurring.desc(), Holiday.holiday_date).all()
+
+
+def add_holiday(holiday_date: date, name: str, is_recurring: bool = False):
+    """Добавляет праздник. Возвращает (сообщение, категория) для flash."""
+    _ensure_table()
+    if is_recurring:
+        # Для ежегодного праздника важны только месяц и день, год приводим к високосному 2000
+        holiday_date = date(2000, holiday_date.month, holiday_date.day)
+    exists = g.company_db_session.query(Holiday.id).filter_by(holiday_date=holiday_date,
+                                                              is_recurring=is_recurring).first()
+    if exists:
+        return "Такой праздник уже есть в календаре.", "warning"
+    g.company_db_session.add(Holiday(holiday_date=holiday_date, name=name, is_recurring=is_recurring))
+    g.company_db_session.commit()
+    invalidate(current_tenant_config().id)
+    return f"Праздник '{name}' добавлен.", "success"
+
+
+def delete_holiday(holiday_id: int):
+    _ensure_table()
+    holiday = g.company_db_session.get(Holiday, holiday_id)
+    if not holiday:
+        return "Праздник не найден.", "danger"
+    g.company_db_session.delete(holiday)
+    g.company_db_session.commit()
+    invalidate(current_tenant_config().id)
+    return f"Праздник '{holiday.name}' удален.", "success"
+
+
+def _holiday_dates(years):
+    """Даты праздников за указанные годы (ежегодные разворачиваются на каждый год)."""
+    _ensure_table()
+    dates = []
+    for holiday in g.company_db_session.query(Holiday).all():
+        if not holiday.is_recurring:
+            if holiday.holiday_date.year in years:
+                dates.append(holiday.holiday_date)
+            continue
+        for year in years:
+            try:
+                dates.append(holiday.holiday_date.replace(year=year))
+            except ValueError:
+                # 29 февраля в невисокосный год
+                pass
+    return dates
+
+
+# ---------------------------------------------------------------------------
+#  Календарь и рабочие дни
+# ---------------------------------------------------------------------------
+
+def invalidate(company_id: int = None):
+    """Сбрасывает закэшированные календари компании (или всех компаний)."""
+    with _calendars_lock:
+        for key in [key for key in _calendars if company_id is None or key[0] == company_id]:
+            del _calendars[key]
+
+
+def get_busdaycalendar(years):
+    """numpy.busdaycalendar с праздниками компании за указанные годы (кэшируется на CALENDAR_CACHE_TTL)."""
+    key = (current_tenant_config().id, tuple(sorted(set(years))))
+    now = time.monotonic()
+    entry = _calendars.get(key)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    holidays = np.array(_holiday_dates(key[1]), dtype='datetime64[D]')
+    calendar = np.busdaycalendar(weekmask='1111100', holidays=holidays)
+    ttl = current_app.config.get('CALENDAR_CACHE_TTL', 3600)
+    with _calendars_lock:
+        _calendars[key] = (now + ttl, calendar)
+    return calendar
+
+
+def workday_arrays(months, today: date = None):
+    """
+    Рабочие дни для набора месяцев [(год, месяц), ...] одной векторной операцией.
+    Возвращает (total, elapsed) — массивы numpy той же длины:
+        total   — рабочих дней в месяце;
+        elapsed — прошло рабочих дней к сегодняшнему дню для текущего месяца, для остальных
+                  месяцев равно total; не меньше 1, чтобы на него можно было делить в прогнозах.
+    """
+    months = list(months)
+    if not months:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    starts = np.array([date(year, month, 1) for year, month in months], dtype='datetime64[D]')
+    ends = np.array([add_months(date(year, month, 1), 1) for year, month in months], dtype='datetime64[D]')
+    calendar = get_busdaycalendar(year for year, _ in months)
+
+    total = np.busday_count(starts, ends, busdaycal=calendar)
+    today = np.datetime64(today or date.today(), 'D')
+    is_current = (starts <= today) & (today < ends)
+    elapsed = np.where(is_current, np.busday_count(starts, np.full(len(months), today), busdaycal=calendar), total)
+    return total, np.maximum(elapsed, 1)
+
+
+def get_workdays(year: int, month: int):
+    """Рабочие дни месяца: (всего, прошло на сегодня, не меньше 1)."""
+    total, elapsed = workday_arrays([(year, month)])
+    return int(total[0]), int(elapsed[0])
+
+
+def forecast_percent(fact, plan, elapsed, total):
+    """
+    Прогноз выполнения плана в процентах при сохранении текущего темпа:
+    fact / elapsed * total / plan * 100, где plan > 0, иначе 0. Аргументы — числа или массивы.
+    """
+    fact = np.asarray(fact, dtype=float)
+    plan = np.asarray(plan, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        forecast = fact / elapsed * total / plan * 100
+    return np.where(plan > 0, forecast, 0.0)
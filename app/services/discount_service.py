@@ -5,15 +5,16 @@ import copy
 from datetime import date, datetime
 from collections import defaultdict
 
-from flask_login import current_user
+from ..core.tenant_config import current_tenant_config
+from ..core.sale_predicates import is_sold
 from sqlalchemy.orm import joinedload
 from flask import g, render_template_string
 import requests
 import pandas as pd
 import io
-from ..core.extensions import db
+from ..core.extensions import db, snapshot_cache
 from ..models import planning_models
-from ..models.estate_models import EstateSell, EstateDeal
+from ..models.estate_models import EstateSell
 from .email_service import send_email
 from . import currency_service
 
@@ -154,22 +155,23 @@ def get_discounts_with_summary():
     for d in all_discounts:
         discounts_map[d.complex_name].append(d)
 
-    sold_statuses = current_user.company.sale_statuses
-    sold_sell_ids_query = g.mysql_db_session.query(EstateDeal.estate_sell_id).filter(
-        EstateDeal.deal_status_name.in_(sold_statuses)
-    )
-    sold_sell_ids = {row[0] for row in sold_sell_ids_query.all()}
-    print(f"[ЛОГ СКИДОК] ✅ Найдено {len(sold_sell_ids)} проданных объектов со статусами: {sold_statuses}")
+    sold_statuses = current_tenant_config().sale_statuses
 
-    all_sells = g.mysql_db_session.query(EstateSell).options(joinedload(EstateSell.house)).all()
+    # Признак продажи вычисляется в MySQL (NOT EXISTS по сделкам), без выгрузки id проданных объектов
+    all_sells = g.mysql_db_session.query(EstateSell, is_sold(statuses=sold_statuses).label('is_sold')).options(
+        joinedload(EstateSell.house)).all()
     sells_by_complex = defaultdict(list)
-    for s in all_sells:
+    sells_complex_names = set()
+    for s, sold in all_sells:
         if s.house:
-            sells_by_complex[s.house.complex_name].append(s)
+            sells_complex_names.add(s.house.complex_name)
+            if not sold:
+                sells_by_complex[s.house.complex_name].append(s)
+    print(f"[ЛОГ СКИДОК] ✅ Найдено {sum(len(v) for v in sells_by_complex.values())} непроданных объектов "
+          f"(статусы продажи: {sold_statuses})")
 
     # --- НОВЫЙ БЛОК ЛОГИРОВАНИЯ ДЛЯ ДИАГНОСТИКИ ---
     discount_complex_names = set(discounts_map.keys())
-    sells_complex_names = set(sells_by_complex.keys())
 
     unmatched_discounts = discount_complex_names - sells_complex_names
     if unmatched_discounts:
@@ -213,7 +215,7 @@ def get_discounts_with_summary():
         sells_in_complex = sells_by_complex.get(complex_name, [])
 
         for sell in sells_in_complex:
-            if sell.id in sold_sell_ids or not sell.estate_sell_category:
+            if not sell.estate_sell_category:
                 continue
 
             try:
@@ -365,6 +367,8 @@ def activate_version(version_id: int, activation_comment: str = None):
     target_version.is_active = True
     target_version.was_ever_activated = True
     g.company_db_session.commit()
+    # Стоимость остатков на дашбордах считается по активной версии скидок
+    snapshot_cache.invalidate(current_tenant_config().id, 'dashboard')
 
     if old_active_version:
         comments_data = json.loads(target_version.changes_summary_json) if target_version.changes_summary_json else None
@@ -8,16 +8,17 @@ from flask_login import current_user
 
 from ..models import auth_models
 from ..core.extensions import db
+from ..core.tenant_config import current_tenant_config
 
 
 def send_email(subject, html_body):
     """Отправляет email-сообщение получателям ТЕКУЩЕЙ компании."""
 
-    if not current_user.is_authenticated or not current_user.company:
+    company_config = current_tenant_config()
+    if company_config is None:
         print("[EMAIL SERVICE] ❌ ОШИБКА: Не удалось определить компанию для отправки письма.")
         return
 
-    company_config = current_user.company
     sender_email = company_config.mail_username
 
     # --- ИСПРАВЛЕННАЯ ЛОГИКА ПОЛУЧЕНИЯ АДРЕСАТОВ ---
@@ -0,0 +1,255 @@
+# app/services/fact_cube_service.py
+"""
+Помесячный куб фактов в локальной базе компании (MonthlyFactCube).
+
+Вместо сканирования finances и estate_deals в MySQL на каждом открытии страницы отчеты
+читают готовые суммы по (ЖК, категория, год, месяц). Куб обновляется инкрементально:
+в SyncLog.details (JSON) хранятся отметки — максимальные date_modified и id сделок и id
+финансовых операций. При синхронизации пересчитываются только месяцы, которых коснулись новые
+или измененные строки, плюс «горячее окно» вокруг текущего месяца: у finances нет даты
+изменения, а смена статуса 'К оплате' -> 'Paid' переносит сумму между месяцами.
+Полная пересборка — при первом запуске, смене статусов сделок компании или по расписанию.
+"""
+
+from datetime import date, datetime, timedelta
+
+from flask import g, current_app
+from sqlalchemy import func, extract, case, or_, and_
+
+from ..core.date_ranges import add_months, in_month, coalesce_in_range, month_range
+from ..core.tenant_config import current_tenant_config
+from ..models.estate_models import EstateDeal, EstateHouse, EstateSell
+from ..models.finance_models import FinanceOperation
+from ..models.system_models import MonthlyFactCube
+from . import sync_state_service
+
+FACT_CUBE_SYNC_KIND = 'fact_cube'
+CUBE_METRICS = ('fact_units', 'fact_volume', 'paid_income', 'paid_total', 'expected_income', 'refunds')
+
+REFUND_TYPE = "Возврат поступлений при отмене сделки"
+ASSIGNMENT_TYPE = "Уступка права требования"
+
+def get_last_sync():
+    """Последняя успешная синхронизация куба: (SyncLog, отметки) или (None, {})."""
+    sync_state_service.ensure_tables(MonthlyFactCube)
+    return sync_state_service.get_last_sync(FACT_CUBE_SYNC_KIND)
+
+
+def is_fresh():
+    """
+    Можно ли читать отчеты из куба: он включен, синхронизирован не позднее FACT_CUBE_MAX_AGE_MINUTES
+    назад и посчитан с текущими статусами сделок компании. Результат запоминается на запрос.
+    """
+    if 'fact_cube_fresh' not in g:
+        fresh = False
+        if current_app.config.get('FACT_CUBE_ENABLED', True):
+            log, marks = get_last_sync()
+            max_age = timedelta(minutes=current_app.config.get('FACT_CUBE_MAX_AGE_MINUTES', 30))
+            fresh = bool(log) and datetime.now() - log.last_sync_timestamp <= max_age and \
+                marks.get('sale_statuses') == list(current_tenant_config().sale_statuses)
+        g.fact_cube_fresh = fresh
+    return g.fact_cube_fresh
+
+
+# ---------------------------------------------------------------------------
+#  Чтение
+# ---------------------------------------------------------------------------
+
+def get_cube_rows(start_date: date, end_date: date, complex_name: str = None, property_category: str = None):
+    """
+    Строки куба за полные месяцы полуинтервала [start_date, end_date).
+    Границы должны приходиться на первое число месяца.
+    """
+    first_key = start_date.year * 100 + start_date.month
+    last_month = end_date - timedelta(days=1)
+    last_key = last_month.year * 100 + last_month.month
+    query = g.company_db_session.query(MonthlyFactCube).filter(
+        (MonthlyFactCube.year * 100 + MonthlyFactCube.month).between(first_key, last_key)
+    )
+    if complex_name:
+        query = query.filter(MonthlyFactCube.complex_name == complex_name)
+    if property_category:
+        query = query.filter(func.lower(MonthlyFactCube.property_category) == property_category.lower())
+    return query.all()
+
+
+def covers_range(start_date: date, end_date: date):
+    """Куб можно использовать для диапазона, только если он состоит из целых месяцев."""
+    return start_date.day == 1 and end_date.day == 1 and is_fresh()
+
+
+# ---------------------------------------------------------------------------
+#  Агрегация в MySQL
+# ---------------------------------------------------------------------------
+
+def _aggregate_deals(months):
+    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
+    query = g.mysql_db_session.query(
+        EstateHouse.complex_name,
+        func.coalesce(EstateSell.estate_sell_category, '').label('category'),
+        extract('year', effective_date).label('year'),
+        extract('month', effective_date).label('month'),
+        func.count(EstateDeal.id).label('fact_units'),
+        func.sum(EstateDeal.deal_sum).label('fact_volume')
+    ).join(EstateSell, EstateDeal.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(
+        EstateDeal.deal_status_name.in_(current_tenant_config().sale_statuses),
+        effective_date.isnot(None)
+    )
+    if months is not None:
+        query = query.filter(or_(*[
+            coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date, *month_range(year, month))
+            for year, month in months
+        ]))
+    return query.group_by('complex_name', 'category', 'year', 'month').all()
+
+
+def _aggregate_finances(months):
+    is_paid = FinanceOperation.status_name == "Paid"
+    is_due = FinanceOperation.status_name == "К оплате"
+    is_refund = FinanceOperation.payment_type == REFUND_TYPE
+    bucket_date = case((is_paid, FinanceOperation.date_added), else_=FinanceOperation.date_to)
+    is_paid_income = is_paid & (FinanceOperation.payment_type != REFUND_TYPE) & \
+                     (FinanceOperation.payment_type != ASSIGNMENT_TYPE)
+
+    query = g.mysql_db_session.query(
+        EstateHouse.complex_name,
+        func.coalesce(EstateSell.estate_sell_category, '').label('category'),
+        extract('year', bucket_date).label('year'),
+        extract('month', bucket_date).label('month'),
+        func.sum(case((is_paid_income, FinanceOperation.summa), else_=0)).label('paid_income'),
+        func.sum(case((is_paid, FinanceOperation.summa), else_=0)).label('paid_total'),
+        func.sum(case((is_due & ~is_refund, FinanceOperation.summa), else_=0)).label('expected_income'),
+        func.sum(case((is_due & is_refund, FinanceOperation.summa), else_=0)).label('refunds')
+    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(or_(is_paid & FinanceOperation.date_added.isnot(None), is_due & FinanceOperation.date_to.isnot(None)))
+    if months is not None:
+        query = query.filter(or_(*[
+            (is_paid & in_month(FinanceOperation.date_added, year, month)) |
+            (is_due & in_month(FinanceOperation.date_to, year, month))
+            for year, month in months
+        ]))
+    return query.group_by('complex_name', 'category', 'year', 'month').all()
+
+
+def _build_buckets(months):
+    buckets = {}
+
+    def bucket(row):
+        key = (row.complex_name, row.category, int(row.year), int(row.month))
+        if key not in buckets:
+            buckets[key] = dict.fromkeys(CUBE_METRICS, 0)
+        return buckets[key]
+
+    for row in _aggregate_deals(months):
+        metrics = bucket(row)
+        metrics['fact_units'] += row.fact_units
+        metrics['fact_volume'] += row.fact_volume or 0
+    for row in _aggregate_finances(months):
+        metrics = bucket(row)
+        for key in ('paid_income', 'paid_total', 'expected_income', 'refunds'):
+            metrics[key] += row._mapping[key] or 0
+    return buckets
+
+
+# ---------------------------------------------------------------------------
+#  Синхронизация
+# ---------------------------------------------------------------------------
+
+def deal_watermarks():
+    """Отметки сделок: максимальные date_modified и id (общие для куба и ряда цен м²)."""
+    last_modified, last_deal_id = g.mysql_db_session.query(func.max(EstateDeal.date_modified),
+                                                           func.max(EstateDeal.id)).one()
+    return {
+        'last_deal_modified': last_modified.isoformat() if last_modified else None,
+        'last_deal_id': last_deal_id or 0,
+    }
+
+
+def changed_deal_months(marks: dict):
+    """Месяцы (по дате сделки), которых коснулись сделки, появившиеся или измененные после отметок marks."""
+    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
+    changed = EstateDeal.id > marks.get('last_deal_id', 0)
+    if marks.get('last_deal_modified'):
+        # date_modified — дата без времени, поэтому день прошлой синхронизации просматриваем повторно
+        changed = changed | (EstateDeal.date_modified >= date.fromisoformat(marks['last_deal_modified']))
+    rows = g.mysql_db_session.query(extract('year', effective_date), extract('month', effective_date)) \
+        .filter(changed, effective_date.isnot(None)).distinct().all()
+    return {(int(year), int(month)) for year, month in rows}
+
+
+def _current_watermarks():
+    last_finance_id = g.mysql_db_session.query(func.max(FinanceOperation.id)).scalar()
+    return {**deal_watermarks(), 'last_finance_id': last_finance_id or 0}
+
+
+def _changed_months(marks: dict):
+    """Месяцы, которых коснулись сделки и операции, появившиеся или измененные после прошлой синхронизации."""
+    session = g.mysql_db_session
+    months = changed_deal_months(marks)
+
+    new_finances = FinanceOperation.id > marks.get('last_finance_id', 0)
+    for column in (FinanceOperation.date_added, FinanceOperation.date_to):
+        rows = session.query(extract('year', column), extract('month', column)) \
+            .filter(new_finances, column.isnot(None)).distinct().all()
+        months.update((int(year), int(month)) for year, month in rows)
+    return months
+
+
+def _hot_months():
+    """Окно ±FACT_CUBE_HOT_MONTHS месяцев вокруг текущего, пересчитываемое при каждой синхронизации."""
+    span = current_app.config.get('FACT_CUBE_HOT_MONTHS', 3)
+    current = date.today().replace(day=1)
+    return {(day.year, day.month) for day in (add_months(current, shift) for shift in range(-span, span + 1))}
+
+
+def _replace_buckets(months, buckets):
+    session = g.company_db_session
+    query = session.query(MonthlyFactCube)
+    if months is not None:
+        query = query.filter(or_(*[
+            and_(MonthlyFactCube.year == year, MonthlyFactCube.month == month) for year, month in months
+        ]))
+    query.delete(synchronize_session=False)
+    session.bulk_insert_mappings(MonthlyFactCube, [
+        {'complex_name': complex_name, 'property_category': category, 'year': year, 'month': month,
+         'updated_at': datetime.now(), **metrics}
+        for (complex_name, category, year, month), metrics in buckets.items()
+    ])
+
+
+def sync_fact_cube(full: bool = False):
+    """
+    Обновляет куб фактов текущей компании (нужны g.company_db_session и g.mysql_db_session).
+    Возвращает словарь с результатом, который также сохраняется в SyncLog.details.
+    """
+    sale_statuses = list(current_tenant_config().sale_statuses)
+    last_log, marks = get_last_sync()
+    if not last_log or marks.get('sale_statuses') != sale_statuses:
+        full = True
+
+    def sync():
+        # Отметки берем до агрегации: то, что изменится во время пересчета, попадет в следующий проход
+        new_marks = _current_watermarks()
+        months = None if full else _changed_months(marks) | _hot_months()
+        if months == set():
+            buckets = {}
+        else:
+            buckets = _build_buckets(months)
+            _replace_buckets(months, buckets)
+        return {
+            'months': None if months is None else len(months),
+            'buckets': len(buckets),
+            'sale_statuses': sale_statuses,
+            **new_marks,
+        }
+
+    details = sync_state_service.run_logged_sync(FACT_CUBE_SYNC_KIND, 'FACT CUBE', full, marks, sync)
+
+    g.pop('fact_cube_fresh', None)
+    months_label = 'все' if details['months'] is None else details['months']
+    print(f"[FACT CUBE] ✔️ {details['mode']}: месяцев {months_label}, "
+          f"ячеек {details['buckets']}, {details['duration_ms']} мс")
+    return details
@@ -5,6 +5,7 @@ from collections import defaultdict
 from datetime import date
 from sqlalchemy import func
 from ..core.extensions import db
+from ..core.date_ranges import days_range, in_range
 from ..models.funnel_models import EstateBuy, EstateBuysStatusLog
 from flask import g
 
@@ -16,23 +17,29 @@ def _format_status(status, custom_status):
     return f"{status}: {custom_status}" if custom_status else status
 
 
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _cohort_query(start_date_str: str, end_date_str: str):
+    """
+    Запрос ID заявок, созданных в период (обе даты включительно; некорректная дата не ограничивает).
+    Фильтр — полуинтервал по date_added, чтобы использовался индекс по дате.
+    """
+    start, end = days_range(_parse_date(start_date_str), _parse_date(end_date_str))
+    return g.mysql_db_session.query(EstateBuy.id).filter(in_range(EstateBuy.date_added, start, end))
+
+
 def get_target_funnel_metrics(start_date_str: str, end_date_str: str):
     """
     Рассчитывает разделение на целевые/нецелевые и ключевые показатели конверсии.
     (С УТОЧНЕНИЕМ: Сделка = 'Сделка в работе' + 'Сделка проведена')
     """
     # === Шаги 1-2: Сбор когорты и логов (без изменений) ===
-    cohort_query = g.mysql_db_session.query(EstateBuy.id)
-    try:
-        start_date = date.fromisoformat(start_date_str)
-        cohort_query = cohort_query.filter(EstateBuy.date_added >= start_date)
-    except (ValueError, TypeError):
-        pass
-    try:
-        end_date = date.fromisoformat(end_date_str)
-        cohort_query = cohort_query.filter(EstateBuy.date_added <= end_date)
-    except (ValueError, TypeError):
-        pass
+    cohort_query = _cohort_query(start_date_str, end_date_str)
 
     # --- ИЗМЕНЕНИЕ: Используем подзапрос ---
     total_leads_count = cohort_query.count()
@@ -182,19 +189,7 @@ def get_funnel_data(start_date_str: str, end_date_str: str):
     Строит полное дерево путей заявок, ВКЛЮЧАЯ ID ЗАЯВОК в каждом узле.
     """
     # === Шаг 1: Когорта по ДАТЕ СОЗДАНИЯ заявки ===
-    cohort_query = g.mysql_db_session.query(EstateBuy.id)
-    if start_date_str:
-        try:
-            start_date = date.fromisoformat(start_date_str)
-            cohort_query = cohort_query.filter(EstateBuy.date_added >= start_date)
-        except (ValueError, TypeError):
-            pass
-    if end_date_str:
-        try:
-            end_date = date.fromisoformat(end_date_str)
-            cohort_query = cohort_query.filter(EstateBuy.date_added <= end_date)
-        except (ValueError, TypeError):
-            pass
+    cohort_query = _cohort_query(start_date_str, end_date_str)
 
     # --- ИЗМЕНЕНИЕ: Не загружаем ID в память, оставляем как объект запроса ---
     total_leads = cohort_query.count()
@@ -242,15 +237,7 @@ def get_dead_end_summary(start_date_str: str, end_date_str: str):
     (Эта функция остается без изменений)
     """
     # === Шаг 1: Когорта по ДАТЕ СОЗДАНИЯ заявки ===
-    cohort_query = g.mysql_db_session.query(EstateBuy.id)
-    try:
-        start_date = date.fromisoformat(start_date_str)
-        cohort_query = cohort_query.filter(EstateBuy.date_added >= start_date)
-    except (ValueError, TypeError): pass
-    try:
-        end_date = date.fromisoformat(end_date_str)
-        cohort_query = cohort_query.filter(EstateBuy.date_added <= end_date)
-    except (ValueError, TypeError): pass
+    cohort_query = _cohort_query(start_date_str, end_date_str)
 
     cohort_subquery = cohort_query.subquery()
     trunk_count = g.mysql_db_session.query(func.count(cohort_subquery.c.id)).scalar() or 0
@@ -5,7 +5,7 @@ from collections import defaultdict
 
 import pandas as pd
 from flask import g
-from flask_login import current_user
+from ..core.tenant_config import current_tenant_config
 from app.core.extensions import db
 from app.models.estate_models import EstateSell, EstateHouse
 from app.models.exclusion_models import ExcludedComplex
@@ -42,7 +42,7 @@ def get_inventory_summary_data():
         if d.payment_method == PaymentMethod.FULL_PAYMENT
     }
 
-    valid_statuses = current_user.company.inventory_status_list
+    valid_statuses = current_tenant_config().inventory_statuses
     print(f"[ИНВЕНТАРИЗАЦИЯ] ✅ Используются следующие статусы для определения остатков: {valid_statuses}")
 
     # ИСПРАВЛЕНИЕ: Запрос к g.mysql_db_session
@@ -1,12 +1,13 @@
 # app/services/manager_analytics_service.py
 
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from collections import defaultdict
 from ..core.extensions import db
 from ..models.auth_models import User
 from ..models.funnel_models import EstateBuysStatusLog
 from ..models.estate_models import EstateDeal
 from flask import g
+from ..core.date_ranges import in_month
 
 def get_manager_analytics_report(year: int, month: int, post_title: str = None):
     """
@@ -45,8 +46,7 @@ def get_manager_analytics_report(year: int, month: int, post_title: str = None):
         EstateBuysStatusLog.manager_id,
         EstateBuysStatusLog.estate_buy_id
     ).filter(
-        extract('year', EstateBuysStatusLog.log_date) == year,
-        extract('month', EstateBuysStatusLog.log_date) == month,
+        in_month(EstateBuysStatusLog.log_date, year, month),
         EstateBuysStatusLog.status_to_name == 'Бронь',
         EstateBuysStatusLog.manager_id.in_(manager_ids)
     ).all()
@@ -67,8 +67,7 @@ def get_manager_analytics_report(year: int, month: int, post_title: str = None):
         EstateBuysStatusLog.estate_buy_id,
         EstateBuysStatusLog.status_to_name
     ).filter(
-        extract('year', EstateBuysStatusLog.log_date) == year,
-        extract('month', EstateBuysStatusLog.log_date) == month,
+        in_month(EstateBuysStatusLog.log_date, year, month),
         EstateBuysStatusLog.status_to_name.in_(target_statuses)
     ).all()
 
@@ -109,8 +108,7 @@ def get_manager_analytics_report(year: int, month: int, post_title: str = None):
         EstateDeal.deal_manager_id,
         func.count(EstateDeal.id)
     ).filter(
-        extract('year', EstateDeal.date_modified) == year,
-        extract('month', EstateDeal.date_modified) == month,
+        in_month(EstateDeal.date_modified, year, month),
         # --- ИЗМЕНЕНИЕ: Ищем оба статуса ---
         EstateDeal.deal_status_name.in_(['Не понравилось', 'Сделка отменена']),
         EstateDeal.deal_sum != 0,
@@ -10,7 +10,8 @@ import io
 from flask import g
 from app.core.extensions import db
 from ..core.db_utils import require_mysql_db
-from flask_login import current_user
+from ..core.tenant_config import current_tenant_config
+from ..core.date_ranges import in_month, in_year, year_range, coalesce_in_range
 
 # Обновленные импорты
 from app.models import auth_models
@@ -87,7 +88,7 @@ def get_manager_performance_details(manager_id: int, year: int):
     print("\n" + "=" * 50)
     print(f"[MANAGER_PERFORMANCE] 🏁 Старт сбора данных для менеджера ID: {manager_id}, Год: {year}")
 
-    sold_statuses = current_user.company.sale_statuses
+    sold_statuses = current_tenant_config().sale_statuses
     print(f"[MANAGER_PERFORMANCE] ✅ Используются статусы для ФАКТА ПРОДАЖ: {sold_statuses}")
 
     # ИСПРАВЛЕНО: Используем auth_models.SalesManager для поиска менеджера
@@ -112,7 +113,7 @@ def get_manager_performance_details(manager_id: int, year: int):
         func.sum(EstateDeal.deal_sum).label('fact_volume')
     ).filter(
         EstateDeal.deal_manager_id == manager_id,
-        extract('year', effective_date) == year,
+        coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date, *year_range(year)),
         EstateDeal.deal_status_name.in_(sold_statuses)
     ).group_by('month').all()
     print(f"[MANAGER_PERFORMANCE] 📥 SQL-запрос по ФАКТУ ОБЪЕМА ВЕРНУЛ {len(fact_volume_query)} строк.")
@@ -124,7 +125,7 @@ def get_manager_performance_details(manager_id: int, year: int):
         func.sum(FinanceOperation.summa).label('fact_income')
     ).filter(
         FinanceOperation.manager_id == manager_id,
-        extract('year', FinanceOperation.date_added) == year,
+        in_year(FinanceOperation.date_added, year),
         FinanceOperation.status_name == "Paid",
         or_(
             FinanceOperation.payment_type != "Возврат поступлений при отмене сделки",
@@ -254,8 +255,7 @@ def generate_kpi_report_excel(year: int, month: int):
             func.sum(FinanceOperation.summa)
         ).filter(
             FinanceOperation.manager_id == manager.id,
-            extract('year', FinanceOperation.date_added) == year,
-            extract('month', FinanceOperation.date_added) == month,
+            in_month(FinanceOperation.date_added, year, month),
             FinanceOperation.status_name == "Paid",
             or_(
                 FinanceOperation.payment_type != "Возврат поступлений при отмене сделки",
@@ -329,7 +329,7 @@ def generate_kpi_report_excel(year: int, month: int):
 
 @require_mysql_db
 def get_manager_kpis(manager_id: int, year: int):
-    sold_statuses = current_user.company.sale_statuses
+    sold_statuses = current_tenant_config().sale_statuses
     """
     Рассчитывает расширенные KPI для одного менеджера на основе ПОСТУПЛЕНИЙ.
     """
@@ -370,7 +370,7 @@ def get_manager_kpis(manager_id: int, year: int):
         func.sum(FinanceOperation.summa).label('total_income')
     ).filter(
         FinanceOperation.manager_id == manager_id,
-        extract('year', FinanceOperation.date_added) == year,
+        in_year(FinanceOperation.date_added, year),
         FinanceOperation.status_name == 'Paid'
     ).group_by('income_month').order_by(func.sum(FinanceOperation.summa).desc()).first()
 
@@ -427,7 +427,7 @@ def get_manager_complex_ranking(manager_id: int):
 
 @require_mysql_db
 def get_complex_hall_of_fame(complex_name: str, start_date_str: str = None, end_date_str: str = None):
-    sold_statuses = current_user.company.sale_statuses
+    sold_statuses = current_tenant_config().sale_statuses
     """
     Возвращает рейтинг менеджеров по количеству и объему сделок для ЖК.
     """
@@ -0,0 +1,232 @@
+# app/services/price_series_service.py
+"""
+Помесячная средняя цена продажи м² в локальной базе компании (MonthlyPriceSeries).
+
+График динамики цен на дашборде проекта раньше на каждом открытии проходил по всем проданным
+сделкам ЖК за всю историю. Закрытые месяцы не меняются, поэтому ряд хранится по (ЖК, категория,
+год, месяц).
+
+Ряд строится и полностью пересобирается только вне запросов пользователей — вместе с кубом фактов
+(core.fact_cube_sync: фоновый поток или `flask fact-cube-sync`, под файловой блокировкой).
+Там же пересчитываются месяцы, которых коснулись новые или измененные сделки (отметки
+date_modified и id — те же, что у куба фактов), а полная пересборка выполняется при смене
+статусов сделок и не реже чем раз в PRICE_SERIES_FULL_REBUILD_HOURS часов.
+В запросе (ensure_fresh) устаревший ряд лишь дообновляется за текущий и прошлый месяц;
+пока ряда нет, графики считаются по сделкам в MySQL.
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+
+from flask import g, current_app
+from sqlalchemy import func, extract, or_, and_
+
+from ..core.date_ranges import add_months, coalesce_in_range, month_range
+from ..core.tenant_config import current_tenant_config
+from ..models.estate_models import EstateDeal, EstateHouse, EstateSell
+from ..models.system_models import MonthlyPriceSeries
+from . import sync_state_service
+from .fact_cube_service import deal_watermarks, changed_deal_months
+
+PRICE_SERIES_SYNC_KIND = 'price_series'
+
+# Дообновление ряда одной компании в запросах одновременно выполняет только один поток процесса
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
+
+
+def _refresh_lock(company_id):
+    with _refresh_locks_guard:
+        return _refresh_locks.setdefault(company_id, threading.Lock())
+
+
+def get_last_refresh():
+    """Последнее успешное обновление ряда: (SyncLog, отметки) или (None, {})."""
+    sync_state_service.ensure_tables(MonthlyPriceSeries)
+    return sync_state_service.get_last_sync(PRICE_SERIES_SYNC_KIND)
+
+
+def _full_rebuild_due(log, marks: dict):
+    """Полная пересборка нужна: ряда нет, сменились статусы продажи или она давно не выполнялась."""
+    if not log or marks.get('sale_statuses') != list(current_tenant_config().sale_statuses):
+        return True
+    last_full = sync_state_service.last_full_at(marks)
+    max_age = timedelta(hours=current_app.config.get('PRICE_SERIES_FULL_REBUILD_HOURS', 24))
+    return last_full is None or datetime.now() - last_full > max_age
+
+
+def _request_state():
+    """
+    Состояние ряда для запроса: 'missing' — ряда нет или он посчитан с другими статусами продажи
+    (графики строятся по сделкам), 'stale' — пора дообновить открытые месяцы, 'fresh' — можно читать.
+    """
+    log, marks = get_last_refresh()
+    if not log or marks.get('sale_statuses') != list(current_tenant_config().sale_statuses):
+        return 'missing'
+    max_age = timedelta(minutes=current_app.config.get('PRICE_SERIES_MAX_AGE_MINUTES', 60))
+    if datetime.now() - log.last_sync_timestamp > max_age:
+        return 'stale'
+    return 'fresh'
+
+
+# ---------------------------------------------------------------------------
+#  Обновление
+# ---------------------------------------------------------------------------
+
+def _open_months():
+    """Текущий и прошлый месяц — пересчитываются при каждом обновлении."""
+    current = date.today().replace(day=1)
+    previous = add_months(current, -1)
+    return {(current.year, current.month), (previous.year, previous.month)}
+
+
+def _aggregate(months):
+    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
+    query = g.mysql_db_session.query(
+        EstateHouse.complex_name,
+        func.coalesce(EstateSell.estate_sell_category, '').label('category'),
+        extract('year', effective_date).label('year'),
+        extract('month', effective_date).label('month'),
+        func.count(EstateDeal.id).label('deals_count'),
+        func.sum(EstateDeal.deal_sum / EstateSell.estate_area).label('price_per_sqm_sum')
+    ).join(EstateSell, EstateDeal.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(
+        effective_date.isnot(None),
+        EstateDeal.deal_status_name.in_(current_tenant_config().sale_statuses),
+        EstateSell.estate_area.isnot(None),
+        EstateSell.estate_area > 0,
+        EstateDeal.deal_sum.isnot(None),
+        EstateDeal.deal_sum > 0
+    )
+    if months is not None:
+        query = query.filter(or_(*[
+            coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date, *month_range(year, month))
+            for year, month in months
+        ]))
+    return query.group_by('complex_name', 'category', 'year', 'month').all()
+
+
+def _replace_buckets(months, rows):
+    session = g.company_db_session
+    query = session.query(MonthlyPriceSeries)
+    if months is not None:
+        query = query.filter(or_(*[
+            and_(MonthlyPriceSeries.year == year, MonthlyPriceSeries.month == month) for year, month in months
+        ]))
+    query.delete(synchronize_session=False)
+    session.bulk_insert_mappings(MonthlyPriceSeries, [
+        {'complex_name': row.complex_name, 'property_category': row.category, 'year': int(row.year),
+         'month': int(row.month), 'deals_count': row.deals_count,
+         'price_per_sqm_sum': float(row.price_per_sqm_sum or 0), 'updated_at': datetime.now()}
+        for row in rows
+    ])
+
+
+def refresh_price_series(full: bool = False, open_months_only: bool = False):
+    """
+    Обновляет ряд цен текущей компании (нужны g.company_db_session и g.mysql_db_session).
+    open_months_only — только текущий и прошлый месяц, без продвижения отметок сделок и без полной
+    пересборки (режим запросов пользователей; остальное доделает синхронизация).
+    Возвращает словарь с результатом, который также сохраняется в SyncLog.details.
+    """
+    sale_statuses = list(current_tenant_config().sale_statuses)
+    last_log, marks = get_last_refresh()
+    if open_months_only:
+        full = False
+    elif _full_rebuild_due(last_log, marks):
+        full = True
+
+    def sync():
+        if open_months_only:
+            # Отметки переносим как есть: измененные сделки прошлых месяцев пересчитает синхронизация
+            new_marks = {key: marks.get(key) for key in ('last_deal_modified', 'last_deal_id')}
+            months = _open_months()
+        else:
+            # Отметки берем до агрегации: то, что изменится во время пересчета, попадет в следующий проход
+            new_marks = deal_watermarks()
+            months = None if full else changed_deal_months(marks) | _open_months()
+        rows = _aggregate(months)
+        _replace_buckets(months, rows)
+        return {
+            'months': None if months is None else len(months),
+            'buckets': len(rows),
+            'sale_statuses': sale_statuses,
+            **new_marks,
+        }
+
+    details = sync_state_service.run_logged_sync(PRICE_SERIES_SYNC_KIND, 'PRICE SERIES', full, marks, sync)
+    print(f"[PRICE SERIES] ✔️ {details['mode']}: ячеек {details['buckets']}, {details['duration_ms']} мс")
+    return details
+
+
+def ensure_fresh():
+    """
+    Дообновляет текущий и прошлый месяц, если ряд старше PRICE_SERIES_MAX_AGE_MINUTES.
+    Возвращает True, если графики можно строить из ряда; False — ряд еще не построен синхронизацией
+    (или выключен), графики считаются по сделкам. Результат запоминается на запрос.
+    """
+    if 'price_series_ready' not in g:
+        ready = False
+        if current_app.config.get('PRICE_SERIES_ENABLED', True):
+            try:
+                state = _request_state()
+                if state == 'stale':
+                    with _refresh_lock(current_tenant_config().id):
+                        # Пока ждали блокировку, ряд мог обновить другой поток
+                        state = _request_state()
+                        if state == 'stale':
+                            refresh_price_series(open_months_only=True)
+                            state = 'fresh'
+                ready = state == 'fresh'
+            except Exception as e:
+                print(f"[PRICE SERIES] ⚠️ Ряд недоступен, считаем по сделкам: {e}")
+        g.price_series_ready = ready
+    return g.price_series_ready
+
+
+# ---------------------------------------------------------------------------
+#  Чтение
+# ---------------------------------------------------------------------------
+
+def _series_query(property_category: str = None):
+    query = g.company_db_session.query(
+        MonthlyPriceSeries.year, MonthlyPriceSeries.month,
+        (func.sum(MonthlyPriceSeries.price_per_sqm_sum) / func.sum(MonthlyPriceSeries.deals_count)).label('avg_price')
+    )
+    if property_category:
+        query = query.filter(func.lower(MonthlyPriceSeries.property_category) == property_category.lower())
+    return query
+
+
+def get_price_dynamics(complex_name: str, property_category: str = None):
+    """Динамика средней цены м² ЖК: {'labels': ['MM.YYYY', ...], 'data': [...]}."""
+    rows = _series_query(property_category).filter(MonthlyPriceSeries.complex_name == complex_name) \
+        .group_by(MonthlyPriceSeries.year, MonthlyPriceSeries.month) \
+        .order_by(MonthlyPriceSeries.year, MonthlyPriceSeries.month).all()
+    return {
+        "labels": [f"{row.month:02d}.{row.year}" for row in rows],
+        "data": [row.avg_price for row in rows],
+    }
+
+
+def get_price_comparison(complex_names=None, property_category: str = None):
+    """
+    Сравнение динамики цены м² нескольких ЖК (по умолчанию всех) на общей оси месяцев.
+    Возвращает {'labels': [...], 'series': {ЖК: [цена или None, ...]}}.
+    """
+    query = _series_query(property_category).add_columns(MonthlyPriceSeries.complex_name)
+    if complex_names:
+        query = query.filter(MonthlyPriceSeries.complex_name.in_(complex_names))
+    rows = query.group_by(MonthlyPriceSeries.complex_name, MonthlyPriceSeries.year, MonthlyPriceSeries.month).all()
+
+    months = sorted({(row.year, row.month) for row in rows})
+    position = {month: i for i, month in enumerate(months)}
+    series = {}
+    for row in rows:
+        values = series.setdefault(row.complex_name, [None] * len(months))
+        values[position[(row.year, row.month)]] = row.avg_price
+    return {
+        "labels": [f"{month:02d}.{year}" for year, month in months],
+        "series": dict(sorted(series.items())),
+    }
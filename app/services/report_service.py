@@ -5,206 +5,464 @@ from datetime import date, timedelta
 from sqlalchemy import func, extract, case
 from flask import g
 import io
+import openpyxl
 from collections import defaultdict
-from flask_login import current_user
+from ..core.tenant_config import current_tenant_config
+from ..core.sale_predicates import is_sold, is_unsold
+from ..core.fanout import run_parallel
+from ..core.extensions import snapshot_cache
+from ..core.date_ranges import (add_months, period_range, month_range, year_range, in_range,
+                               in_month, in_year, coalesce_in_range)
 from app.models import planning_models
 from .data_service import get_all_complex_names
+from . import fact_cube_service, calendar_service, price_series_service
 from ..models.estate_models import EstateDeal, EstateHouse, EstateSell
 from ..models.finance_models import FinanceOperation
 import json
 
 
-def generate_consolidated_report_by_period(year: int, period: str, property_type: str):
-    """
-    Генерирует сводный отчет за период (квартал, полугодие), суммируя данные по месяцам.
-    """
-    PERIOD_MONTHS = {
-        'q1': range(1, 4), 'q2': range(4, 7), 'q3': range(7, 10),
-        'q4': range(10, 13), 'h1': range(1, 7), 'h2': range(7, 13),
-    }
-    months_in_period = PERIOD_MONTHS.get(period)
-    if not months_in_period:
-        return [], {}
+PERIOD_METRIC_KEYS = ('plan_units', 'plan_volume', 'plan_income', 'fact_units', 'fact_volume', 'fact_income',
+                      'expected_income', 'refunds')
 
-    aggregated_data = defaultdict(lambda: defaultdict(float))
-    aggregated_totals = defaultdict(float)
 
-    for month in months_in_period:
-        monthly_data, monthly_totals, _ = generate_plan_fact_report(year, month, property_type)
-        for project_row in monthly_data:
-            complex_name = project_row['complex_name']
-            for key, value in project_row.items():
-                if key != 'complex_name' and isinstance(value, (int, float)):
-                    aggregated_data[complex_name][key] += value
-            aggregated_data[complex_name]['complex_name'] = complex_name
-        for key, value in monthly_totals.items():
-            if isinstance(value, (int, float)):
-                aggregated_totals[key] += value
+def resolve_period(year: int, period: str, start_date: date = None, end_date: date = None):
+    """Полуинтервал дат [start, end) для кода периода (см. core.date_ranges.period_range)."""
+    return period_range(year, period, start_date, end_date)
 
-    final_report_data = []
-    for complex_name, data in aggregated_data.items():
-        data['percent_fact_units'] = (data['fact_units'] / data['plan_units'] * 100) if data.get('plan_units',
-                                                                                                 0) > 0 else 0
-        data['percent_fact_volume'] = (data['fact_volume'] / data['plan_volume'] * 100) if data.get('plan_volume',
-                                                                                                    0) > 0 else 0
-        data['percent_fact_income'] = (data['fact_income'] / data['plan_income'] * 100) if data.get('plan_income',
-                                                                                                    0) > 0 else 0
-        data['forecast_units'] = 0
-        data['forecast_volume'] = 0
-        final_report_data.append(dict(data))
-
-    if aggregated_totals.get('plan_units', 0) > 0:
-        aggregated_totals['percent_fact_units'] = (
-                aggregated_totals['fact_units'] / aggregated_totals['plan_units'] * 100)
-    if aggregated_totals.get('plan_volume', 0) > 0:
-        aggregated_totals['percent_fact_volume'] = (
-                aggregated_totals['fact_volume'] / aggregated_totals['plan_volume'] * 100)
-    if aggregated_totals.get('plan_income', 0) > 0:
-        aggregated_totals['percent_fact_income'] = (
-                aggregated_totals['fact_income'] / aggregated_totals['plan_income'] * 100)
-
-    aggregated_totals['forecast_units'] = 0
-    aggregated_totals['forecast_volume'] = 0
-    final_report_data.sort(key=lambda x: x['complex_name'])
-    return final_report_data, dict(aggregated_totals)
-
-
-def get_fact_income_data(year: int, month: int, property_type: str):
-    """Собирает ФАКТИЧЕСКИЕ поступления (статус 'Проведено') из MySQL."""
-    results = g.mysql_db_session.query(
-        EstateHouse.complex_name, func.sum(FinanceOperation.summa).label('fact_income')
-    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
+
+def _collect_live_period_facts(monthly, reported_complexes, start_date: date, end_date: date,
+                               property_type_for_fact_db: str):
+    """Факты периода напрямую из MySQL: по одному запросу для сделок и для финансов."""
+    # --- Сделки (MySQL): штуки и объем по (ЖК, месяц) ---
+    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
+    deal_year = extract('year', effective_date).label('year')
+    deal_month = extract('month', effective_date).label('month')
+    sold_statuses = current_tenant_config().sale_statuses
+    deals = g.mysql_db_session.query(
+        EstateHouse.complex_name, deal_year, deal_month,
+        func.count(EstateDeal.id).label('fact_units'),
+        func.sum(EstateDeal.deal_sum).label('fact_volume')
+    ).join(EstateSell, EstateDeal.estate_sell_id == EstateSell.id) \
         .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
         .filter(
-        FinanceOperation.status_name == "Paid",
-        extract('year', FinanceOperation.date_added) == year,
-        extract('month', FinanceOperation.date_added) == month,
-        FinanceOperation.payment_type != "Возврат поступлений при отмене сделки",
-        FinanceOperation.payment_type != "Уступка права требования",
-        EstateSell.estate_sell_category == property_type
-    ).group_by(EstateHouse.complex_name).all()
-    return {row.complex_name: (row.fact_income or 0) for row in results}
-
-
-def get_expected_income_data(year: int, month: int, property_type: str):
-    """Собирает ОЖИДАЕМЫЕ поступления из MySQL."""
-    results = g.mysql_db_session.query(
-        EstateHouse.complex_name,
-        func.sum(FinanceOperation.summa).label('expected_income'),
-        func.group_concat(FinanceOperation.id).label('income_ids')
+        EstateDeal.deal_status_name.in_(sold_statuses),
+        coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date, start_date, end_date),
+        EstateSell.estate_sell_category == property_type_for_fact_db
+    ).group_by(EstateHouse.complex_name, deal_year, deal_month).all()
+    for row in deals:
+        reported_complexes.add(row.complex_name)
+        metrics = monthly[(int(row.year), int(row.month))][row.complex_name]
+        metrics['fact_units'] += row.fact_units
+        metrics['fact_volume'] += row.fact_volume or 0
+
+    # --- Финансы (MySQL): поступления по дате оплаты, ожидаемые и возвраты по сроку ---
+    refund_type = "Возврат поступлений при отмене сделки"
+    is_paid = FinanceOperation.status_name == "Paid"
+    is_due = FinanceOperation.status_name == "К оплате"
+    bucket_date = case((is_paid, FinanceOperation.date_added), else_=FinanceOperation.date_to)
+    finance_year = extract('year', bucket_date).label('year')
+    finance_month = extract('month', bucket_date).label('month')
+    is_fact_income = is_paid & (FinanceOperation.payment_type != refund_type) & \
+                     (FinanceOperation.payment_type != "Уступка права требования")
+    is_refund = FinanceOperation.payment_type == refund_type
+
+    finances = g.mysql_db_session.query(
+        EstateHouse.complex_name, finance_year, finance_month,
+        func.sum(case((is_fact_income, FinanceOperation.summa), else_=0)).label('fact_income'),
+        func.sum(case((is_due & ~is_refund, FinanceOperation.summa), else_=0)).label('expected_income'),
+        func.sum(case((is_due & is_refund, FinanceOperation.summa), else_=0)).label('refunds')
     ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
         .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
         .filter(
-        FinanceOperation.status_name == "К оплате",
-        extract('year', FinanceOperation.date_to) == year,
-        extract('month', FinanceOperation.date_to) == month,
-        EstateSell.estate_sell_category == property_type,
-        FinanceOperation.payment_type != "Возврат поступлений при отмене сделки"
-    ).group_by(EstateHouse.complex_name).all()
+        EstateSell.estate_sell_category == property_type_for_fact_db,
+        (is_paid & in_range(FinanceOperation.date_added, start_date, end_date)) |
+        (is_due & in_range(FinanceOperation.date_to, start_date, end_date))
+    ).group_by(EstateHouse.complex_name, finance_year, finance_month).all()
+    for row in finances:
+        metrics = monthly[(int(row.year), int(row.month))][row.complex_name]
+        metrics['fact_income'] += row.fact_income or 0
+        metrics['expected_income'] += row.expected_income or 0
+        metrics['refunds'] += row.refunds or 0
+
+
+def get_period_metrics(start_date: date, end_date: date, property_type: str):
+    """
+    Движок периодов для план-факта: каждая метрика считается одним запросом за весь
+    полуинтервал [start_date, end_date) с группировкой по (ЖК, месяц).
+    Планы хранятся помесячно, поэтому для неполных месяцев берется план всего месяца.
+
+    Возвращает словарь:
+        months     — список (год, месяц) периода;
+        monthly    — {(год, месяц): {ЖК: метрики}};
+        by_complex — {ЖК: метрики за весь период};
+        totals     — метрики по всем ЖК;
+        complexes  — ЖК, у которых за период есть план или сделки.
+    """
+    prop_type_map = {member.value: member.name.lower() for member in planning_models.PropertyType}
+    property_type_for_fact_db = prop_type_map.get(property_type, property_type)
 
-    data = {}
-    for row in results:
-        ids = [int(id_str) for id_str in row.income_ids.split(',')] if row.income_ids else []
-        data[row.complex_name] = {'sum': row.expected_income or 0, 'ids': ids}
-    return data
+    last_month = end_date - timedelta(days=1)
+    months = []
+    cursor = date(start_date.year, start_date.month, 1)
+    while cursor <= last_month:
+        months.append((cursor.year, cursor.month))
+        cursor = add_months(cursor, 1)
+
+    monthly = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(PERIOD_METRIC_KEYS, 0)))
+    reported_complexes = set()
+
+    # --- Планы (SQLite): один запрос на все месяцы периода ---
+    SalesPlan = planning_models.SalesPlan
+    first_key = start_date.year * 100 + start_date.month
+    last_key = last_month.year * 100 + last_month.month
+    plans = g.company_db_session.query(
+        SalesPlan.complex_name, SalesPlan.year, SalesPlan.month,
+        SalesPlan.plan_units, SalesPlan.plan_volume, SalesPlan.plan_income
+    ).filter(
+        SalesPlan.property_type == property_type,
+        (SalesPlan.year * 100 + SalesPlan.month).between(first_key, last_key)
+    ).all()
+    for row in plans:
+        reported_complexes.add(row.complex_name)
+        metrics = monthly[(row.year, row.month)][row.complex_name]
+        metrics['plan_units'] += row.plan_units or 0
+        metrics['plan_volume'] += row.plan_volume or 0
+        metrics['plan_income'] += row.plan_income or 0
+
+    # --- Факты: из локального куба, если он свежий и период состоит из целых месяцев, иначе из MySQL ---
+    if fact_cube_service.covers_range(start_date, end_date):
+        for row in fact_cube_service.get_cube_rows(start_date, end_date, property_category=property_type_for_fact_db):
+            if row.fact_units:
+                reported_complexes.add(row.complex_name)
+            metrics = monthly[(row.year, row.month)][row.complex_name]
+            metrics['fact_units'] += row.fact_units
+            metrics['fact_volume'] += row.fact_volume
+            metrics['fact_income'] += row.paid_income
+            metrics['expected_income'] += row.expected_income
+            metrics['refunds'] += row.refunds
+    else:
+        _collect_live_period_facts(monthly, reported_complexes, start_date, end_date, property_type_for_fact_db)
+
+    # --- Свертка по ЖК и итог в памяти ---
+    by_complex = defaultdict(lambda: dict.fromkeys(PERIOD_METRIC_KEYS, 0))
+    totals = dict.fromkeys(PERIOD_METRIC_KEYS, 0)
+    for complexes in monthly.values():
+        for complex_name, metrics in complexes.items():
+            for key, value in metrics.items():
+                by_complex[complex_name][key] += value
+                totals[key] += value
+
+    return {
+        'months': months,
+        'monthly': {month_key: dict(complexes) for month_key, complexes in monthly.items()},
+        'by_complex': dict(by_complex),
+        'totals': totals,
+        'complexes': reported_complexes,
+    }
 
 
-def get_refund_data(year: int, month: int, property_type: str):
-    """Собирает данные по ВОЗВРАТАМ из MySQL."""
-    results = g.mysql_db_session.query(
-        func.sum(FinanceOperation.summa).label('total_refunds')
-    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
-        .filter(
-        FinanceOperation.status_name == "К оплате",
-        extract('year', FinanceOperation.date_to) == year,
-        extract('month', FinanceOperation.date_to) == month,
-        EstateSell.estate_sell_category == property_type,
-        FinanceOperation.payment_type == "Возврат поступлений при отмене сделки"
-    ).scalar()
+def generate_consolidated_report_by_period(year: int, period: str, property_type: str,
+                                           start_date: date = None, end_date: date = None):
+    """
+    Генерирует сводный отчет за период (квартал, полугодие, с начала года или произвольный диапазон).
+    Возвращает (строки по ЖК, итоги, сумма возвратов).
+    """
+    date_range = resolve_period(year, period, start_date, end_date)
+    if not date_range:
+        return [], {}, 0
 
-    return results or 0.0
+    metrics = get_period_metrics(date_range[0], date_range[1], property_type)
 
+    def with_percents(row):
+        row['percent_fact_units'] = (row['fact_units'] / row['plan_units'] * 100) if row['plan_units'] > 0 else 0
+        row['percent_fact_volume'] = (row['fact_volume'] / row['plan_volume'] * 100) if row['plan_volume'] > 0 else 0
+        row['percent_fact_income'] = (row['fact_income'] / row['plan_income'] * 100) if row['plan_income'] > 0 else 0
+        row['forecast_units'] = 0
+        row['forecast_volume'] = 0
+        return row
 
-def get_plan_income_data(year: int, month: int, property_type: str):
-    """Получает плановые данные по поступлениям из локальной SQLite."""
-    results = g.company_db_session.query(planning_models.SalesPlan).filter_by(year=year, month=month,
-                                                                              property_type=property_type).all()
-    return {row.complex_name: row.plan_income for row in results}
+    final_report_data = []
+    aggregated_totals = defaultdict(float)
+    # Как и в помесячном отчете, строка выводится только для ЖК с планом или продажами
+    for complex_name in sorted(metrics['complexes']):
+        data = metrics['by_complex'][complex_name]
+        row = {key: data[key] for key in ('plan_units', 'fact_units', 'plan_volume', 'fact_volume',
+                                          'plan_income', 'fact_income')}
+        for key, value in row.items():
+            aggregated_totals[key] += value
+        aggregated_totals['expected_income'] += data['expected_income']
+        row['complex_name'] = complex_name
+        final_report_data.append(with_percents(row))
 
+    totals = dict.fromkeys(('plan_units', 'fact_units', 'plan_volume', 'fact_volume',
+                            'plan_income', 'fact_income', 'expected_income'), 0)
+    totals.update(aggregated_totals)
+    totals = with_percents(totals)
+    return final_report_data, totals, metrics['totals']['refunds']
 
-def generate_ids_excel(ids_str: str):
-    """Создает Excel-файл из списка ID."""
-    try:
-        ids = [int(id_val) for id_val in ids_str.split(',')]
-    except (ValueError, AttributeError):
-        return None
 
-    df = pd.DataFrame(ids, columns=['ID Финансовой операции'])
+TREND_METRICS = ('units', 'volume', 'income')
+TREND_MAX_YEARS = 5
+
+
+def _percent_matrix(fact, plan):
+    """Процент выполнения плана поэлементно; там, где плана нет, — 0."""
+    return np.divide(fact * 100, plan, out=np.zeros_like(fact), where=plan > 0)
+
+
+def get_plan_fact_trend(start_year: int, end_year: int, property_type: str):
+    """
+    Многолетний тренд план-факта: матрица (ЖК × месяц) плана, факта и процента выполнения
+    по штукам, объему и поступлениям за годы start_year..end_year (не более TREND_MAX_YEARS).
+    Данные берутся движком периодов (get_period_metrics) — постоянное число сгруппированных
+    запросов независимо от длины диапазона; проценты и годовые свертки считаются в numpy.
+
+    Все матрицы — вложенные списки, пригодные для JSON: matrix[метрика]['plan'][i][j] —
+    план ЖК complexes[i] в месяце months[j]; yearly — то же по годам, totals — итог по всем ЖК.
+    """
+    if start_year > end_year or end_year - start_year + 1 > TREND_MAX_YEARS:
+        raise ValueError(f"Диапазон лет должен содержать от 1 до {TREND_MAX_YEARS} лет.")
+
+    metrics = get_period_metrics(date(start_year, 1, 1), date(end_year + 1, 1, 1), property_type)
+    years = list(range(start_year, end_year + 1))
+    months = metrics['months']
+    complexes = sorted(metrics['complexes'])
+    complex_index = {name: i for i, name in enumerate(complexes)}
+    month_index = {month_key: j for j, month_key in enumerate(months)}
+
+    # Раскладываем показатели в массивы (показатель, ЖК, месяц)
+    keys = [f'{kind}_{metric}' for metric in TREND_METRICS for kind in ('plan', 'fact')]
+    cube = np.zeros((len(keys), len(complexes), len(months)))
+    for month_key, by_complex in metrics['monthly'].items():
+        j = month_index[month_key]
+        for complex_name, values in by_complex.items():
+            i = complex_index.get(complex_name)
+            if i is None:
+                continue
+            cube[:, i, j] = [values[key] for key in keys]
+
+    # Годовая свертка: месяцы диапазона — целые годы, поэтому достаточно reshape
+    yearly_cube = cube.reshape(len(keys), len(complexes), len(years), 12).sum(axis=3)
+    monthly_totals = cube.sum(axis=1)
+    yearly_totals = yearly_cube.sum(axis=1)
+
+    def split(data):
+        result = {}
+        for n, metric in enumerate(TREND_METRICS):
+            plan, fact = data[2 * n], data[2 * n + 1]
+            result[metric] = {'plan': plan.tolist(), 'fact': fact.tolist(),
+                              'percent': _percent_matrix(fact, plan).tolist()}
+        return result
+
+    return {
+        'property_type': property_type,
+        'years': years,
+        'months': [f'{year}-{month:02d}' for year, month in months],
+        'complexes': complexes,
+        'matrix': split(cube),
+        'yearly': split(yearly_cube),
+        'totals': split(monthly_totals),
+        'yearly_totals': split(yearly_totals),
+    }
+
+
+def expected_income_drilldown(year: int, month: int, property_type: str = None, complex_name: str = None):
+    """
+    Ссылка на расшифровку ожидаемых поступлений: параметры для report.export_expected_income_details.
+    Вместо списка ID операций отчет несет только фильтр, по которому выгрузка перезапрашивает строки.
+    """
+    handle = {'year': year, 'month': month}
+    if property_type:
+        handle['property_type'] = property_type
+    if complex_name:
+        handle['complex_name'] = complex_name
+    return handle
+
+
+def generate_expected_income_excel(year: int, month: int, property_type: str = None, complex_name: str = None):
+    """
+    Выгрузка ожидаемых поступлений за месяц (статус 'К оплате', без возвратов) по фильтру расшифровки.
+    Строки читаются из MySQL порциями и сразу пишутся в книгу openpyxl в режиме write-only,
+    поэтому ни список ID, ни вся выборка целиком в памяти не держатся.
+    """
+    query = g.mysql_db_session.query(
+        FinanceOperation.id, FinanceOperation.summa, FinanceOperation.date_to, FinanceOperation.payment_type,
+        EstateSell.id.label('sell_id'), EstateSell.estate_sell_category,
+        EstateHouse.complex_name, EstateHouse.name.label('house_name')
+    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(
+        FinanceOperation.status_name == "К оплате",
+        in_month(FinanceOperation.date_to, year, month),
+        FinanceOperation.payment_type != "Возврат поступлений при отмене сделки"
+    )
+    if property_type:
+        prop_type_map = {member.value: member.name.lower() for member in planning_models.PropertyType}
+        query = query.filter(EstateSell.estate_sell_category == prop_type_map.get(property_type, property_type))
+    if complex_name:
+        query = query.filter(EstateHouse.complex_name == complex_name)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(f'Ожидаемые {month:02d}-{year}')
+    sheet.append(['ID Финансовой операции', 'ЖК', 'Дом', 'ID объекта', 'Тип', 'Сумма', 'Срок оплаты', 'Тип платежа'])
+    rows_written = 0
+    for row in query.order_by(FinanceOperation.date_to, FinanceOperation.id).yield_per(1000):
+        sheet.append([row.id, row.complex_name, row.house_name, row.sell_id, row.estate_sell_category,
+                      row.summa, row.date_to, row.payment_type])
+        rows_written += 1
+
+    if not rows_written:
+        return None
     output = io.BytesIO()
-    df.to_excel(output, index=False, sheet_name='IDs')
+    workbook.save(output)
     output.seek(0)
     return output
 
 
-def get_fact_data(year: int, month: int, property_type: str):
-    """Собирает фактические данные о продажах из MySQL."""
-    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
-    sold_statuses = current_user.company.sale_statuses
-    query = g.mysql_db_session.query(
+def _property_type_by_category():
+    """Системное имя категории из MySQL ('flat') -> значение PropertyType ('Квартира')."""
+    mapping = {member.name.lower(): member.value for member in planning_models.PropertyType}
+    mapping.update({member.value.lower(): member.value for member in planning_models.PropertyType})
+    return mapping
+
+
+def _get_plan_metrics(year: int, month: int):
+    """Все плановые показатели за месяц по всем типам одним запросом к локальной SQLite."""
+    results = g.company_db_session.query(
+        planning_models.SalesPlan.property_type,
+        planning_models.SalesPlan.complex_name,
+        planning_models.SalesPlan.plan_units,
+        planning_models.SalesPlan.plan_volume,
+        planning_models.SalesPlan.plan_income
+    ).filter_by(year=year, month=month).all()
+    data = defaultdict(dict)
+    for row in results:
+        data[row.property_type][row.complex_name] = {
+            'plan_units': row.plan_units, 'plan_volume': row.plan_volume, 'plan_income': row.plan_income
+        }
+    return data
+
+
+def _get_deal_metrics(year: int, month: int):
+    """Факт продаж (штуки и объем контрактации) за месяц по категориям и ЖК одним запросом к MySQL."""
+    sold_statuses = current_tenant_config().sale_statuses
+    results = g.mysql_db_session.query(
+        EstateSell.estate_sell_category,
         EstateHouse.complex_name,
-        func.count(EstateDeal.id).label('fact_units')
+        func.count(EstateDeal.id).label('fact_units'),
+        func.sum(EstateDeal.deal_sum).label('fact_volume')
     ).join(
         EstateSell, EstateDeal.estate_sell_id == EstateSell.id
     ).join(
         EstateHouse, EstateSell.house_id == EstateHouse.id
     ).filter(
         EstateDeal.deal_status_name.in_(sold_statuses),
-        effective_date.isnot(None),
-        extract('year', effective_date) == year,
-        extract('month', effective_date) == month,
-        EstateSell.estate_sell_category == property_type
-    ).group_by(EstateHouse.complex_name)
-    results = query.all()
-    return {row.complex_name: row.fact_units for row in results}
-
-
-def get_plan_data(year: int, month: int, property_type: str):
-    """Получает плановые данные из локальной SQLite."""
-    results = g.company_db_session.query(planning_models.SalesPlan).filter_by(
-        year=year, month=month, property_type=property_type
-    ).all()
-    return {row.complex_name: row.plan_units for row in results}
+        coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date, *month_range(year, month))
+    ).group_by(EstateSell.estate_sell_category, EstateHouse.complex_name).all()
 
+    type_by_category = _property_type_by_category()
+    data = defaultdict(dict)
+    for row in results:
+        property_type = type_by_category.get(str(row.estate_sell_category).lower())
+        if property_type:
+            data[property_type][row.complex_name] = {'fact_units': row.fact_units,
+                                                     'fact_volume': row.fact_volume or 0}
+    return data
+
+
+def _get_finance_metrics(year: int, month: int):
+    """
+    Поступления, ожидаемые поступления (сумма и число операций) и возвраты за месяц
+    одним запросом к MySQL с условной агрегацией по категориям и ЖК. ID операций не выбираются:
+    расшифровка ожидаемых поступлений перезапрашивает их по параметрам expected_income_drilldown.
+    """
+    refund_type = "Возврат поступлений при отмене сделки"
+    added_in_month = in_month(FinanceOperation.date_added, year, month)
+    due_in_month = in_month(FinanceOperation.date_to, year, month)
+
+    is_fact_income = (FinanceOperation.status_name == "Paid") & added_in_month & \
+                     (FinanceOperation.payment_type != refund_type) & \
+                     (FinanceOperation.payment_type != "Уступка права требования")
+    is_expected_income = (FinanceOperation.status_name == "К оплате") & due_in_month & \
+                         (FinanceOperation.payment_type != refund_type)
+    is_refund = (FinanceOperation.status_name == "К оплате") & due_in_month & \
+                (FinanceOperation.payment_type == refund_type)
+
+    results = g.mysql_db_session.query(
+        EstateSell.estate_sell_category,
+        EstateHouse.complex_name,
+        func.sum(case((is_fact_income, FinanceOperation.summa), else_=0)).label('fact_income'),
+        func.sum(case((is_expected_income, FinanceOperation.summa), else_=0)).label('expected_income'),
+        func.count(case((is_expected_income, FinanceOperation.id))).label('expected_count'),
+        func.sum(case((is_refund, FinanceOperation.summa), else_=0)).label('refunds')
+    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(added_in_month | due_in_month) \
+        .group_by(EstateSell.estate_sell_category, EstateHouse.complex_name).all()
+
+    type_by_category = _property_type_by_category()
+    data = defaultdict(dict)
+    for row in results:
+        property_type = type_by_category.get(str(row.estate_sell_category).lower())
+        if not property_type:
+            continue
+        data[property_type][row.complex_name] = {
+            'fact_income': row.fact_income or 0,
+            'expected_income': {'sum': row.expected_income or 0, 'count': row.expected_count or 0},
+            'refunds': row.refunds or 0,
+        }
+    return data
 
-def generate_plan_fact_report(year: int, month: int, property_type: str):
-    """Основная функция для генерации отчета..."""
-    # --- НАЧАЛО ИСПРАВЛЕНИЯ ---
-    # Словарь для "перевода" названий с фронтенда в системные имена для БД MySQL
-    prop_type_map = {
-        'Квартира': 'flat',
-        'Коммерческое помещение': 'comm',
-        'Парковка': 'garage',
-        'Кладовое помещение': 'storageroom'
-    }
-    # Получаем системное имя. Если его нет, используем исходное значение.
-    property_type_for_fact_db = prop_type_map.get(property_type, property_type)
 
-    # Для ПЛАНОВ используем русское название (property_type)
-    plan_units_data = get_plan_data(year, month, property_type)
-    plan_volume_data = get_plan_volume_data(year, month, property_type)
-    plan_income_data = get_plan_income_data(year, month, property_type)
+def _get_month_metrics(year: int, month: int):
+    """
+    Плановые и фактические показатели за месяц сразу по всем типам недвижимости и ЖК.
+    Три независимых запроса на месяц выполняются параллельно (core.fanout); результат запоминается
+    в g до конца запроса, поэтому сводка по типам, детальный отчет и общие итоги страницы
+    план-факта считаются из одного набора данных.
+
+    Возвращает {'plans' | 'deals' | 'finance': {тип (значение PropertyType): {ЖК: метрики}}}.
+    """
+    memo = g.setdefault('plan_fact_month_metrics', {})
+    if (year, month) not in memo:
+        memo[(year, month)] = run_parallel({
+            'plans': lambda: _get_plan_metrics(year, month),
+            'deals': lambda: _get_deal_metrics(year, month),
+            'finance': lambda: _get_finance_metrics(year, month),
+        })
+    return memo[(year, month)]
+
+
+def _apply_forecasts(rows, year: int, month: int, prefix: str = ''):
+    """
+    Проставляет forecast_units и forecast_volume сразу всем строкам одной векторной операцией.
+    Рабочие дни берутся из календаря компании (с учетом праздников), prefix — префикс ключей
+    факта и плана в строках ('total_' для сводки по типам).
+    """
+    if not rows:
+        return
+    workdays_in_month, passed_workdays = calendar_service.get_workdays(year, month)
+    for kind in ('units', 'volume'):
+        forecasts = calendar_service.forecast_percent(
+            [row[f'{prefix}fact_{kind}'] or 0 for row in rows],
+            [row[f'{prefix}plan_{kind}'] or 0 for row in rows],
+            passed_workdays, workdays_in_month
+        )
+        for row, forecast in zip(rows, forecasts):
+            row[f'forecast_{kind}'] = float(forecast)
 
-    # Для ФАКТОВ используем "переведенное" системное имя (property_type_for_fact_db)
-    fact_units_data = get_fact_data(year, month, property_type_for_fact_db)
-    fact_volume_data = get_fact_volume_data(year, month, property_type_for_fact_db)
-    fact_income_data = get_fact_income_data(year, month, property_type_for_fact_db)
-    all_expected_income_data = get_expected_income_data(year, month, property_type_for_fact_db)
-    total_refunds = get_refund_data(year, month, property_type_for_fact_db)
 
-    # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
+def generate_plan_fact_report(year: int, month: int, property_type: str):
+    """Основная функция для генерации отчета..."""
+    # Планы и факты за месяц по всем типам — общий для страницы набор данных,
+    # из него берем только выбранный тип (русское значение PropertyType)
+    month_metrics = _get_month_metrics(year, month)
+    plan_metrics = month_metrics['plans'].get(property_type, {})
+    deal_metrics = month_metrics['deals'].get(property_type, {})
+    finance_metrics = month_metrics['finance'].get(property_type, {})
+    total_refunds = sum(row['refunds'] for row in finance_metrics.values()) or 0.0
 
-    all_complexes = sorted(
-        list(set(plan_units_data.keys()) | set(fact_units_data.keys()) | set(plan_income_data.keys())))
+    all_complexes = sorted(set(plan_metrics.keys()) | set(deal_metrics.keys()))
 
     report_data = []
     totals = {
@@ -212,28 +470,27 @@ def generate_plan_fact_report(year: int, month: int, property_type: str):
         'plan_income': 0, 'fact_income': 0, 'expected_income': 0
     }
 
-    today = date.today()
-    workdays_in_month = np.busday_count(f'{year}-{month:02d}-01',
-                                        f'{year}-{month + 1:02d}-01' if month < 12 else f'{year + 1}-01-01')
-    passed_workdays = np.busday_count(f'{year}-{month:02d}-01',
-                                      today) if today.month == month and today.year == year else workdays_in_month
-    passed_workdays = max(1, passed_workdays)
+    empty_plan = {'plan_units': 0, 'plan_volume': 0, 'plan_income': 0}
+    empty_deals = {'fact_units': 0, 'fact_volume': 0}
+    empty_finance = {'fact_income': 0, 'expected_income': {'sum': 0, 'count': 0}}
 
     for complex_name in all_complexes:
-        plan_units = plan_units_data.get(complex_name, 0)
-        fact_units = fact_units_data.get(complex_name, 0)
-        plan_volume = plan_volume_data.get(complex_name, 0)
-        fact_volume = fact_volume_data.get(complex_name, 0)
-        plan_income = plan_income_data.get(complex_name, 0)
-        fact_income = fact_income_data.get(complex_name, 0)
-        complex_expected_income = all_expected_income_data.get(complex_name, {'sum': 0, 'ids': []})
+        plan_row = plan_metrics.get(complex_name, empty_plan)
+        deal_row = deal_metrics.get(complex_name, empty_deals)
+        finance_row = finance_metrics.get(complex_name, empty_finance)
+        plan_units = plan_row['plan_units']
+        fact_units = deal_row['fact_units']
+        plan_volume = plan_row['plan_volume']
+        fact_volume = deal_row['fact_volume']
+        plan_income = plan_row['plan_income']
+        fact_income = finance_row['fact_income']
+        complex_expected_income = dict(
+            finance_row['expected_income'],
+            drilldown=expected_income_drilldown(year, month, property_type, complex_name)
+        )
 
         percent_fact_units = (fact_units / plan_units) * 100 if plan_units > 0 else 0
-        forecast_units = ((
-                                  fact_units / passed_workdays) * workdays_in_month / plan_units) * 100 if plan_units > 0 else 0
         percent_fact_volume = (fact_volume / plan_volume) * 100 if plan_volume > 0 else 0
-        forecast_volume = ((
-                                   fact_volume / passed_workdays) * workdays_in_month / plan_volume) * 100 if plan_volume > 0 else 0
         percent_fact_income = (fact_income / plan_income) * 100 if plan_income > 0 else 0
 
         totals['plan_units'] += plan_units
@@ -243,29 +500,30 @@ def generate_plan_fact_report(year: int, month: int, property_type: str):
         totals['plan_income'] += plan_income
         totals['fact_income'] += fact_income
         totals['expected_income'] += complex_expected_income['sum']
-        totals.setdefault('expected_income_ids', []).extend(complex_expected_income['ids'])
+        totals['expected_income_count'] = totals.get('expected_income_count', 0) + complex_expected_income['count']
 
         report_data.append({
             'complex_name': complex_name,
             'plan_units': plan_units, 'fact_units': fact_units, 'percent_fact_units': percent_fact_units,
-            'forecast_units': forecast_units,
+            'forecast_units': 0,
             'plan_volume': plan_volume, 'fact_volume': fact_volume, 'percent_fact_volume': percent_fact_volume,
-            'forecast_volume': forecast_volume,
+            'forecast_volume': 0,
             'plan_income': plan_income, 'fact_income': fact_income, 'percent_fact_income': percent_fact_income,
             'expected_income': complex_expected_income
         })
 
+    totals['expected_income_drilldown'] = expected_income_drilldown(year, month, property_type)
     totals['percent_fact_units'] = (totals['fact_units'] / totals['plan_units']) * 100 if totals[
                                                                                               'plan_units'] > 0 else 0
-    totals['forecast_units'] = ((totals['fact_units'] / passed_workdays) * workdays_in_month / totals[
-        'plan_units']) * 100 if totals['plan_units'] > 0 else 0
+    totals['forecast_units'] = 0
     totals['percent_fact_volume'] = (totals['fact_volume'] / totals['plan_volume']) * 100 if totals[
                                                                                                  'plan_volume'] > 0 else 0
-    totals['forecast_volume'] = ((totals['fact_volume'] / passed_workdays) * workdays_in_month / totals[
-        'plan_volume']) * 100 if totals['plan_volume'] > 0 else 0
+    totals['forecast_volume'] = 0
     totals['percent_fact_income'] = (totals['fact_income'] / totals['plan_income']) * 100 if totals[
                                                                                                  'plan_income'] > 0 else 0
 
+    # Прогнозы по всем ЖК и итогу — одной векторной операцией
+    _apply_forecasts(report_data + [totals], year, month)
     return report_data, totals, total_refunds
 
 
@@ -302,39 +560,33 @@ def generate_plan_template_excel():
 
 
 def get_monthly_summary_by_property_type(year: int, month: int):
-    """Собирает сводку, комбинируя данные из SQLite (планы) и MySQL (факты)."""
+    """
+    Собирает сводку по типам недвижимости, комбинируя данные из SQLite (планы) и MySQL (факты).
+    Использует общий для запроса набор показателей месяца (_get_month_metrics).
+    """
     summary_data = []
-    property_types = list(planning_models.PropertyType)
-    today = date.today()
-    workdays_in_month = np.busday_count(f'{year}-{month:02d}-01',
-                                        f'{year}-{month + 1:02d}-01' if month < 12 else f'{year + 1}-01-01')
-    passed_workdays = np.busday_count(f'{year}-{month:02d}-01', today.strftime(
-        '%Y-%m-%d')) if today.month == month and today.year == year else workdays_in_month
-    passed_workdays = max(1, passed_workdays)
-
-    for prop_type in property_types:
-        total_plan_units = sum(get_plan_data(year, month, prop_type.value).values())
-        total_fact_units = sum(get_fact_data(year, month, prop_type.name).values())  # Используем .name для 'FLAT'
-        total_plan_volume = sum(get_plan_volume_data(year, month, prop_type.value).values())
-        total_fact_volume = sum(
-            get_fact_volume_data(year, month, prop_type.name).values())  # Используем .name для 'FLAT'
-        total_plan_income = sum(get_plan_income_data(year, month, prop_type.value).values())
-        total_fact_income = sum(
-            get_fact_income_data(year, month, prop_type.name).values())  # Используем .name для 'FLAT'
-        expected_income_data = get_expected_income_data(year, month, prop_type.name)  # Используем .name для 'FLAT'
-        total_expected_income_sum = sum(v['sum'] for v in expected_income_data.values())
-        total_expected_income_ids = [id_val for v in expected_income_data.values() for id_val in v['ids']]
+    month_metrics = _get_month_metrics(year, month)
+
+    for prop_type in planning_models.PropertyType:
+        plans = month_metrics['plans'].get(prop_type.value, {}).values()
+        deals = month_metrics['deals'].get(prop_type.value, {}).values()
+        finances = month_metrics['finance'].get(prop_type.value, {}).values()
+
+        total_plan_units = sum(row['plan_units'] or 0 for row in plans)
+        total_fact_units = sum(row['fact_units'] for row in deals)
+        total_plan_volume = sum(row['plan_volume'] or 0 for row in plans)
+        total_fact_volume = sum(row['fact_volume'] for row in deals)
+        total_plan_income = sum(row['plan_income'] or 0 for row in plans)
+        total_fact_income = sum(row['fact_income'] for row in finances)
+        total_expected_income_sum = sum(row['expected_income']['sum'] for row in finances)
+        total_expected_income_count = sum(row['expected_income']['count'] for row in finances)
 
         if (
                 total_plan_units + total_fact_units + total_plan_volume + total_fact_volume + total_plan_income + total_fact_income) == 0:
             continue
 
         percent_fact_units = (total_fact_units / total_plan_units) * 100 if total_plan_units > 0 else 0
-        forecast_units = ((
-                                  total_fact_units / passed_workdays) * workdays_in_month / total_plan_units) * 100 if total_plan_units > 0 else 0
         percent_fact_volume = (total_fact_volume / total_plan_volume) * 100 if total_plan_volume > 0 else 0
-        forecast_volume = ((
-                                   total_fact_volume / passed_workdays) * workdays_in_month / total_plan_volume) * 100 if total_plan_volume > 0 else 0
         percent_fact_income = (total_fact_income / total_plan_income) * 100 if total_plan_income > 0 else 0
 
         summary_data.append({
@@ -342,44 +594,23 @@ def get_monthly_summary_by_property_type(year: int, month: int):
             'total_plan_units': total_plan_units,
             'total_fact_units': total_fact_units,
             'percent_fact_units': percent_fact_units,
-            'forecast_units': forecast_units,
+            'forecast_units': 0,
             'total_plan_volume': total_plan_volume,
             'total_fact_volume': total_fact_volume,
             'percent_fact_volume': percent_fact_volume,
-            'forecast_volume': forecast_volume,
+            'forecast_volume': 0,
             'total_plan_income': total_plan_income,
             'total_fact_income': total_fact_income,
             'percent_fact_income': percent_fact_income,
             'total_expected_income': {
                 'sum': total_expected_income_sum,
-                'ids': total_expected_income_ids
+                'count': total_expected_income_count,
+                'drilldown': expected_income_drilldown(year, month, prop_type.value)
             }
         })
-    return summary_data
-
-
-def get_fact_volume_data(year: int, month: int, property_type: str):
-    """Собирает фактические данные об объеме контрактации из MySQL."""
-    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
-    sold_statuses = current_user.company.sale_statuses
-    results = g.mysql_db_session.query(
-        EstateHouse.complex_name, func.sum(EstateDeal.deal_sum).label('fact_volume')
-    ).join(EstateSell, EstateDeal.estate_sell_id == EstateSell.id).join(EstateHouse,
-                                                                        EstateSell.house_id == EstateHouse.id).filter(
-        EstateDeal.deal_status_name.in_(sold_statuses),
-        effective_date.isnot(None),
-        extract('year', effective_date) == year,
-        extract('month', effective_date) == month,
-        EstateSell.estate_sell_category == property_type
-    ).group_by(EstateHouse.complex_name).all()
-    return {row.complex_name: (row.fact_volume or 0) for row in results}
-
 
-def get_plan_volume_data(year: int, month: int, property_type: str):
-    """Получает плановые данные по объему контрактации из локальной SQLite."""
-    results = g.company_db_session.query(planning_models.SalesPlan).filter_by(year=year, month=month,
-                                                                              property_type=property_type).all()
-    return {row.complex_name: row.plan_volume for row in results}
+    _apply_forecasts(summary_data, year, month, prefix='total_')
+    return summary_data
 
 
 def generate_plan_fact_excel(year: int, month: int, property_type: str):
@@ -425,60 +656,17 @@ def generate_plan_fact_excel(year: int, month: int, property_type: str):
     return output
 
 
-def _get_yearly_fact_metrics_for_complex(year: int, complex_name: str, property_type: str = None,
-                                         property_type_system_name: str = None):
-    """
-    Рассчитывает годовые фактические метрики (объем и поступления) из MySQL
-    с разбивкой по месяцам для ОДНОГО ЖК.
-    """
-    house = g.mysql_db_session.query(EstateHouse).filter_by(complex_name=complex_name).first()
-    if not house:
-        return {'volume': [0] * 12, 'income': [0] * 12}
-
-    fact_volume_by_month = [0] * 12
-    fact_income_by_month = [0] * 12
-    sold_statuses = ["Сделка в работе", "Сделка проведена"]
-
-    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
-    volume_query = g.mysql_db_session.query(
-        extract('month', effective_date).label('month'),
-        func.sum(EstateDeal.deal_sum).label('total')
-    ).join(EstateSell).filter(
-        EstateSell.house_id == house.id,
-        EstateDeal.deal_status_name.in_(sold_statuses),
-        effective_date.isnot(None),
-        extract('year', effective_date) == year
-    )
-    if property_type:
-        volume_query = volume_query.filter(EstateSell.estate_sell_category == property_type)
-
-    for row in volume_query.group_by('month').all():
-        fact_volume_by_month[row.month - 1] = row.total or 0
-
-    income_query = g.mysql_db_session.query(
-        extract('month', FinanceOperation.date_added).label('month'),
-        func.sum(FinanceOperation.summa).label('total')
-    ).join(EstateSell).filter(
-        EstateSell.house_id == house.id,
-        FinanceOperation.status_name == 'Paid',
-        extract('year', FinanceOperation.date_added) == year
-    )
-    if property_type_system_name:
-        income_query = income_query.filter(EstateSell.estate_sell_category == property_type_system_name)
-
-    for row in income_query.group_by('month').all():
-        fact_income_by_month[row.month - 1] = row.total or 0
-
-    return {'volume': fact_volume_by_month, 'income': fact_income_by_month}
-
-
 def get_price_dynamics_data(complex_name: str, property_type: str = None):
     """
-    Рассчитывает динамику средней фактической цены продажи за м² по месяцам из MySQL.
+    Динамика средней фактической цены продажи за м² по месяцам. Читается из сохраненного ряда
+    (price_series_service); если ряд недоступен — рассчитывается по сделкам в MySQL.
     """
+    if price_series_service.ensure_fresh():
+        return price_series_service.get_price_dynamics(complex_name, property_type)
+
     effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
     # ИСПРАВЛЕНИЕ: Получаем статусы из настроек компании
-    sold_statuses = current_user.company.sale_statuses
+    sold_statuses = current_tenant_config().sale_statuses
 
     query = g.mysql_db_session.query(
         extract('year', effective_date).label('deal_year'),
@@ -538,49 +726,84 @@ def calculate_grand_totals(year, month):
         'plan_income': sum(item.get('total_plan_income', 0) for item in summary_by_type),
         'fact_income': sum(item.get('total_fact_income', 0) for item in summary_by_type),
         'expected_income': sum(item['total_expected_income']['sum'] for item in summary_by_type),
-        'expected_income_ids': [id_val for item in summary_by_type for id_val in item['total_expected_income']['ids']]
+        'expected_income_count': sum(item['total_expected_income']['count'] for item in summary_by_type),
+        'expected_income_drilldown': expected_income_drilldown(year, month)
     }
 
-    today = date.today()
-    workdays_in_month = np.busday_count(f'{year}-{month:02d}-01',
-                                        f'{year}-{month + 1:02d}-01' if month < 12 else f'{year + 1}-01-01')
-    passed_workdays = np.busday_count(f'{year}-{month:02d}-01',
-                                      today) if today.month == month and today.year == year else workdays_in_month
-    passed_workdays = max(1, passed_workdays)
-
     grand_totals['percent_fact_units'] = (grand_totals['fact_units'] / grand_totals['plan_units'] * 100) if \
         grand_totals['plan_units'] > 0 else 0
-    grand_totals['forecast_units'] = ((grand_totals['fact_units'] / passed_workdays) * workdays_in_month / grand_totals[
-        'plan_units'] * 100) if grand_totals['plan_units'] > 0 else 0
-
     grand_totals['percent_fact_volume'] = (grand_totals['fact_volume'] / grand_totals['plan_volume'] * 100) if \
         grand_totals['plan_volume'] > 0 else 0
-    grand_totals['forecast_volume'] = (
-            (grand_totals['fact_volume'] / passed_workdays) * workdays_in_month / grand_totals[
-        'plan_volume'] * 100) if grand_totals['plan_volume'] > 0 else 0
 
     grand_totals['percent_fact_income'] = (grand_totals['fact_income'] / grand_totals['plan_income'] * 100) if \
         grand_totals['plan_income'] > 0 else 0
+    _apply_forecasts([grand_totals], year, month)
 
     return grand_totals
 
 
-def get_project_dashboard_data(complex_name: str, property_type: str = None):
-    """Собирает данные для дашборда с детальным логированием."""
-    print("\n" + "=" * 50)
-    print(f"[ЛОГ ДАШБОРДА] 🏁 НАЧАЛО СБОРА ДАННЫХ ДЛЯ '{complex_name}'")
-
-    today = date.today()
-    sold_statuses = current_user.company.sale_statuses
-    active_version = g.company_db_session.query(planning_models.DiscountVersion).filter_by(is_active=True).first()
-
-    prop_type_map = {member.value: member.name for member in planning_models.PropertyType}
-    if not property_type:
-        property_type = 'Квартира'
-    property_type_system_name = prop_type_map.get(property_type)
+def _get_houses_stats(complex_name: str, sold_statuses, discount_rates=None):
+    """
+    Статистика по домам ЖК для вкладки «По домам» дашборда за один запрос к MySQL.
 
-    # --- БЛОК 1: Расчет KPI карточек ---
+    Возвращает (stats, avg_price):
+        stats     — DataFrame с индексом (house_id, тип) и колонками total_count, sold_count;
+        avg_price — Series со средней ценой м² непроданных объектов после вычета 3 млн (для квартир)
+                    и скидки при 100% оплате. Пустая, если активной версии скидок нет (discount_rates=None).
+    """
+    category = case(*[(EstateSell.estate_sell_category == pt.name, pt.name) for pt in planning_models.PropertyType],
+                    else_=None).label('category')
+    rows = g.mysql_db_session.query(
+        EstateSell.house_id, category, EstateSell.estate_price, EstateSell.estate_area,
+        is_sold(statuses=sold_statuses).label('is_sold')
+    ).join(EstateHouse).filter(EstateHouse.complex_name == complex_name).order_by(EstateSell.id).all()
+
+    df = pd.DataFrame(rows, columns=['house_id', 'category', 'estate_price', 'estate_area', 'is_sold'])
+    df = df[df['category'].notna()].copy()
+    df['is_sold'] = df['is_sold'].astype(bool)
+    keys = ['house_id', 'category']
+    stats = df.groupby(keys).agg(total_count=('is_sold', 'size'), sold_count=('is_sold', 'sum'))
+
+    if discount_rates is None:
+        return stats, pd.Series(dtype=float)
+
+    unsold = df[~df['is_sold']]
+    deduction = np.where(unsold['category'] == planning_models.PropertyType.FLAT.name, 3_000_000, 0)
+    rates = unsold['category'].map(
+        lambda name: discount_rates.get(planning_models.PropertyType[name], 0)).astype(float)
+    price = unsold['estate_price'].astype(float)
+    area = unsold['estate_area'].astype(float)
+    valid = (price > deduction) & (area > 0)
+    unsold = unsold.assign(price_per_sqm=(price - deduction) * (1 - rates) / area)[valid]
+    # Суммируем последовательно, как прежний цикл, чтобы средние совпадали до последнего знака
+    avg_price = unsold.groupby(keys)['price_per_sqm'].agg(lambda values: sum(values.tolist()) / len(values))
+    return stats, avg_price
+
+
+def _get_active_discount_version():
+    return g.company_db_session.query(planning_models.DiscountVersion).filter_by(is_active=True).first()
+
+
+def _get_discount_rates(complex_name: str, active_version):
+    """Скидки активной версии при 100% оплате — один запрос на все типы недвижимости ЖК."""
+    discount_rates = {}
+    if active_version:
+        discounts = g.company_db_session.query(planning_models.Discount).filter_by(
+            version_id=active_version.id, complex_name=complex_name,
+            payment_method=planning_models.PaymentMethod.FULL_PAYMENT
+        ).order_by(planning_models.Discount.id).all()
+        for discount in discounts:
+            discount_rates.setdefault(discount.property_type,
+                                      (discount.mpp or 0) + (discount.rop or 0) + (discount.kd or 0))
+    return discount_rates
+
+
+def get_dashboard_kpi(complex_name: str, property_type: str = None):
+    """Секция дашборда: KPI-карточки (за все время) и структура остатков."""
     print("\n--- [ЛОГ ДАШБОРДА] БЛОК 1: Расчет верхних KPI-карточек ---")
+    sold_statuses = current_tenant_config().sale_statuses
+    active_version = _get_active_discount_version()
+
     total_deals_volume = g.mysql_db_session.query(func.sum(EstateDeal.deal_sum)).join(EstateSell).join(
         EstateHouse).filter(
         EstateHouse.complex_name == complex_name, EstateDeal.deal_status_name.in_(sold_statuses)
@@ -592,20 +815,14 @@ def get_project_dashboard_data(complex_name: str, property_type: str = None):
     ).scalar() or 0
     print(f"[КАРТОЧКА] 'Всего поступлений': {total_income:,.0f}")
 
+    discount_rates = _get_discount_rates(complex_name, active_version)
     remainders_by_type = {}
 
     for prop_type_enum in planning_models.PropertyType:
-        sold_ids_query = g.mysql_db_session.query(EstateSell.id).join(EstateDeal).join(EstateHouse).filter(
-            EstateHouse.complex_name == complex_name,
-            EstateSell.estate_sell_category == prop_type_enum.name,
-            EstateDeal.deal_status_name.in_(sold_statuses)
-        )
-        sold_sell_ids = {s[0] for s in sold_ids_query.all()}
-
         unsold_objects = g.mysql_db_session.query(EstateSell).join(EstateHouse).filter(
             EstateHouse.complex_name == complex_name,
             EstateSell.estate_sell_category == prop_type_enum.name,
-            EstateSell.id.notin_(sold_sell_ids)
+            is_unsold(statuses=sold_statuses)
         ).all()
 
         count_remainder = len(unsold_objects)
@@ -614,11 +831,7 @@ def get_project_dashboard_data(complex_name: str, property_type: str = None):
 
         total_discounted_price = 0
         if active_version:
-            discount = g.company_db_session.query(planning_models.Discount).filter_by(
-                version_id=active_version.id, complex_name=complex_name,
-                property_type=prop_type_enum, payment_method=planning_models.PaymentMethod.FULL_PAYMENT
-            ).first()
-            total_discount_rate = (discount.mpp or 0) + (discount.rop or 0) + (discount.kd or 0) if discount else 0
+            total_discount_rate = discount_rates.get(prop_type_enum, 0)
 
             deduction_amount = 3_000_000 if prop_type_enum == planning_models.PropertyType.FLAT else 0
             for sell in unsold_objects:
@@ -636,57 +849,38 @@ def get_project_dashboard_data(complex_name: str, property_type: str = None):
     print(f"[КАРТОЧКА] 'Стоимость остатков': {total_remainders_value:,.0f}")
     print(f"[КАРТОЧКА] 'Осталось юнитов, шт.': {total_remainders_count}")
 
-    # --- БЛОК 2: Расчет для вкладки "По домам" ---
+    remainders_chart_data = {"labels": list(remainders_by_type.keys()),
+                             "data": [v['count'] for v in remainders_by_type.values()]} if remainders_by_type else {
+        "labels": [], "data": []}
+    return {"total_deals_volume": total_deals_volume, "total_income": total_income,
+            "remainders_by_type": remainders_by_type, "remainders_chart_data": remainders_chart_data}
+
+
+def get_dashboard_houses(complex_name: str, property_type: str = None):
+    """Секция дашборда: остатки и средняя цена м² по домам."""
     print("\n--- [ЛОГ ДАШБОРДА] БЛОК 2: Расчет для вкладки 'По домам' ---")
+    sold_statuses = current_tenant_config().sale_statuses
+    active_version = _get_active_discount_version()
     houses_in_complex = g.mysql_db_session.query(EstateHouse).filter_by(complex_name=complex_name).order_by(
         EstateHouse.name).all()
+    discount_rates = _get_discount_rates(complex_name, active_version) if active_version else None
+    houses_stats, houses_avg_price = _get_houses_stats(complex_name, sold_statuses, discount_rates)
     houses_data = []
     for house in houses_in_complex:
         print(f"\n[ПО ДОМАМ] Анализ дома: '{house.name}' (ID: {house.id})")
         house_details = {"house_name": house.name, "property_types_data": {}}
         for prop_type_enum in planning_models.PropertyType:
             prop_type_value = prop_type_enum.value
-
-            total_units = g.mysql_db_session.query(func.count(EstateSell.id)).filter(
-                EstateSell.house_id == house.id, EstateSell.estate_sell_category == prop_type_enum.name
-            ).scalar()
-
-            if total_units == 0:
+            key = (house.id, prop_type_enum.name)
+            if key not in houses_stats.index:
                 continue
 
-            sold_units_in_house_query = g.mysql_db_session.query(EstateSell.id).join(EstateDeal).filter(
-                EstateSell.house_id == house.id,
-                EstateSell.estate_sell_category == prop_type_enum.name,
-                EstateDeal.deal_status_name.in_(sold_statuses)
-            )
-            sold_sell_ids_in_house = {s[0] for s in sold_units_in_house_query.all()}
-            sold_units_count = len(sold_sell_ids_in_house)
-
+            total_units = int(houses_stats.at[key, 'total_count'])
+            sold_units_count = int(houses_stats.at[key, 'sold_count'])
             remaining_count = total_units - sold_units_count
             avg_price_per_sqm = 0
-
-            if remaining_count > 0 and active_version:
-                discount = g.company_db_session.query(planning_models.Discount).filter_by(
-                    version_id=active_version.id, complex_name=complex_name,
-                    property_type=prop_type_enum, payment_method=planning_models.PaymentMethod.FULL_PAYMENT
-                ).first()
-                total_discount_rate = (discount.mpp or 0) + (discount.rop or 0) + (discount.kd or 0) if discount else 0
-
-                unsold_units_in_house = g.mysql_db_session.query(EstateSell).filter(
-                    EstateSell.house_id == house.id,
-                    EstateSell.estate_sell_category == prop_type_enum.name,
-                    EstateSell.id.notin_(sold_sell_ids_in_house)
-                ).all()
-
-                prices_per_sqm_list = []
-                deduction_amount = 3_000_000 if prop_type_enum == planning_models.PropertyType.FLAT else 0
-                for sell in unsold_units_in_house:
-                    if sell.estate_price and sell.estate_price > deduction_amount and sell.estate_area and sell.estate_area > 0:
-                        price_after_deduction = sell.estate_price - deduction_amount
-                        final_price = price_after_deduction * (1 - total_discount_rate)
-                        prices_per_sqm_list.append(final_price / sell.estate_area)
-                if prices_per_sqm_list:
-                    avg_price_per_sqm = sum(prices_per_sqm_list) / len(prices_per_sqm_list)
+            if remaining_count > 0 and key in houses_avg_price.index:
+                avg_price_per_sqm = float(houses_avg_price[key])
 
             print(
                 f"  -> Тип: {prop_type_value}, Всего: {total_units}, Продано: {sold_units_count}, Остаток: {remaining_count}, Сред. цена/м2: {avg_price_per_sqm:,.0f}")
@@ -695,8 +889,22 @@ def get_project_dashboard_data(complex_name: str, property_type: str = None):
             }
         if house_details["property_types_data"]:
             houses_data.append(house_details)
+    return houses_data
+
+
+def _dashboard_property_category(property_type: str = None):
+    """Русское название типа из фильтра дашборда -> категория в MySQL (по умолчанию квартиры)."""
+    prop_type_map = {member.value: member.name for member in planning_models.PropertyType}
+    return prop_type_map.get(property_type or planning_models.PropertyType.FLAT.value)
+
+
+def get_dashboard_plan_fact(complex_name: str, property_type: str = None):
+    """Секция дашборда: помесячный план-факт текущего года."""
+    today = date.today()
+    sold_statuses = current_tenant_config().sale_statuses
+    property_type = property_type or planning_models.PropertyType.FLAT.value
+    property_type_system_name = _dashboard_property_category(property_type)
 
-    # --- БЛОК 3: Остальные данные для дашборда (без изменений) ---
     yearly_plan_fact = {'labels': [f"{i:02}" for i in range(1, 13)], 'plan_volume': [0] * 12, 'fact_volume': [0] * 12,
                         'plan_income': [0] * 12, 'fact_income': [0] * 12}
     plans_query = g.company_db_session.query(planning_models.SalesPlan).filter_by(complex_name=complex_name,
@@ -707,35 +915,50 @@ def get_project_dashboard_data(complex_name: str, property_type: str = None):
         yearly_plan_fact['plan_income'][p.month - 1] += p.plan_income
 
     fact_volume_by_month, fact_income_by_month = [0] * 12, [0] * 12
-    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
-    volume_query = g.mysql_db_session.query(extract('month', effective_date).label('month'),
-                                            func.sum(EstateDeal.deal_sum).label('total')).join(EstateSell).join(
-        EstateHouse).filter(EstateHouse.complex_name == complex_name, EstateDeal.deal_status_name.in_(sold_statuses),
-                            effective_date.isnot(None), extract('year', effective_date) == today.year)
-    if property_type_system_name: volume_query = volume_query.filter(
-        EstateSell.estate_sell_category == property_type_system_name)
-    for row in volume_query.group_by('month').all(): fact_volume_by_month[row.month - 1] = row.total or 0
+    if fact_cube_service.covers_range(*year_range(today.year)):
+        # Помесячные факты года из локального куба (см. fact_cube_service)
+        for row in fact_cube_service.get_cube_rows(*year_range(today.year), complex_name=complex_name,
+                                                   property_category=property_type_system_name):
+            fact_volume_by_month[row.month - 1] += row.fact_volume
+            fact_income_by_month[row.month - 1] += row.paid_total
+    else:
+        effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
+        volume_query = g.mysql_db_session.query(extract('month', effective_date).label('month'),
+                                                func.sum(EstateDeal.deal_sum).label('total')).join(EstateSell).join(
+            EstateHouse).filter(EstateHouse.complex_name == complex_name, EstateDeal.deal_status_name.in_(sold_statuses),
+                                coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date,
+                                                  *year_range(today.year)))
+        if property_type_system_name: volume_query = volume_query.filter(
+            EstateSell.estate_sell_category == property_type_system_name)
+        for row in volume_query.group_by('month').all(): fact_volume_by_month[row.month - 1] = row.total or 0
+
+        income_query = g.mysql_db_session.query(extract('month', FinanceOperation.date_added).label('month'),
+                                                func.sum(FinanceOperation.summa).label('total')).join(EstateSell).join(
+            EstateHouse).filter(EstateHouse.complex_name == complex_name, FinanceOperation.status_name == 'Paid',
+                                in_year(FinanceOperation.date_added, today.year))
+        if property_type_system_name: income_query = income_query.filter(
+            EstateSell.estate_sell_category == property_type_system_name)
+        for row in income_query.group_by('month').all(): fact_income_by_month[row.month - 1] = row.total or 0
     yearly_plan_fact['fact_volume'] = fact_volume_by_month
-
-    income_query = g.mysql_db_session.query(extract('month', FinanceOperation.date_added).label('month'),
-                                            func.sum(FinanceOperation.summa).label('total')).join(EstateSell).join(
-        EstateHouse).filter(EstateHouse.complex_name == complex_name, FinanceOperation.status_name == 'Paid',
-                            extract('year', FinanceOperation.date_added) == today.year)
-    if property_type_system_name: income_query = income_query.filter(
-        EstateSell.estate_sell_category == property_type_system_name)
-    for row in income_query.group_by('month').all(): fact_income_by_month[row.month - 1] = row.total or 0
     yearly_plan_fact['fact_income'] = fact_income_by_month
+    return yearly_plan_fact
+
 
+def get_dashboard_recent_deals(complex_name: str, property_type: str = None):
+    """Секция дашборда: последние 15 проданных сделок ЖК."""
+    sold_statuses = current_tenant_config().sale_statuses
     recent_deals = g.mysql_db_session.query(EstateDeal.id, EstateDeal.deal_sum,
                                             EstateSell.estate_sell_category.label('property_type'),
                                             func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date).label(
                                                 'deal_date')).join(EstateSell).join(EstateHouse).filter(
         EstateHouse.complex_name == complex_name, EstateDeal.deal_status_name.in_(sold_statuses)).order_by(
         func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date).desc()).limit(15).all()
-    remainders_chart_data = {"labels": list(remainders_by_type.keys()),
-                             "data": [v['count'] for v in remainders_by_type.values()]} if remainders_by_type else {
-        "labels": [], "data": []}
+    return [row._asdict() for row in recent_deals]
 
+
+def get_dashboard_sales_analysis(complex_name: str, property_type: str = None):
+    """Секция дашборда: структура продаж квартир по этажам, комнатности и площадям."""
+    sold_statuses = current_tenant_config().sale_statuses
     sales_analysis = {"by_floor": {}, "by_rooms": {}, "by_area": {}}
     if (property_type if property_type else 'Квартира') == 'Квартира':
         base_query = g.mysql_db_session.query(EstateSell).join(EstateDeal).join(EstateHouse).filter(
@@ -764,17 +987,264 @@ def get_project_dashboard_data(complex_name: str, property_type: str = None):
         if area_data:
             sales_analysis['by_area']['labels'] = [row[0] for row in area_data if row[0] is not None]
             sales_analysis['by_area']['data'] = [row[1] for row in area_data if row[0] is not None]
+    return sales_analysis
+
+
+def get_dashboard_price_dynamics(complex_name: str, property_type: str = None):
+    """Секция дашборда: динамика средней цены продажи м²."""
+    return get_price_dynamics_data(complex_name, _dashboard_property_category(property_type))
+
+
+# Секции дашборда проекта: каждая считается и отдается (см. report_routes) независимо,
+# страница загружает их параллельно
+DASHBOARD_SECTIONS = {
+    'kpi': get_dashboard_kpi,
+    'houses': get_dashboard_houses,
+    'plan_fact': get_dashboard_plan_fact,
+    'sales_analysis': get_dashboard_sales_analysis,
+    'price_dynamics': get_dashboard_price_dynamics,
+    'recent_deals': get_dashboard_recent_deals,
+}
+
+
+# Секции, которые не зависят от выбранного типа недвижимости (снимок общий для всех типов)
+DASHBOARD_SECTIONS_ALL_TYPES = {'kpi', 'houses', 'recent_deals'}
+
+
+def complex_exists(complex_name: str):
+    """Есть ли в MySQL хотя бы один дом ЖК с таким названием."""
+    return g.mysql_db_session.query(EstateHouse.id).filter(
+        EstateHouse.complex_name == complex_name).first() is not None
+
+
+def get_project_dashboard_section(section: str, complex_name: str, property_type: str = None):
+    """
+    Данные одной секции дашборда из снимка компании (core.snapshot_cache).
+    Возвращает (данные, время расчета). KeyError — неизвестная секция,
+    LookupError — ЖК не найден (в кэш такой запрос не попадает).
+    """
+    builder = DASHBOARD_SECTIONS[section]
+    if section in DASHBOARD_SECTIONS_ALL_TYPES:
+        type_key = None
+    else:
+        type_key = property_type or planning_models.PropertyType.FLAT.value
+
+    def build():
+        # Проверяем только при расчете: снимок в кэше есть лишь у существующих ЖК
+        if not complex_exists(complex_name):
+            raise LookupError(f"ЖК '{complex_name}' не найден")
+        return builder(complex_name, property_type)
+
+    return snapshot_cache.get(('dashboard', section, complex_name, type_key), build)
+
+
+def get_project_dashboard_data(complex_name: str, property_type: str = None):
+    """
+    Собирает все секции дашборда разом (для экспорта, бенчмарков и советника по индексам).
+    Секции независимы и считаются параллельно, каждая в своей сессии (core.fanout).
+    """
+    print("\n" + "=" * 50)
+    print(f"[ЛОГ ДАШБОРДА] 🏁 НАЧАЛО СБОРА ДАННЫХ ДЛЯ '{complex_name}'")
 
+    sections = run_parallel({
+        name: (lambda builder=builder: builder(complex_name, property_type))
+        for name, builder in DASHBOARD_SECTIONS.items()
+    })
+    kpi = sections['kpi']
+    remainders_chart_data = kpi.pop('remainders_chart_data')
     dashboard_data = {
         "complex_name": complex_name,
-        "kpi": {"total_deals_volume": total_deals_volume, "total_income": total_income,
-                "remainders_by_type": remainders_by_type},
-        "charts": {"plan_fact_dynamics_yearly": yearly_plan_fact, "remainders_chart_data": remainders_chart_data,
-                   "sales_analysis": sales_analysis,
-                   "price_dynamics": get_price_dynamics_data(complex_name, property_type_system_name)},
-        "recent_deals": recent_deals,
-        "houses_data": houses_data,
+        "kpi": kpi,
+        "charts": {"plan_fact_dynamics_yearly": sections['plan_fact'],
+                   "remainders_chart_data": remainders_chart_data,
+                   "sales_analysis": sections['sales_analysis'],
+                   "price_dynamics": sections['price_dynamics']},
+        "recent_deals": sections['recent_deals'],
+        "houses_data": sections['houses'],
     }
 
     print("=" * 50 + "\n")
-    return dashboard_data
\ No newline at end of file
+    return dashboard_data
+
+
+# ---------------------------------------------------------------------------
+#  Портфельный дашборд: все ЖК компании за один проход
+# ---------------------------------------------------------------------------
+
+PORTFOLIO_DYNAMICS_KEYS = ('plan_volume', 'fact_volume', 'plan_income', 'fact_income')
+
+
+def _get_portfolio_discount_rates(active_version):
+    """Скидки активной версии при 100% оплате для всех ЖК: {(ЖК, категория MySQL): ставка}."""
+    rates = {}
+    if active_version:
+        discounts = g.company_db_session.query(planning_models.Discount).filter_by(
+            version_id=active_version.id, payment_method=planning_models.PaymentMethod.FULL_PAYMENT
+        ).order_by(planning_models.Discount.id).all()
+        for discount in discounts:
+            rates.setdefault((discount.complex_name, discount.property_type.name),
+                             (discount.mpp or 0) + (discount.rop or 0) + (discount.kd or 0))
+    return rates
+
+
+def _get_portfolio_remainders(sold_statuses, category_name: str, active_version):
+    """
+    Остатки всех ЖК одним запросом (NOT EXISTS по сделкам) и векторный расчет цен.
+    Возвращает DataFrame с индексом complex_name и колонками remainders_count, remainders_value,
+    bottom_price_per_sqm, а также среднюю цену м² «дно» по всему портфелю.
+    Цена «дно» — как на дашборде проекта: минус 3 млн для квартир и скидка при 100% оплате.
+    """
+    category = case(*[(EstateSell.estate_sell_category == pt.name, pt.name) for pt in planning_models.PropertyType],
+                    else_=None).label('category')
+    rows = g.mysql_db_session.query(
+        EstateHouse.complex_name, category, EstateSell.estate_price, EstateSell.estate_area
+    ).join(EstateHouse).filter(is_unsold(statuses=sold_statuses)).all()
+
+    df = pd.DataFrame(rows, columns=['complex_name', 'category', 'estate_price', 'estate_area'])
+    df = df[df['category'].notna()]
+    columns = ['remainders_count', 'remainders_value', 'bottom_price_per_sqm']
+    if df.empty:
+        return pd.DataFrame(columns=columns, dtype=float), 0.0
+
+    rates = _get_portfolio_discount_rates(active_version)
+    rate = pd.Series([rates.get(key, 0) for key in zip(df['complex_name'], df['category'])],
+                     index=df.index, dtype=float)
+    deduction = np.where(df['category'] == planning_models.PropertyType.FLAT.name, 3_000_000, 0)
+    price = df['estate_price'].astype(float).fillna(0)
+    area = df['estate_area'].astype(float).fillna(0)
+    discounted = np.where(price > deduction, (price - deduction) * (1 - rate), 0.0)
+    if not active_version:
+        # Без активной версии скидок стоимость остатков не считаем, как и на дашборде проекта
+        discounted = np.zeros(len(df))
+
+    df = df.assign(discounted=discounted,
+                   price_per_sqm=np.where(area > 0, discounted / area.where(area > 0, 1), np.nan))
+    bottom = df[(df['category'] == category_name) & (df['discounted'] > 0) & (area > 0)]
+
+    result = df.groupby('complex_name').agg(remainders_count=('category', 'size'),
+                                            remainders_value=('discounted', 'sum'))
+    result['bottom_price_per_sqm'] = bottom.groupby('complex_name')['price_per_sqm'].mean()
+    portfolio_bottom = float(bottom['price_per_sqm'].mean()) if not bottom.empty else 0.0
+    return result.fillna(0), portfolio_bottom
+
+
+def _get_portfolio_dynamics(complexes, year: int, property_type: str, category_name: str, sold_statuses):
+    """Помесячные план и факт года для всех ЖК: {ключ: ndarray (ЖК x 12)}."""
+    index = {name: i for i, name in enumerate(complexes)}
+    dynamics = {key: np.zeros((len(complexes), 12)) for key in PORTFOLIO_DYNAMICS_KEYS}
+
+    def add(key, complex_name, month, value):
+        i = index.get(complex_name)
+        if i is not None and value:
+            dynamics[key][i, int(month) - 1] += value
+
+    plans = g.company_db_session.query(
+        planning_models.SalesPlan.complex_name, planning_models.SalesPlan.month,
+        func.sum(planning_models.SalesPlan.plan_volume), func.sum(planning_models.SalesPlan.plan_income)
+    ).filter_by(year=year, property_type=property_type).group_by(
+        planning_models.SalesPlan.complex_name, planning_models.SalesPlan.month).all()
+    for complex_name, month, plan_volume, plan_income in plans:
+        add('plan_volume', complex_name, month, plan_volume)
+        add('plan_income', complex_name, month, plan_income)
+
+    if fact_cube_service.covers_range(*year_range(year)):
+        for row in fact_cube_service.get_cube_rows(*year_range(year), property_category=category_name):
+            add('fact_volume', row.complex_name, row.month, row.fact_volume)
+            add('fact_income', row.complex_name, row.month, row.paid_total)
+        return dynamics
+
+    effective_date = func.coalesce(EstateDeal.agreement_date, EstateDeal.preliminary_date)
+    volume_rows = g.mysql_db_session.query(
+        EstateHouse.complex_name, extract('month', effective_date).label('month'), func.sum(EstateDeal.deal_sum)
+    ).join(EstateSell, EstateDeal.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(EstateDeal.deal_status_name.in_(sold_statuses),
+                EstateSell.estate_sell_category == category_name,
+                coalesce_in_range(EstateDeal.agreement_date, EstateDeal.preliminary_date, *year_range(year))) \
+        .group_by(EstateHouse.complex_name, 'month').all()
+    for complex_name, month, total in volume_rows:
+        add('fact_volume', complex_name, month, total)
+
+    income_rows = g.mysql_db_session.query(
+        EstateHouse.complex_name, extract('month', FinanceOperation.date_added).label('month'),
+        func.sum(FinanceOperation.summa)
+    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(FinanceOperation.status_name == 'Paid',
+                EstateSell.estate_sell_category == category_name,
+                in_year(FinanceOperation.date_added, year)) \
+        .group_by(EstateHouse.complex_name, 'month').all()
+    for complex_name, month, total in income_rows:
+        add('fact_income', complex_name, month, total)
+    return dynamics
+
+
+def get_portfolio_dashboard(property_type: str = None, year: int = None):
+    """
+    Сводный дашборд по всем ЖК компании: контрактация и поступления за все время, остатки
+    (шт. и стоимость), средняя цена м² «дно» и помесячная динамика года по выбранному типу.
+    Каждая метрика считается одним сгруппированным по ЖК запросом, поэтому стоимость растет
+    с числом строк, а не с числом ЖК.
+    """
+    property_type = property_type or planning_models.PropertyType.FLAT.value
+    category_name = _dashboard_property_category(property_type)
+    year = year or date.today().year
+    sold_statuses = current_tenant_config().sale_statuses
+    active_version = _get_active_discount_version()
+    print(f"\n[ПОРТФЕЛЬ] 🏁 Расчет портфельного дашборда: {property_type}, {year} год")
+
+    volume_by_complex = dict(g.mysql_db_session.query(
+        EstateHouse.complex_name, func.sum(EstateDeal.deal_sum)
+    ).join(EstateSell, EstateDeal.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(EstateDeal.deal_status_name.in_(sold_statuses)).group_by(EstateHouse.complex_name).all())
+
+    income_by_complex = dict(g.mysql_db_session.query(
+        EstateHouse.complex_name, func.sum(FinanceOperation.summa)
+    ).join(EstateSell, FinanceOperation.estate_sell_id == EstateSell.id) \
+        .join(EstateHouse, EstateSell.house_id == EstateHouse.id) \
+        .filter(FinanceOperation.status_name == 'Paid').group_by(EstateHouse.complex_name).all())
+
+    remainders, portfolio_bottom = _get_portfolio_remainders(sold_statuses, category_name, active_version)
+    complexes = sorted(name for name in get_all_complex_names() if name)
+    dynamics = _get_portfolio_dynamics(complexes, year, property_type, category_name, sold_statuses)
+
+    rows = []
+    for i, complex_name in enumerate(complexes):
+        stats = remainders.loc[complex_name] if complex_name in remainders.index else None
+        rows.append({
+            'complex_name': complex_name,
+            'total_deals_volume': float(volume_by_complex.get(complex_name) or 0),
+            'total_income': float(income_by_complex.get(complex_name) or 0),
+            'remainders_count': int(stats['remainders_count']) if stats is not None else 0,
+            'remainders_value': float(stats['remainders_value']) if stats is not None else 0.0,
+            'bottom_price_per_sqm': float(stats['bottom_price_per_sqm']) if stats is not None else 0.0,
+            'fact_volume_year': float(dynamics['fact_volume'][i].sum()),
+            'fact_income_year': float(dynamics['fact_income'][i].sum()),
+        })
+
+    totals = {key: sum(row[key] for row in rows) for key in
+              ('total_deals_volume', 'total_income', 'remainders_count', 'remainders_value',
+               'fact_volume_year', 'fact_income_year')}
+    totals['bottom_price_per_sqm'] = portfolio_bottom
+    print(f"[ПОРТФЕЛЬ] ✔️ ЖК: {len(rows)}, законтрактовано: {totals['total_deals_volume']:,.0f}, "
+          f"остатки: {totals['remainders_count']} шт.")
+    return {
+        'year': year,
+        'property_type': property_type,
+        'has_active_discounts': active_version is not None,
+        'months': [f"{month:02}" for month in range(1, 13)],
+        'complexes': rows,
+        'totals': totals,
+        'dynamics': {key: values.tolist() for key, values in dynamics.items()},
+        'dynamics_totals': {key: values.sum(axis=0).tolist() for key, values in dynamics.items()},
+    }
+
+
+def get_cached_portfolio_dashboard(property_type: str = None, year: int = None):
+    """Портфельный дашборд из снимка компании: (данные, время расчета)."""
+    property_type = property_type or planning_models.PropertyType.FLAT.value
+    year = year or date.today().year
+    # Префикс 'dashboard' — чтобы снимок сбрасывался вместе с дашбордами проектов
+    return snapshot_cache.get(('dashboard', 'portfolio', property_type, year),
+                              lambda: get_portfolio_dashboard(property_type, year))
@@ -5,7 +5,7 @@ from sqlalchemy.orm import joinedload
 from ..core.extensions import db
 import json
 from datetime import date
-from flask_login import current_user
+from ..core.tenant_config import current_tenant_config
 # --- ИЗМЕНЕНИЯ ЗДЕСЬ: Обновляем импорты ---
 from ..models.estate_models import EstateHouse, EstateSell
 from ..models import planning_models
@@ -29,7 +29,7 @@ def find_apartments_by_budget(budget: float, currency: str, property_type_str: s
         raise ValueError("Не удалось получить актуальный курс валют из настроек.")
 
     budget_uzs = budget * usd_rate if currency.upper() == 'USD' else budget
-    valid_statuses = current_user.company.inventory_status_list
+    valid_statuses = current_tenant_config().inventory_statuses
     print(f"\n[SELECTION_SERVICE] 🔎 Поиск. Бюджет: {budget} {currency}. Тип: {property_type_str}")
 
     # Используем planning_models
@@ -0,0 +1,77 @@
+# app/services/sync_state_service.py
+"""
+Общий учет синхронизаций локальных агрегатов (куб фактов, ряд цен м²) в SyncLog.
+
+Каждый вид синхронизации пишет в SyncLog.details JSON с полем kind и своими отметками
+(watermarks). Здесь — создание таблиц агрегата, чтение последней успешной синхронизации
+вида и запись результата прохода (успех или ошибка) с длительностью и временем последней
+полной пересборки (last_full).
+"""
+
+import json
+import weakref
+from datetime import datetime
+
+from flask import g
+
+from ..models.system_models import SyncLog
+
+# Движок -> имена таблиц, которые в его базе уже проверены/созданы
+_ready_tables = weakref.WeakKeyDictionary()
+
+
+def ensure_tables(*models):
+    """Создает SyncLog и таблицы агрегата в базе компании (один раз на движок)."""
+    engine = g.company_db_session.get_bind()
+    ready = _ready_tables.setdefault(engine, set())
+    for model in (SyncLog,) + models:
+        if model.__tablename__ not in ready:
+            model.__table__.create(bind=engine, checkfirst=True)
+            ready.add(model.__tablename__)
+
+
+def get_last_sync(kind: str):
+    """Последняя успешная синхронизация вида kind: (SyncLog, отметки) или (None, {})."""
+    log = g.company_db_session.query(SyncLog).filter(
+        SyncLog.status == 'success',
+        SyncLog.details.like(f'%"kind": "{kind}"%')
+    ).order_by(SyncLog.id.desc()).first()
+    if log is None:
+        return None, {}
+    return log, json.loads(log.details)
+
+
+def last_full_at(marks: dict):
+    """Время последней полной пересборки из отметок или None."""
+    value = marks.get('last_full')
+    return datetime.fromisoformat(value) if value else None
+
+
+def run_logged_sync(kind: str, tag: str, full: bool, previous_marks: dict, sync):
+    """
+    Выполняет sync() — функцию без аргументов, которая пересчитывает агрегат в g.company_db_session
+    и возвращает словарь с результатом, — и записывает результат в SyncLog одной транзакцией.
+    При ошибке изменения откатываются, в SyncLog пишется запись 'failed', исключение пробрасывается.
+    """
+    session = g.company_db_session
+    started = datetime.now()
+    try:
+        result = sync()
+        details = {
+            'kind': kind,
+            'mode': 'full' if full else 'incremental',
+            **result,
+            'duration_ms': round((datetime.now() - started).total_seconds() * 1000),
+            'last_full': started.isoformat() if full else previous_marks.get('last_full'),
+        }
+        session.add(SyncLog(last_sync_timestamp=datetime.now(), status='success',
+                            details=json.dumps(details, ensure_ascii=False)))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        session.add(SyncLog(last_sync_timestamp=datetime.now(), status='failed',
+                            details=json.dumps({'kind': kind, 'error': str(e)}, ensure_ascii=False)))
+        session.commit()
+        print(f"[{tag}] ❌ Ошибка синхронизации: {e}")
+        raise
+    return details
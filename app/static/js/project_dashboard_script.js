@@ -1,11 +1,14 @@
 document.addEventListener('DOMContentLoaded', function () {
-    if (typeof charts_json_data === 'undefined') {
-        console.error('Данные для графиков (charts_json_data) не найдены.');
+    const dashboardRoot = document.getElementById('projectDashboard');
+    if (!dashboardRoot) {
+        console.error('Элемент #projectDashboard с адресом секций не найден.');
         return;
     }
 
     const usdRate = parseFloat(document.body.dataset.usdRate) || 12650;
     const initializedCharts = {}; // Хранилище для созданных графиков
+    // Данные для графиков собираются по мере загрузки секций
+    const charts_json_data = {};
 
     // --- ОБЩАЯ ФУНКЦИЯ ФОРМАТИРОВАНИЯ ВАЛЮТ ---
     function formatCurrency(value, isUsd) {
@@ -121,34 +124,170 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     };
 
+    // --- ОТРИСОВКА СЕКЦИЙ БЕЗ ГРАФИКОВ ---
+
+    // Тот же формат, что и у переключателя валют в report_script.js
+    function renderCurrencyValue(el) {
+        const uzsValue = parseFloat(el.dataset.uzsValue);
+        if (isNaN(uzsValue)) return;
+        const isUsd = document.getElementById('currencyToggle')?.checked;
+        const formatted = new Intl.NumberFormat('ru-RU').format(Math.round(isUsd ? uzsValue / usdRate : uzsValue));
+        el.textContent = isUsd ? '$ ' + formatted : formatted;
+    }
+
+    function renderKpi(kpi) {
+        const remainders = Object.values(kpi.remainders_by_type || {});
+        const values = {
+            total_deals_volume: kpi.total_deals_volume || 0,
+            total_income: kpi.total_income || 0,
+            remainders_value: remainders.reduce((sum, item) => sum + item.total_price, 0),
+            remainders_count: remainders.reduce((sum, item) => sum + item.count, 0)
+        };
+        document.querySelectorAll('#kpiCards [data-kpi]').forEach(el => {
+            const value = values[el.dataset.kpi];
+            if (el.classList.contains('currency-value')) {
+                el.dataset.uzsValue = value;
+                renderCurrencyValue(el);
+            } else {
+                el.textContent = value;
+            }
+        });
+    }
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    function renderHouses(housesData) {
+        const accordion = document.getElementById('housesAccordion');
+        if (!housesData.length) {
+            accordion.innerHTML = `<div class="alert alert-secondary text-center">${window.i18n.no_houses}</div>`;
+            return;
+        }
+        accordion.innerHTML = housesData.map((house, index) => {
+            const rows = Object.entries(house.property_types_data).map(([propType, details]) => `
+                <tr>
+                  <td class="fw-bold">${escapeHtml(window.i18n.property_types[propType] || propType)}</td>
+                  <td class="text-center fs-5 fw-bold">${details.remaining_count} / <span class="text-muted fw-normal">${details.total_count}</span></td>
+                  <td class="text-end fs-5 fw-bold currency-value" data-uzs-value="${details.avg_price_per_sqm}"></td>
+                </tr>`).join('');
+            return `
+            <div class="accordion-item">
+              <h2 class="accordion-header" id="heading-${index + 1}">
+                <button class="accordion-button collapsed" type="button" data-bs-toggle="collapse" data-bs-target="#collapse-${index + 1}">
+                  ${escapeHtml(house.house_name)}
+                </button>
+              </h2>
+              <div id="collapse-${index + 1}" class="accordion-collapse collapse" data-bs-parent="#housesAccordion">
+                <div class="accordion-body">
+                  <table class="table table-striped mb-0">
+                    <thead><tr><th>${window.i18n.property_type}</th><th class="text-center">${window.i18n.remaining}</th><th class="text-end">${window.i18n.avg_price_bottom}</th></tr></thead>
+                    <tbody>${rows}</tbody>
+                  </table>
+                </div>
+              </div>
+            </div>`;
+        }).join('');
+        accordion.querySelectorAll('.currency-value').forEach(renderCurrencyValue);
+    }
+
+    function isPaneActive(paneId) {
+        return document.getElementById(paneId)?.classList.contains('active');
+    }
+
+    // Какие графики рисовать для вкладки (если данные уже загружены)
+    function renderPaneCharts(paneId) {
+        const isUsd = document.getElementById('currencyToggle')?.checked;
+        if (paneId === 'dynamics-pane' && charts_json_data.plan_fact_dynamics_yearly && !initializedCharts['planFactChart']) {
+            chartInitializers.planFactChart(isUsd);
+        }
+        if (paneId === 'remainders-pane' && charts_json_data.remainders_chart_data && !initializedCharts['remaindersChart']) {
+            chartInitializers.remaindersChart();
+        }
+        if (paneId === 'analysis-pane' && charts_json_data.sales_analysis && !initializedCharts['floorChart']) {
+            chartInitializers.analysisCharts();
+        }
+        if (paneId === 'pricing-pane' && charts_json_data.price_dynamics && !initializedCharts['priceDynamicsChart']) {
+            chartInitializers.priceDynamicsChart(isUsd);
+        }
+    }
+
+    // --- ЗАГРУЗКА СЕКЦИЙ (все запросы уходят одновременно) ---
+    const sectionHandlers = {
+        kpi: data => {
+            renderKpi(data);
+            charts_json_data.remainders_chart_data = data.remainders_chart_data;
+            if (isPaneActive('remainders-pane')) renderPaneCharts('remainders-pane');
+        },
+        plan_fact: data => {
+            charts_json_data.plan_fact_dynamics_yearly = data;
+            if (isPaneActive('dynamics-pane')) renderPaneCharts('dynamics-pane');
+        },
+        sales_analysis: data => {
+            charts_json_data.sales_analysis = data;
+            if (isPaneActive('analysis-pane')) renderPaneCharts('analysis-pane');
+        },
+        price_dynamics: data => {
+            charts_json_data.price_dynamics = data;
+            if (isPaneActive('pricing-pane')) renderPaneCharts('pricing-pane');
+        },
+        houses: renderHouses
+    };
+
+    const sectionErrorTargets = {
+        kpi: '#kpiCards',
+        plan_fact: '#dynamics-pane .dashboard-chart-container',
+        sales_analysis: '#analysis-pane .row',
+        price_dynamics: '#pricing-pane .dashboard-chart-container',
+        houses: '#housesAccordion'
+    };
+
+    // Секции отдаются из снимка сервера: показываем время самого старого из них
+    let oldestAsOf = null;
+
+    function renderAsOf(asOf) {
+        const el = document.getElementById('dashboardAsOf');
+        if (!el || !asOf) return;
+        const value = new Date(asOf);
+        if (isNaN(value)) return;
+        if (oldestAsOf && oldestAsOf <= value) return;
+        oldestAsOf = value;
+        el.textContent = `${window.i18n.data_as_of} ${value.toLocaleString()}`;
+        el.classList.remove('d-none');
+    }
+
+    function loadSection(name) {
+        const url = dashboardRoot.dataset.sectionUrl.replace('__section__', name);
+        return fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(payload => {
+                sectionHandlers[name](payload.data);
+                renderAsOf(payload.as_of);
+            })
+            .catch(error => {
+                console.error(`Секция дашборда '${name}' не загружена:`, error);
+                const target = document.querySelector(sectionErrorTargets[name]);
+                if (target) target.innerHTML = `<div class="alert alert-warning text-center w-100">${window.i18n.load_error}</div>`;
+            });
+    }
+
+    Object.keys(sectionHandlers).forEach(loadSection);
+
     // --- ОСНОВНАЯ ЛОГИКА ---
 
-    // 1. Слушатель переключения вкладок
+    // 1. Слушатель переключения вкладок: рисуем графики вкладки, если их данные уже пришли
     const tabs = document.querySelectorAll('button[data-bs-toggle="tab"]');
     tabs.forEach(tab => {
         tab.addEventListener('shown.bs.tab', function (event) {
-            const targetPaneId = event.target.getAttribute('data-bs-target');
-            const isUsd = document.getElementById('currencyToggle')?.checked;
-
-            // Определяем, какой график нужно нарисовать
-            if (targetPaneId === '#remainders-pane' && !initializedCharts['remaindersChart']) {
-                chartInitializers.remaindersChart();
-            }
-            if (targetPaneId === '#analysis-pane' && !initializedCharts['floorChart']) {
-                chartInitializers.analysisCharts();
-            }
-            if (targetPaneId === '#pricing-pane' && !initializedCharts['priceDynamicsChart']) {
-                chartInitializers.priceDynamicsChart(isUsd);
-            }
+            renderPaneCharts(event.target.getAttribute('data-bs-target').substring(1));
         });
     });
 
-    // 2. Первичная инициализация графика на активной по-умолчанию вкладке
-    const isInitiallyUsd = document.getElementById('currencyToggle')?.checked;
-    if (!initializedCharts['planFactChart']) {
-        chartInitializers.planFactChart(isInitiallyUsd);
-    }
-
     // 3. Слушатель переключателя валют
     const currencyToggle = document.getElementById('currencyToggle');
     if (currencyToggle) {
@@ -158,12 +297,13 @@ document.addEventListener('DOMContentLoaded', function () {
             if (initializedCharts['planFactChart']) {
                 initializedCharts['planFactChart'].destroy();
                 chartInitializers.planFactChart(isNowUsd);
-implements
             }
             if (initializedCharts['priceDynamicsChart']) {
                 initializedCharts['priceDynamicsChart'].destroy();
                 chartInitializers.priceDynamicsChart(isNowUsd);
             }
+            // Значения, появившиеся после загрузки секций, форматируем сами
+            document.querySelectorAll('#kpiCards .currency-value, #housesAccordion .currency-value').forEach(renderCurrencyValue);
         });
     }
 });
\ No newline at end of file
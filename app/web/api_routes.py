@@ -10,7 +10,8 @@ from app.services import (
     report_service,
     inventory_service,
     currency_service,
-    discount_service
+    discount_service,
+    price_series_service
 )
 # --- ИЗМЕНЕНИЕ ЗДЕСЬ ---
 # Импортируем PropertyType из его нового местоположения
@@ -87,16 +88,55 @@ class PlanFactReportResource(Resource):
     def get(self):
         """Возвращает детальный план-факт отчет"""
         args = plan_fact_parser.parse_args()
-        report_data, totals = report_service.generate_plan_fact_report(
+        report_data, totals, total_refunds = report_service.generate_plan_fact_report(
             args['year'], args['month'], args['property_type']
         )
         grand_totals = report_service.calculate_grand_totals(args['year'], args['month'])
         return {
             'details': report_data,
             'totals_by_type': totals,
-            'grand_totals': grand_totals
+            'grand_totals': grand_totals,
+            'total_refunds': total_refunds
         }
 
+# --- Многолетний тренд план-факта ---
+plan_fact_trend_parser = reqparse.RequestParser()
+plan_fact_trend_parser.add_argument('start_year', type=int, required=True, help='Первый год диапазона', location='args')
+plan_fact_trend_parser.add_argument('end_year', type=int, required=True, help='Последний год диапазона', location='args')
+plan_fact_trend_parser.add_argument('property_type', type=str, required=True, help='Тип недвижимости',
+                                    choices=[pt.value for pt in PropertyType], location='args')
+
+@reports_ns.route('/plan-fact-trend', endpoint='plan_fact_trend')
+class PlanFactTrendResource(Resource):
+    @reports_ns.expect(plan_fact_trend_parser)
+    @reports_ns.response(400, 'Некорректный диапазон лет')
+    def get(self):
+        """Возвращает матрицу (ЖК × месяц) плана, факта и процента выполнения за диапазон лет"""
+        args = plan_fact_trend_parser.parse_args()
+        try:
+            return report_service.get_plan_fact_trend(args['start_year'], args['end_year'], args['property_type'])
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+# --- Сравнение динамики цены м² по ЖК ---
+price_comparison_parser = reqparse.RequestParser()
+price_comparison_parser.add_argument('complex', type=str, action='append', location='args',
+                                     help='ЖК для сравнения (можно несколько, по умолчанию все)')
+price_comparison_parser.add_argument('property_type', type=str, default=PropertyType.FLAT.value,
+                                     help='Тип недвижимости', choices=[pt.value for pt in PropertyType],
+                                     location='args')
+
+@reports_ns.route('/price-per-sqm-comparison', endpoint='price_per_sqm_comparison')
+class PricePerSqmComparisonResource(Resource):
+    @reports_ns.expect(price_comparison_parser)
+    @reports_ns.response(503, 'Ряд цен недоступен')
+    def get(self):
+        """Возвращает помесячную среднюю цену продажи м² нескольких ЖК на общей оси месяцев"""
+        args = price_comparison_parser.parse_args()
+        if not price_series_service.ensure_fresh():
+            return {'message': 'Ряд цен за м² еще не построен: он появится после синхронизации (flask fact-cube-sync)'}, 503
+        return price_series_service.get_price_comparison(args['complex'], PropertyType(args['property_type']).name)
+
 # --- Сводка по товарному запасу ---
 inventory_parser = reqparse.RequestParser()
 inventory_parser.add_argument('currency', type=str, default='UZS', choices=['UZS', 'USD'],
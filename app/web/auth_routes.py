@@ -4,7 +4,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_user, logout_user, login_required, current_user
 
 from ..core.decorators import permission_required
-from ..core.extensions import db
+from ..core.extensions import db, identity_cache
 from .forms import CreateUserForm, ChangePasswordForm, RoleForm
 
 # --- ИЗМЕНЕНИЕ ЗДЕСЬ ---
@@ -80,6 +80,7 @@ def user_management():
         user.set_password(form.password.data)
         db.session.add(user)
         db.session.commit()
+        identity_cache.clear()
         flash(f'Пользователь {user.username} успешно создан.', 'success')
         return redirect(url_for('auth.user_management'))
 
@@ -116,6 +117,7 @@ def delete_user(user_id):
 
     db.session.delete(user_to_delete)
     db.session.commit()
+    identity_cache.clear()
     flash(f'Пользователь {user_to_delete.username} удален.', 'success')
     return redirect(url_for('auth.user_management'))
 
@@ -169,6 +171,7 @@ def role_form(role_id):
             db.session.add(role)
 
         db.session.commit()
+        identity_cache.invalidate_role(role.id)
         flash(f"Роль '{role.name}' успешно сохранена.", "success")
         return redirect(url_for('auth.manage_roles'))
 
@@ -195,5 +198,6 @@ def delete_role(role_id):
 
     db.session.delete(role)
     db.session.commit()
+    identity_cache.invalidate_role(role_id)
     flash(f"Роль '{role.name}' успешно удалена.", 'success')
     return redirect(url_for('auth.manage_roles'))
\ No newline at end of file
@@ -6,6 +6,7 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_required
 from ..core.extensions import db
 from ..core.decorators import permission_required
+from ..core.query_budget import query_budget, is_query_timeout
 from flask import g
 # --- ИЗМЕНЕНИЕ ЗДЕСЬ ---
 # Импортируем модуль planning_models вместо классов из discount_models
@@ -29,6 +30,7 @@ discount_bp = Blueprint('discount', __name__, template_folder='templates')
 @discount_bp.route('/discounts')
 @login_required
 @permission_required('view_discounts')
+@query_budget('discounts_overview', seconds=15)
 def discounts_overview():
     # Сервис get_discounts_with_summary сам должен быть обновлен для работы с planning_models
     try:
@@ -37,6 +39,9 @@ def discounts_overview():
             print("[DISCOUNT ROUTES] ⚠️ Сервис get_discounts_with_summary вернул пустые данные")
         return render_template('discounts/discounts.html', title="Система скидок", structured_discounts=discounts_data)
     except Exception as e:
+        if is_query_timeout(e):
+            # Превышение лимита обрабатывает декоратор query_budget
+            raise
         print(f"[DISCOUNT ROUTES] ❌ Ошибка при получении данных о скидках: {e}")
         flash('Произошла ошибка при загрузке данных о скидках.', 'danger')
         return render_template('discounts/discounts.html', title="Система скидок", structured_discounts={})
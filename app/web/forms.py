@@ -53,6 +53,15 @@ class CreateCompanyForm(FlaskForm):
         if auth_models.Company.query.filter_by(subdomain=subdomain.data).first():
             raise ValidationError('Этот поддомен уже используется.')
 
+class EditCompanyConnectionForm(FlaskForm):
+    """Форма для изменения подключения компании к MySQL (суперадмином)."""
+    db_host = StringField('Хост MySQL (например, 172.16.0.199:9906)', validators=[DataRequired()])
+    db_name = StringField('Имя БД в MySQL', validators=[DataRequired()])
+    db_user = StringField('Пользователь MySQL (read-only)', validators=[DataRequired()])
+    db_password = PasswordField('Пароль от пользователя MySQL (оставьте пустым, чтобы не менять)',
+                                validators=[Optional()])
+    submit = SubmitField('Сохранить подключение')
+
 # ... (остальные формы без изменений)
 class UploadExcelForm(FlaskForm):
     """Форма для загрузки Excel файла."""
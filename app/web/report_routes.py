@@ -8,9 +8,11 @@ from ..core.extensions import db
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, send_file, json, g
 from flask import jsonify
 from flask_login import login_required
-from sqlalchemy import or_, extract, func
+from sqlalchemy import or_, func
 from werkzeug.utils import secure_filename
 from ..core.db_utils import require_mysql_db
+from ..core.query_budget import query_budget
+from ..core.date_ranges import in_month
 from app.core.decorators import permission_required
 from app.models import auth_models
 # Импортируем модули вместо классов из удаленных файлов
@@ -47,8 +49,7 @@ def calculate_manager_kpi(manager_id, year, month):
     # 2. Получаем фактические поступления
     fact_income_query = g.company_db_session.query(func.sum(FinanceOperation.summa)).filter(
         FinanceOperation.manager_id == manager_id,
-        extract('year', FinanceOperation.date_added) == year,
-        extract('month', FinanceOperation.date_added) == month,
+        in_month(FinanceOperation.date_added, year, month),
         FinanceOperation.status_name == "Paid",
         or_(
             FinanceOperation.payment_type != "Возврат поступлений при отмене сделки",
@@ -79,14 +80,22 @@ def calculate_manager_kpi(manager_id, year, month):
 @login_required
 @permission_required('view_plan_fact_report')
 def export_expected_income_details():
-    ids_str = request.args.get('ids', '')
-    excel_stream = report_service.generate_ids_excel(ids_str)
+    # Параметры расшифровки формирует report_service.expected_income_drilldown
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    if not year or not month or not 1 <= month <= 12:
+        abort(400, "Не указан месяц расшифровки.")
+    excel_stream = report_service.generate_expected_income_excel(
+        year, month,
+        property_type=request.args.get('property_type') or None,
+        complex_name=request.args.get('complex_name') or None
+    )
 
     if excel_stream is None:
         flash("Нет данных для экспорта.", "warning")
         return redirect(request.referrer or url_for('report.plan_fact_report'))
 
-    filename = f"expected_income_details_{date.today()}.xlsx"
+    filename = f"expected_income_details_{year}_{month:02d}.xlsx"
     return send_file(
         excel_stream,
         download_name=filename,
@@ -140,6 +149,14 @@ def download_plan_template():
     )
 
 
+def _parse_iso_date(value):
+    """Дата из параметра запроса в формате YYYY-MM-DD или None."""
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 @report_bp.route('/plan-fact', methods=['GET'])
 @login_required
 @permission_required('view_plan_fact_report')
@@ -159,12 +176,16 @@ def plan_fact_report():
     is_period_view = period != 'monthly'
     total_refunds = 0
 
+    start_date = _parse_iso_date(request.args.get('start_date'))
+    end_date = _parse_iso_date(request.args.get('end_date'))
+
     if is_period_view:
-        report_data, totals = report_service.generate_consolidated_report_by_period(year, period, prop_type)
+        if period == 'custom' and not report_service.resolve_period(year, period, start_date, end_date):
+            flash("Для произвольного периода укажите корректные даты начала и окончания.", "warning")
+        report_data, totals, total_refunds = report_service.generate_consolidated_report_by_period(
+            year, period, prop_type, start_date=start_date, end_date=end_date)
         summary_data = []
         grand_totals = {}
-        for m in report_service.PERIOD_MONTHS.get(period, []):
-            total_refunds += report_service.get_refund_data(year, m, prop_type)
     else:
         summary_data = report_service.get_monthly_summary_by_property_type(year, month)
         # Передаем правильное значение 'prop_type' в сервис
@@ -184,10 +205,38 @@ def plan_fact_report():
                            selected_year=year,
                            selected_month=month,
                            selected_period=period,
+                           selected_start_date=start_date,
+                           selected_end_date=end_date,
                            is_period_view=is_period_view,
                            usd_to_uzs_rate=usd_rate,
                            selected_prop_type=prop_type)
 
+@report_bp.route('/plan-fact-trend', methods=['GET'])
+@login_required
+@permission_required('view_plan_fact_report')
+@query_budget('plan_fact_trend', seconds=30)
+def plan_fact_trend():
+    """Многолетний тренд выполнения плана по ЖК."""
+    today = date.today()
+    end_year = request.args.get('end_year', today.year, type=int)
+    start_year = request.args.get('start_year', end_year - 2, type=int)
+    prop_type = request.args.get('property_type', planning_models.PropertyType.FLAT.value)
+
+    try:
+        trend = report_service.get_plan_fact_trend(start_year, end_year, prop_type)
+    except ValueError as e:
+        flash(str(e), "warning")
+        trend = None
+
+    return render_template('reports/plan_fact_trend.html',
+                           title="Тренд план-факта",
+                           trend=trend,
+                           years=list(range(today.year - 6, today.year + 2)),
+                           property_types=list(planning_models.PropertyType),
+                           selected_start_year=start_year,
+                           selected_end_year=end_year,
+                           selected_prop_type=prop_type)
+
 @report_bp.route('/upload-plan', methods=['GET', 'POST'])
 @login_required
 @permission_required('upload_data')
@@ -244,23 +293,57 @@ def generate_complex_kp(sell_id):
 @login_required
 @permission_required('view_project_dashboard')
 def project_dashboard(complex_name):
-    selected_prop_type = request.args.get('property_type', None)
-    data = report_service.get_project_dashboard_data(complex_name, selected_prop_type)
-    if not data:
+    """Каркас дашборда проекта: секции страница загружает параллельно из project_dashboard_section."""
+    if not report_service.complex_exists(complex_name):
         abort(404)
+    selected_prop_type = request.args.get('property_type', None)
     property_types = [pt.value for pt in planning_models.PropertyType]
-    charts_json = json.dumps(data.get('charts', {}))
     usd_rate = currency_service.get_current_effective_rate()
     return render_template(
         'reports/project_dashboard.html',
         title=f"Аналитика по проекту {complex_name}",
-        data=data,
-        charts_json=charts_json,
+        complex_name=complex_name,
         property_types=property_types,
         selected_prop_type=selected_prop_type,
         usd_to_uzs_rate=usd_rate
     )
 
+
+@report_bp.route('/project-dashboard-section/<section>/<path:complex_name>')
+@login_required
+@permission_required('view_project_dashboard')
+@query_budget('project_dashboard', seconds=20)
+def project_dashboard_section(section, complex_name):
+    """JSON одной секции дашборда проекта."""
+    if section not in report_service.DASHBOARD_SECTIONS:
+        abort(404)
+    selected_prop_type = request.args.get('property_type', None)
+    try:
+        data, as_of = report_service.get_project_dashboard_section(section, complex_name, selected_prop_type)
+    except LookupError:
+        abort(404)
+    return jsonify({'data': data, 'as_of': as_of.isoformat(timespec='seconds')})
+
+@report_bp.route('/portfolio-dashboard')
+@login_required
+@permission_required('view_project_dashboard')
+@query_budget('portfolio_dashboard', seconds=30)
+def portfolio_dashboard():
+    """Сводный дашборд по всем ЖК компании."""
+    today = date.today()
+    prop_type = request.args.get('property_type', planning_models.PropertyType.FLAT.value)
+    year = request.args.get('year', today.year, type=int)
+    portfolio, as_of = report_service.get_cached_portfolio_dashboard(prop_type, year)
+    return render_template('reports/portfolio_dashboard.html',
+                           title="Портфель проектов",
+                           portfolio=portfolio,
+                           as_of=as_of,
+                           years=list(range(today.year - 5, today.year + 1)),
+                           property_types=list(planning_models.PropertyType),
+                           selected_prop_type=prop_type,
+                           selected_year=year)
+
+
 @report_bp.route('/currency-settings', methods=['GET', 'POST'])
 @login_required
 @permission_required('manage_settings')
@@ -527,6 +610,7 @@ def funnel_leads():
 @report_bp.route('/sales-funnel')
 @login_required
 @permission_required('view_plan_fact_report')
+@query_budget('sales_funnel', seconds=15)
 def sales_funnel():
     # Даты по умолчанию
     end_date_str = request.args.get('end_date') or date.today().isoformat()
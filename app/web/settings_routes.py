@@ -1,15 +1,17 @@
 # app/web/settings_routes.py
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, g
 from flask_login import login_required
 from app.core.decorators import permission_required
-from app.services import settings_service
+from app.services import settings_service, calendar_service
 from .forms import CalculatorSettingsForm, DealStatusSettingsForm
-from ..core.extensions import db
+from ..core.extensions import db, identity_cache, snapshot_cache
+from ..core.tenant_config import current_tenant_config
 from ..models import auth_models
 from ..models.estate_models import EstateHouse
 from ..services import data_service
 from flask_login import current_user
+from datetime import date
 settings_bp = Blueprint('settings', __name__, template_folder='templates')
 
 @settings_bp.route('/calculator-settings', methods=['GET', 'POST'])
@@ -53,12 +55,16 @@ def deal_status_settings():
         current_user.company.deal_statuses = ','.join(form.deal_statuses.data)
         current_user.company.inventory_statuses = ','.join(form.inventory_statuses.data)
         db.session.commit()
+        g.tenant_config = identity_cache.replace_tenant_config(current_user.company)
+        # Остатки и продажи на дашбордах зависят от статусов — сбрасываем снимки
+        snapshot_cache.invalidate(current_user.company_id)
         flash('Настройки статусов успешно обновлены.', 'success')
         return redirect(url_for('settings.deal_status_settings'))
 
     if request.method == 'GET':
-        form.deal_statuses.data = current_user.company.sale_statuses
-        form.inventory_statuses.data = current_user.company.inventory_status_list
+        tenant_config = current_tenant_config()
+        form.deal_statuses.data = list(tenant_config.sale_statuses)
+        form.inventory_statuses.data = list(tenant_config.inventory_statuses)
 
     return render_template(
         'settings/deal_status_settings.html',
@@ -120,4 +126,36 @@ def manage_email_recipients():
         title="Получатели уведомлений",
         all_users=all_users,
         subscribed_user_ids=subscribed_user_ids
-    )
\ No newline at end of file
+    )
+
+
+@settings_bp.route('/holidays', methods=['GET', 'POST'])
+@login_required
+@permission_required('manage_settings')
+def manage_holidays():
+    """Производственный календарь: праздники, которые не считаются рабочими днями в прогнозах план-факта."""
+    if request.method == 'POST':
+        action = request.form.get('action')
+        if action == 'delete':
+            message, category = calendar_service.delete_holiday(request.form.get('holiday_id', type=int))
+            flash(message, category)
+        else:
+            name = (request.form.get('name') or '').strip()
+            try:
+                holiday_date = date.fromisoformat(request.form.get('holiday_date', ''))
+            except ValueError:
+                holiday_date = None
+            if not holiday_date or not name:
+                flash('Укажите дату и название праздника.', 'danger')
+            else:
+                message, category = calendar_service.add_holiday(
+                    holiday_date, name, is_recurring=bool(request.form.get('is_recurring'))
+                )
+                flash(message, category)
+        return redirect(url_for('settings.manage_holidays'))
+
+    return render_template(
+        'settings/holidays.html',
+        title="Производственный календарь",
+        holidays=calendar_service.get_all_holidays()
+    )
@@ -1,12 +1,17 @@
 import os
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort, \
+    send_from_directory
 from flask_login import login_required, current_user
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 
-from ..core.extensions import db
+from ..core.extensions import db, engine_registry, tenant_health, identity_cache, sql_metrics, \
+    request_profiler
+from ..core.query_budget import budget_log
 from ..models import auth_models, planning_models, estate_models, finance_models, exclusion_models, funnel_models, \
     special_offer_models
-from .forms import CreateCompanyForm, CreateUserForm
+from ..services import calendar_service
+from .forms import CreateCompanyForm, CreateUserForm, EditCompanyConnectionForm
 
 super_admin_bp = Blueprint('super_admin', __name__, template_folder='templates')
 
@@ -64,6 +69,9 @@ def dashboard():
             ]
             for metadata in models_metadata:
                 metadata.create_all(bind=engine)
+            # Таблица праздников создана пустой — заполняем ее праздниками по умолчанию
+            with engine.begin() as connection:
+                calendar_service.seed_default_holidays(connection)
 
             flash(f"Локальная база данных для '{new_company.name}' успешно создана.", "info")
             return redirect(url_for('super_admin.dashboard'))
@@ -103,4 +111,74 @@ def create_company_admin(company_id):
         flash(f"Администратор '{new_admin.username}' для компании '{company.name}' успешно создан.", "success")
         return redirect(url_for('super_admin.dashboard'))
 
-    return render_template('super_admin/create_company_admin.html', title=f"Создать админа для {company.name}", company=company, form=form)
\ No newline at end of file
+    return render_template('super_admin/create_company_admin.html', title=f"Создать админа для {company.name}", company=company, form=form)
+
+
+@super_admin_bp.route('/super-admin/company/<int:company_id>/connection', methods=['GET', 'POST'])
+def edit_company_connection(company_id):
+    """Страница для изменения подключения компании к MySQL."""
+    company = auth_models.Company.query.get_or_404(company_id)
+    form = EditCompanyConnectionForm()
+    current_url = make_url(company.mysql_db_uri) if company.mysql_db_uri else None
+
+    if form.validate_on_submit():
+        password = form.db_password.data or (current_url.password if current_url else '')
+        company.mysql_db_uri = (f"mysql+pymysql://{form.db_user.data}:{password}@"
+                                f"{form.db_host.data}/{form.db_name.data}")
+        db.session.commit()
+        # Старые пулы соединений компании больше не действительны
+        engine_registry.invalidate(company.id)
+        tenant_health.reset(company.id)
+        identity_cache.replace_tenant_config(company)
+        flash(f"Подключение к MySQL для '{company.name}' обновлено.", "success")
+        return redirect(url_for('super_admin.dashboard'))
+
+    if request.method == 'GET' and current_url:
+        form.db_host.data = f"{current_url.host}:{current_url.port}" if current_url.port else current_url.host
+        form.db_name.data = current_url.database
+        form.db_user.data = current_url.username
+
+    return render_template('super_admin/edit_company_connection.html', title=f"Подключение {company.name}",
+                           company=company, form=form)
+
+
+@super_admin_bp.route('/super-admin/tenant-health', methods=['GET', 'POST'])
+def tenant_health_status():
+    """Состояние подключений компаний к MySQL (предохранители)."""
+    if request.method == 'POST':
+        company_id = request.form.get('company_id', type=int)
+        if company_id:
+            tenant_health.reset(company_id)
+            flash(f"Предохранитель компании ID {company_id} сброшен.", "success")
+        return redirect(url_for('super_admin.tenant_health_status'))
+
+    health_by_company = tenant_health.snapshot()
+    companies = auth_models.Company.query.order_by(auth_models.Company.name).all()
+    rows = [{'company': c, 'health': health_by_company.get(c.id)} for c in companies]
+    return render_template('super_admin/tenant_health.html', title="Состояние подключений", rows=rows,
+                           budget_counts=budget_log.counts(), budget_events=budget_log.recent())
+
+
+@super_admin_bp.route('/admin/perf', methods=['GET', 'POST'])
+def perf_dashboard():
+    """Сводка времени ответа и SQL-запросов по эндпоинтам (p50/p95/max)."""
+    if request.method == 'POST':
+        sql_metrics.store.clear()
+        flash("Статистика производительности очищена.", "success")
+        return redirect(url_for('super_admin.perf_dashboard'))
+
+    return render_template('super_admin/perf.html', title="Производительность", rows=sql_metrics.store.summary())
+
+
+@super_admin_bp.route('/admin/profiles')
+def profiles_list():
+    """Список сохраненных профилей запросов (?__profile=1 или выборка по PROFILER_SAMPLE_RATE)."""
+    return render_template('super_admin/profiles.html', title="Профили запросов",
+                           profiles=request_profiler.list_profiles())
+
+
+@super_admin_bp.route('/admin/profiles/<name>.<extension>')
+def download_profile(name, extension):
+    if extension not in ('prof', 'txt'):
+        abort(404)
+    return send_from_directory(request_profiler.profiles_dir, f"{name}.{extension}", as_attachment=extension == 'prof')
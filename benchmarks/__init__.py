@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Инструменты для замеров производительности на синтетических данных компании."""
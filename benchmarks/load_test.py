@@ -0,0 +1,251 @@
+# benchmarks/load_test.py
+"""
+Нагрузочный тест HTTP: несколько пользователей параллельно открывают страницы
+по взвешенному набору маршрутов, в конце печатается пропускная способность и p50/p95/p99.
+
+1. Подготовить компанию с синтетической базой и пользователями (нужны роли из run.py):
+    python -m benchmarks.load_test seed --db instance/loadtest.db --scale medium --users 8
+2. Запустить приложение (python run.py или gunicorn) и дать нагрузку:
+    python -m benchmarks.load_test run --base-url http://localhost:5001 --manifest instance/loadtest.db.json \
+        --concurrency 8 --duration 60
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import requests
+
+from .synthetic_tenant import SCALES, generate_tenant_db
+
+LOADTEST_SUBDOMAIN = 'loadtest'
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# ---------------------------------------------------------------------------
+#  Подготовка данных
+# ---------------------------------------------------------------------------
+
+def seed(db_path: str, scale: str, users: int, password: str):
+    """Создает синтетическую базу, компанию 'loadtest' и пользователей loadtest1..N."""
+    from sqlalchemy import create_engine, text
+    from app import create_app
+    from app.core.config import DevelopmentConfig
+    from app.core.extensions import db
+    from app.models import auth_models
+
+    db_path = os.path.abspath(db_path)
+    counts = generate_tenant_db(db_path, **SCALES[scale])
+    db_uri = f'sqlite:///{db_path}'
+
+    app = create_app(DevelopmentConfig)
+    with app.app_context():
+        role = auth_models.Role.query.filter_by(name='MANAGER').first()
+        if role is None:
+            raise SystemExit("[LOAD TEST] ❌ Роль MANAGER не найдена. Сначала запустите run.py, чтобы создать роли.")
+
+        company = auth_models.Company.query.filter_by(subdomain=LOADTEST_SUBDOMAIN).first()
+        if company is None:
+            company = auth_models.Company(name='Load Test', subdomain=LOADTEST_SUBDOMAIN, db_uri=db_uri)
+            db.session.add(company)
+        company.db_uri = db_uri
+        company.mysql_db_uri = db_uri
+        db.session.flush()
+
+        usernames = []
+        for i in range(1, users + 1):
+            username = f'loadtest{i}'
+            user = auth_models.User.query.filter_by(username=username).first()
+            if user is None:
+                user = auth_models.User(username=username, full_name=f'Нагрузочный тест {i}',
+                                        email=f'{username}@example.com')
+                db.session.add(user)
+            user.role = role
+            user.company_id = company.id
+            user.set_password(password)
+            usernames.append(username)
+        db.session.commit()
+
+    engine = create_engine(db_uri)
+    with engine.connect() as conn:
+        sell_ids = [row[0] for row in conn.execute(text("SELECT id FROM estate_sells ORDER BY id"))]
+        complex_names = [row[0] for row in conn.execute(text("SELECT DISTINCT complex_name FROM estate_houses"))]
+    engine.dispose()
+
+    manifest_path = f'{db_path}.json'
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'users': usernames, 'password': password, 'sell_ids': sell_ids,
+                   'complex_names': complex_names}, f, ensure_ascii=False)
+    print(f"[LOAD TEST] ✔️ База и пользователи готовы: {counts}. Манифест: {manifest_path}")
+
+
+# ---------------------------------------------------------------------------
+#  Набор маршрутов
+# ---------------------------------------------------------------------------
+
+def build_route_mix(manifest: dict):
+    """Взвешенный набор запросов: (имя, вес, функция(session, base_url) -> Response)."""
+    today = date.today()
+    sell_ids = manifest['sell_ids']
+    complex_names = manifest['complex_names']
+
+    def selection_page(s, base):
+        return s.get(f'{base}/selection')
+
+    def selection_search(s, base):
+        return s.post(f'{base}/selection', data={
+            'budget': random.choice([40000, 60000, 90000, 150000]), 'currency': 'USD',
+            'property_type': 'Квартира', 'payment_method': '100% оплата',
+        })
+
+    def apartment(s, base):
+        return s.get(f'{base}/apartment/{random.choice(sell_ids)}')
+
+    def plan_fact(s, base):
+        month = random.randint(1, today.month)
+        return s.get(f'{base}/reports/plan-fact', params={'year': today.year, 'month': month,
+                                                         'property_type': 'Квартира'})
+
+    def project_dashboard(s, base):
+        return s.get(f'{base}/reports/project-dashboard/{random.choice(complex_names)}')
+
+    def sales_funnel(s, base):
+        start = today - timedelta(days=random.choice([30, 90, 180]))
+        return s.get(f'{base}/reports/sales-funnel', params={'start_date': start.isoformat(),
+                                                             'end_date': today.isoformat()})
+
+    def api_search(s, base):
+        return s.post(f'{base}/api/v1/apartments/search', json={
+            'budget': random.choice([40000, 60000, 90000]), 'currency': 'USD', 'property_type_str': 'Квартира',
+        })
+
+    return [
+        ('selection', 15, selection_page),
+        ('selection_search', 10, selection_search),
+        ('apartment', 25, apartment),
+        ('plan_fact', 10, plan_fact),
+        ('project_dashboard', 10, project_dashboard),
+        ('sales_funnel', 5, sales_funnel),
+        ('api_apartments_search', 25, api_search),
+    ]
+
+
+# ---------------------------------------------------------------------------
+#  Прогон
+# ---------------------------------------------------------------------------
+
+def login(base_url: str, username: str, password: str) -> requests.Session:
+    session = requests.Session()
+    response = session.post(f'{base_url}/login', data={'username': username, 'password': password},
+                            allow_redirects=False)
+    if response.status_code != 302 or '/login' in response.headers.get('Location', ''):
+        raise SystemExit(f"[LOAD TEST] ❌ Не удалось войти как '{username}' (HTTP {response.status_code}).")
+    return session
+
+
+def run(base_url: str, manifest: dict, concurrency: int, duration: float, warmup: float, timeout: float):
+    routes = build_route_mix(manifest)
+    names = [r[0] for r in routes]
+    weights = [r[1] for r in routes]
+    handlers = {r[0]: r[2] for r in routes}
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    started_at = time.monotonic()
+    measure_from = started_at + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_index: int):
+        username = manifest['users'][worker_index % len(manifest['users'])]
+        session = login(base_url, username, manifest['password'])
+        session.request = _with_timeout(session.request, timeout)
+        while time.monotonic() < stop_at:
+            name = random.choices(names, weights=weights, k=1)[0]
+            request_started = time.monotonic()
+            try:
+                response = handlers[name](session, base_url)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.monotonic() - request_started
+            if request_started < measure_from:
+                continue
+            with lock:
+                latencies[name].append(elapsed)
+                if not ok:
+                    errors[name] += 1
+
+    print(f"[LOAD TEST] 🚀 {concurrency} потоков, прогрев {warmup:.0f} с, замер {duration:.0f} с → {base_url}")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+
+    report(latencies, errors, duration)
+
+
+def _with_timeout(request_method, timeout):
+    def request_with_timeout(method, url, **kwargs):
+        kwargs.setdefault('timeout', timeout)
+        return request_method(method, url, **kwargs)
+    return request_with_timeout
+
+
+def report(latencies: dict, errors: dict, duration: float):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{'Маршрут':<24}{'Запросов':>10}{'Ошибок':>8}{'RPS':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    all_values = []
+    for name in sorted(latencies):
+        values = sorted(v * 1000 for v in latencies[name])
+        all_values.extend(values)
+        print(f"{name:<24}{len(values):>10}{errors.get(name, 0):>8}{len(values) / duration:>8.1f}"
+              f"{_percentile(values, 50):>10.0f}{_percentile(values, 95):>10.0f}{_percentile(values, 99):>10.0f}")
+    all_values.sort()
+    print(f"{'ИТОГО':<24}{total:>10}{sum(errors.values()):>8}{total / duration:>8.1f}"
+          f"{_percentile(all_values, 50):>10.0f}{_percentile(all_values, 95):>10.0f}{_percentile(all_values, 99):>10.0f}")
+    if all_values:
+        print(f"\nСреднее время ответа: {statistics.mean(all_values):.0f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест по взвешенному набору маршрутов")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help="Создать синтетическую компанию и пользователей")
+    seed_parser.add_argument('--db', default='instance/loadtest.db')
+    seed_parser.add_argument('--scale', choices=SCALES.keys(), default='medium')
+    seed_parser.add_argument('--users', type=int, default=8)
+    seed_parser.add_argument('--password', default='loadtest')
+
+    run_parser = subparsers.add_parser('run', help="Дать нагрузку на запущенное приложение")
+    run_parser.add_argument('--base-url', default='http://localhost:5001')
+    run_parser.add_argument('--manifest', default='instance/loadtest.db.json')
+    run_parser.add_argument('--concurrency', type=int, default=4)
+    run_parser.add_argument('--duration', type=float, default=60, help="Длительность замера, с")
+    run_parser.add_argument('--warmup', type=float, default=5, help="Прогрев перед замером, с")
+    run_parser.add_argument('--timeout', type=float, default=60, help="Таймаут одного запроса, с")
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args.db, args.scale, args.users, args.password)
+    else:
+        with open(args.manifest, encoding='utf-8') as f:
+            manifest = json.load(f)
+        run(args.base_url.rstrip('/'), manifest, args.concurrency, args.duration, args.warmup, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# benchmarks/run_benchmarks.py
+"""
+Замеры сервисов отчетов на синтетических базах разных размеров.
+
+Для каждого размера генерируется база (см. synthetic_tenant.py), затем каждый сервис
+вызывается несколько раз в контексте запроса Flask. Результат (время и число SQL-запросов)
+сохраняется в JSON и может сравниваться с сохраненным ранее базовым замером.
+
+Пример:
+    python -m benchmarks.run_benchmarks --scales small medium --save benchmarks/baselines/main.json
+    python -m benchmarks.run_benchmarks --scales small medium --compare benchmarks/baselines/main.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from flask import g
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import create_app
+from app.core.config import DevelopmentConfig
+from app.core.sql_metrics import RequestSqlStats
+from app.core.tenant_config import TenantConfig
+from app.services import (report_service, selection_service, inventory_service, discount_service, funnel_service,
+                          manager_analytics_service, fact_cube_service)
+from .synthetic_tenant import SCALES, generate_tenant_db
+
+
+class BenchmarkConfig(DevelopmentConfig):
+    DEBUG = False
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    PROFILER_SAMPLE_RATE = 0
+
+
+def _cases(anchor: date):
+    """Список замеряемых вызовов: (имя, функция без аргументов)."""
+    year, month = anchor.year, anchor.month
+    funnel_start = (anchor - timedelta(days=90)).isoformat()
+    return [
+        ('generate_plan_fact_report', lambda: report_service.generate_plan_fact_report(year, month, 'Квартира')),
+        ('get_project_dashboard_data',
+         lambda: report_service.get_project_dashboard_data('ЖК Синтетика 01', None)),
+        ('find_apartments_by_budget',
+         lambda: selection_service.find_apartments_by_budget(100000, 'USD', 'Квартира')),
+        ('get_inventory_summary_data', inventory_service.get_inventory_summary_data),
+        ('get_discounts_with_summary', discount_service.get_discounts_with_summary),
+        ('get_funnel_data', lambda: funnel_service.get_funnel_data(funnel_start, anchor.isoformat())),
+        ('get_manager_analytics_report', lambda: manager_analytics_service.get_manager_analytics_report(year, month)),
+        # Последним: после синхронизации отчеты в той же базе начнут читать куб
+        ('sync_fact_cube_full', lambda: fact_cube_service.sync_fact_cube(full=True)),
+    ]
+
+
+def _tenant_config(db_uri: str):
+    company = SimpleNamespace(
+        id=0, name='Synthetic', subdomain='synthetic', db_uri=db_uri, mysql_db_uri=db_uri,
+        deal_statuses=None, inventory_statuses=None, mail_server=None, mail_port=None,
+        mail_use_tls=False, mail_username=None, mail_password=None,
+    )
+    return TenantConfig(company)
+
+
+def run_case(app, session_factory, config, func, repeat: int):
+    """Выполняет func repeat раз, каждый раз в свежем контексте запроса с новыми сессиями."""
+    timings, query_counts, error = [], [], None
+    for _ in range(repeat):
+        with app.test_request_context():
+            g.tenant_config = config
+            g.company_db_session = session_factory()
+            g.mysql_db_session = session_factory()
+            g.sql_stats = RequestSqlStats(top_n=5)
+            started = time.perf_counter()
+            try:
+                # Сервисы подробно логируют в stdout — на время замера глушим вывод
+                with contextlib.redirect_stdout(io.StringIO()):
+                    func()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                timings.append(time.perf_counter() - started)
+                query_counts.append(g.sql_stats.query_count)
+                g.company_db_session.close()
+                g.mysql_db_session.close()
+        if error:
+            break
+    return {
+        'min_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'mean_ms': statistics.mean(timings) * 1000,
+        'queries': max(query_counts),
+        'runs': len(timings),
+        'error': error,
+    }
+
+
+def run(scales, repeat: int, workdir: str, anchor: date):
+    app = create_app(BenchmarkConfig)
+    results = {}
+    for scale in scales:
+        db_path = os.path.join(workdir, f'bench_{scale}.db')
+        print(f"[BENCHMARK] 🏗️ Генерация базы '{scale}'...")
+        counts = generate_tenant_db(db_path, anchor=anchor, **SCALES[scale])
+        db_uri = f'sqlite:///{db_path}'
+        engine = create_engine(db_uri)
+        session_factory = sessionmaker(bind=engine)
+        config = _tenant_config(db_uri)
+
+        scale_results = {'rows': counts, 'cases': {}}
+        for name, func in _cases(anchor):
+            result = run_case(app, session_factory, config, func, repeat)
+            scale_results['cases'][name] = result
+            status = f"❌ {result['error']}" if result['error'] else ''
+            print(f"  {scale:<7} {name:<32} median {result['median_ms']:9.1f} мс  "
+                  f"SQL {result['queries']:>5}  {status}")
+        engine.dispose()
+        results[scale] = scale_results
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'anchor_date': anchor.isoformat(),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'scales': results,
+    }
+
+
+def compare(current: dict, baseline: dict):
+    """Печатает изменение медианного времени и числа запросов относительно базового замера."""
+    print(f"\n[BENCHMARK] 📊 Сравнение с замером от {baseline.get('created_at')}:")
+    for scale, scale_results in current['scales'].items():
+        base_cases = baseline.get('scales', {}).get(scale, {}).get('cases', {})
+        for name, result in scale_results['cases'].items():
+            base = base_cases.get(name)
+            if not base or base.get('error') or result['error']:
+                continue
+            delta = (result['median_ms'] - base['median_ms']) / base['median_ms'] * 100 if base['median_ms'] else 0
+            print(f"  {scale:<7} {name:<32} {base['median_ms']:9.1f} → {result['median_ms']:9.1f} мс "
+                  f"({delta:+6.1f}%)  SQL {base['queries']} → {result['queries']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры сервисов отчетов на синтетических данных")
+    parser.add_argument('--scales', nargs='+', choices=SCALES.keys(), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--anchor-date', type=date.fromisoformat, default=date.today())
+    parser.add_argument('--workdir', help="Папка для сгенерированных баз (по умолчанию временная)")
+    parser.add_argument('--save', help="Сохранить результат в JSON (базовый замер)")
+    parser.add_argument('--compare', help="Сравнить с ранее сохраненным JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        report = run(args.scales, args.repeat, args.workdir or tmpdir, args.anchor_date)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n[BENCHMARK] 💾 Результат сохранен в '{args.save}'")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
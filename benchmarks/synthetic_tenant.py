@@ -0,0 +1,276 @@
+# benchmarks/synthetic_tenant.py
+"""
+Генератор синтетической базы компании в SQLite.
+
+Создает схему внешней MySQL (estate_houses, estate_sells, estate_deals, finances,
+estate_buys, estate_buys_statuses_log, users) и локальные таблицы (планы, скидки,
+курс валют) в одном файле. Его можно подключить к компании и как db_uri, и как mysql_db_uri.
+
+Пример:
+    python -m benchmarks.synthetic_tenant instance/bench_tenant.db --complexes 10 --units-per-house 300
+"""
+
+import argparse
+import os
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import MetaData, String, Enum, create_engine
+from sqlalchemy.orm import Session
+
+from app.core.extensions import db
+from app.models import (auth_models, planning_models, estate_models, finance_models, exclusion_models,
+                        funnel_models, special_offer_models)  # noqa: F401 — регистрируем все таблицы в metadata
+
+# Таблицы, которые в проде живут в MySQL компании
+MYSQL_TABLES = {
+    'estate_houses', 'estate_sells', 'estate_deals', 'finances',
+    'estate_buys', 'estate_buys_statuses_log', 'users', 'system_users',
+}
+
+SCALES = {
+    'small': dict(complexes=3, houses_per_complex=3, units_per_house=60, deal_ratio=0.5, leads=1000,
+                  logs_per_lead=4, managers=10),
+    'medium': dict(complexes=8, houses_per_complex=5, units_per_house=150, deal_ratio=0.55, leads=10000,
+                   logs_per_lead=5, managers=30),
+    'large': dict(complexes=20, houses_per_complex=8, units_per_house=250, deal_ratio=0.6, leads=60000,
+                  logs_per_lead=6, managers=80),
+}
+
+CATEGORY_WEIGHTS = [('flat', 0.8), ('comm', 0.08), ('garage', 0.08), ('storageroom', 0.04)]
+INVENTORY_STATUSES = ['Маркетинговый резерв', 'Подбор', 'Бронь']
+DEAL_STATUS_WEIGHTS = [('Сделка проведена', 0.6), ('Сделка в работе', 0.25), ('Сделка отменена', 0.1),
+                       ('Не понравилось', 0.05)]
+REFUND_TYPE = 'Возврат поступлений при отмене сделки'
+USD_RATE = 12650.0
+
+# Переходы статусов заявки: (статус, доп. статус) -> [(следующий шаг, вес)]
+LEAD_TRANSITIONS = {
+    ('Новая', None): [(('Подбор', None), 0.7), (('Нецелевой', None), 0.2), (('Отказ', None), 0.1)],
+    ('Подбор', None): [(('Подбор', 'Назначенная встреча'), 0.6), (('Бронь', None), 0.15), (('Отказ', None), 0.25)],
+    ('Подбор', 'Назначенная встреча'): [(('Подбор', 'Визит состоялся'), 0.65),
+                                         (('Подбор', 'Визит не состоялся'), 0.25), (('Отказ', None), 0.1)],
+    ('Подбор', 'Визит состоялся'): [(('Бронь', None), 0.5), (('Отказ', None), 0.5)],
+    ('Подбор', 'Визит не состоялся'): [(('Подбор', 'Назначенная встреча'), 0.4), (('Отказ', None), 0.6)],
+    ('Бронь', None): [(('Сделка в работе', None), 0.7), (('Отказ', None), 0.3)],
+    ('Сделка в работе', None): [(('Сделка проведена', None), 0.8), (('Сделка расторгнута', None), 0.2)],
+}
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def _month_start(day: date, months_back: int) -> date:
+    month_index = day.year * 12 + day.month - 1 - months_back
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _build_metadata():
+    """
+    Копия metadata приложения, в которой строковые колонки таблиц MySQL сравниваются
+    без учета регистра (COLLATE NOCASE), как в utf8mb4_general_ci на проде.
+    """
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        if copy.name not in MYSQL_TABLES:
+            continue
+        for column in copy.columns:
+            if isinstance(column.type, String) and not isinstance(column.type, Enum):
+                column.type = String(column.type.length, collation='NOCASE')
+    return metadata
+
+
+def generate_tenant_db(path: str, complexes: int = 5, houses_per_complex: int = 4, units_per_house: int = 100,
+                       deal_ratio: float = 0.55, leads: int = 5000, logs_per_lead: int = 5, managers: int = 20,
+                       months: int = 24, anchor: date = None, seed: int = 42):
+    """
+    Создает (пересоздает) SQLite-файл с синтетическими данными компании.
+    Возвращает словарь с количеством созданных строк по таблицам.
+    """
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+    first_day = _month_start(anchor, months - 1)
+    period_days = (anchor - first_day).days
+
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    engine = create_engine(f'sqlite:///{path}')
+    _build_metadata().create_all(engine)
+
+    def random_day():
+        return first_day + timedelta(days=rng.randint(0, period_days))
+
+    counts = {}
+    with Session(engine) as session:
+        # --- Менеджеры (в проде таблица users в MySQL) ---
+        post_titles = ['Менеджер по продажам', 'Старший менеджер', 'Руководитель группы']
+        manager_rows = [{'id': i, 'users_name': f'Менеджер {i:03d}', 'post_title': rng.choice(post_titles)}
+                        for i in range(1, managers + 1)]
+        session.bulk_insert_mappings(auth_models.SalesManager, manager_rows)
+        # Аналитика по менеджерам читает их из system_users с user_type='manager'
+        session.execute(auth_models.User.__table__.insert(), [
+            {'id': row['id'], 'username': f'manager{row["id"]}', 'full_name': row['users_name'],
+             'email': f'manager{row["id"]}@example.com', 'post_title': row['post_title'], 'is_active': True,
+             'company_id': 1, 'user_type': 'manager'}
+            for row in manager_rows
+        ])
+        manager_ids = [row['id'] for row in manager_rows]
+        counts['users'] = len(manager_rows)
+
+        # --- Дома и объекты ---
+        complex_names = [f'ЖК Синтетика {i:02d}' for i in range(1, complexes + 1)]
+        house_rows, sell_rows = [], []
+        for complex_name in complex_names:
+            base_price_m2 = rng.uniform(8_000_000, 14_000_000)
+            for house_number in range(1, houses_per_complex + 1):
+                house_id = len(house_rows) + 1
+                house_rows.append({'id': house_id, 'complex_name': complex_name, 'name': f'Дом {house_number}',
+                                   'geo_house': str(house_number)})
+                for _ in range(units_per_house):
+                    category = _weighted(rng, CATEGORY_WEIGHTS)
+                    area = rng.uniform(35, 120) if category in ('flat', 'comm') else rng.uniform(4, 18)
+                    price_m2 = base_price_m2 * rng.uniform(0.85, 1.2)
+                    sell_rows.append({
+                        'id': len(sell_rows) + 1, 'house_id': house_id, 'estate_sell_category': category,
+                        'estate_floor': rng.randint(1, 16), 'estate_rooms': rng.randint(1, 4) if category == 'flat' else None,
+                        'estate_area': round(area, 2), 'estate_price_m2': round(price_m2, 0),
+                        'estate_price': round(area * price_m2, -3),
+                        'estate_sell_status_name': rng.choice(INVENTORY_STATUSES),
+                    })
+        session.bulk_insert_mappings(estate_models.EstateHouse, house_rows)
+        counts['estate_houses'] = len(house_rows)
+
+        # --- Сделки и платежи ---
+        deal_rows, finance_rows = [], []
+        for sell in rng.sample(sell_rows, int(len(sell_rows) * deal_ratio)):
+            status = _weighted(rng, DEAL_STATUS_WEIGHTS)
+            agreement_date = random_day()
+            deal_sum = round(sell['estate_price'] * rng.uniform(0.88, 1.0), -3)
+            deal_rows.append({
+                'id': len(deal_rows) + 1, 'estate_sell_id': sell['id'], 'deal_status_name': status,
+                'agreement_date': agreement_date, 'preliminary_date': agreement_date - timedelta(days=rng.randint(0, 10)),
+                'date_modified': agreement_date + timedelta(days=rng.randint(0, 20)),
+                'deal_sum': deal_sum, 'deal_manager_id': rng.choice(manager_ids),
+            })
+            if status in ('Сделка проведена', 'Сделка в работе'):
+                sell['estate_sell_status_name'] = status
+                manager_id = deal_rows[-1]['deal_manager_id']
+                down_payment = round(deal_sum * rng.uniform(0.15, 0.5), -3)
+                finance_rows.append({'estate_sell_id': sell['id'], 'summa': down_payment, 'status_name': 'Paid',
+                                     'payment_type': 'Поступление', 'date_added': agreement_date,
+                                     'date_to': agreement_date, 'manager_id': manager_id})
+                installments = rng.randint(1, 12)
+                for n in range(1, installments + 1):
+                    due = agreement_date + timedelta(days=30 * n)
+                    paid = due <= anchor and rng.random() < 0.85
+                    finance_rows.append({
+                        'estate_sell_id': sell['id'], 'summa': round((deal_sum - down_payment) / installments, -3),
+                        'status_name': 'Paid' if paid else 'К оплате', 'payment_type': 'Поступление',
+                        'date_added': due if paid else agreement_date, 'date_to': due, 'manager_id': manager_id,
+                    })
+            elif status == 'Сделка отменена' and rng.random() < 0.3:
+                finance_rows.append({'estate_sell_id': sell['id'], 'summa': round(deal_sum * 0.1, -3),
+                                     'status_name': 'К оплате', 'payment_type': REFUND_TYPE,
+                                     'date_added': agreement_date, 'date_to': random_day(), 'manager_id': None})
+        session.bulk_insert_mappings(estate_models.EstateSell, sell_rows)
+        session.bulk_insert_mappings(estate_models.EstateDeal, deal_rows)
+        session.bulk_insert_mappings(finance_models.FinanceOperation, finance_rows)
+        counts.update(estate_sells=len(sell_rows), estate_deals=len(deal_rows), finances=len(finance_rows))
+
+        # --- Заявки и история статусов ---
+        buy_rows, log_rows = [], []
+        for buy_id in range(1, leads + 1):
+            created = datetime.combine(random_day(), datetime.min.time()) + timedelta(minutes=rng.randint(0, 1439))
+            state = ('Новая', None)
+            log_time = created
+            manager_id = rng.choice(manager_ids)
+            log_rows.append({'estate_buy_id': buy_id, 'log_date': log_time, 'status_to_name': state[0],
+                             'status_custom_to_name': state[1], 'manager_id': manager_id})
+            for _ in range(logs_per_lead - 1):
+                transitions = LEAD_TRANSITIONS.get(state)
+                if not transitions:
+                    break
+                state = _weighted(rng, transitions)
+                log_time += timedelta(hours=rng.randint(2, 240))
+                log_rows.append({'estate_buy_id': buy_id, 'log_date': log_time, 'status_to_name': state[0],
+                                 'status_custom_to_name': state[1], 'manager_id': manager_id})
+            buy_rows.append({'id': buy_id, 'date_added': created.date(), 'created_at': created,
+                             'status_name': state[0], 'custom_status_name': state[1]})
+        session.bulk_insert_mappings(funnel_models.EstateBuy, buy_rows)
+        session.bulk_insert_mappings(funnel_models.EstateBuysStatusLog, log_rows)
+        counts.update(estate_buys=len(buy_rows), estate_buys_statuses_log=len(log_rows))
+
+        # --- Локальные данные компании: планы, скидки, курс ---
+        plan_rows = []
+        for months_back in range(months):
+            month_start = _month_start(anchor, months_back)
+            for complex_name in complex_names:
+                for prop_type in planning_models.PropertyType:
+                    scale = 1.0 if prop_type == planning_models.PropertyType.FLAT else 0.1
+                    plan_rows.append({
+                        'complex_name': complex_name, 'property_type': prop_type.value,
+                        'year': month_start.year, 'month': month_start.month,
+                        'plan_units': int(units_per_house * houses_per_complex * deal_ratio / months * scale) + 1,
+                        'plan_volume': round(rng.uniform(5e9, 2e10) * scale, -6),
+                        'plan_income': round(rng.uniform(3e9, 1.2e10) * scale, -6),
+                    })
+        session.bulk_insert_mappings(planning_models.SalesPlan, plan_rows)
+
+        version = planning_models.DiscountVersion(version_number=1, comment='Синтетическая версия', is_active=True,
+                                                  was_ever_activated=True)
+        session.add(version)
+        session.flush()
+        discount_rows = [
+            {'version_id': version.id, 'complex_name': complex_name, 'property_type': prop_type,
+             'payment_method': payment_method, 'mpp': 0.03, 'rop': 0.02, 'kd': rng.choice([0, 0.01]),
+             'action': rng.choice([0, 0, 0.02]), 'cadastre_date': anchor + timedelta(days=rng.randint(-90, 540))}
+            for complex_name in complex_names
+            for prop_type in planning_models.PropertyType
+            for payment_method in planning_models.PaymentMethod
+        ]
+        session.bulk_insert_mappings(planning_models.Discount, discount_rows)
+
+        currency = finance_models.CurrencySettings(rate_source='manual', manual_rate=USD_RATE, default_currency='UZS')
+        currency.update_effective_rate()
+        session.add(currency)
+        session.add(planning_models.CalculatorSettings(id=1))
+        session.commit()
+        counts.update(sales_plans=len(plan_rows), discounts=len(discount_rows))
+
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетической SQLite-базы компании")
+    parser.add_argument('path', help="Путь к создаваемому .db файлу")
+    parser.add_argument('--scale', choices=SCALES.keys(), default='small', help="Готовый набор размеров")
+    parser.add_argument('--complexes', type=int)
+    parser.add_argument('--houses-per-complex', type=int)
+    parser.add_argument('--units-per-house', type=int)
+    parser.add_argument('--deal-ratio', type=float)
+    parser.add_argument('--leads', type=int)
+    parser.add_argument('--logs-per-lead', type=int)
+    parser.add_argument('--managers', type=int)
+    parser.add_argument('--anchor-date', type=date.fromisoformat, help="Последний день данных (по умолчанию сегодня)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    params = dict(SCALES[args.scale])
+    for name in params:
+        value = getattr(args, name)
+        if value is not None:
+            params[name] = value
+
+    counts = generate_tenant_db(args.path, anchor=args.anchor_date, seed=args.seed, **params)
+    print(f"[SYNTHETIC] ✔️ База '{args.path}' создана:")
+    for table, count in counts.items():
+        print(f"  {table}: {count}")
+
+
+if __name__ == '__main__':
+    main()
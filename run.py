@@ -4,6 +4,7 @@ from app import create_app
 from app.core.config import DevelopmentConfig
 from app.core.extensions import db
 from app.models import auth_models
+from app.services import calendar_service
 
 # Создаем приложение Flask
 app = create_app(DevelopmentConfig)
@@ -18,7 +19,7 @@ def setup_database():
 
         from app.models import (auth_models, planning_models, estate_models,
                                 finance_models, exclusion_models, funnel_models,
-                                special_offer_models)
+                                special_offer_models, system_models)
 
         print("--- [ОТЛАДКА] Вызов db.create_all() для управляющей базы... ---")
         db.create_all()
@@ -41,10 +42,14 @@ def setup_database():
                 models_metadata = [
                     planning_models.db.metadata, estate_models.db.metadata,
                     finance_models.db.metadata, exclusion_models.db.metadata,
-                    funnel_models.db.metadata, special_offer_models.db.metadata
+                    funnel_models.db.metadata, special_offer_models.db.metadata,
+                    system_models.db.metadata
                 ]
                 for metadata in models_metadata:
                     metadata.create_all(bind=engine)
+                # Таблица праздников создана пустой — заполняем ее праздниками по умолчанию
+                with engine.begin() as connection:
+                    calendar_service.seed_default_holidays(connection)
                 print(f"--- [ОТЛАДКА] Таблицы в базе 'tenant_default.db' успешно созданы. ---")
             except Exception as e:
                 print(f"--- [ОТЛАДКА] ОШИБКА при создании таблиц в базе компании: {e} ---")